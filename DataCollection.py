@@ -1,11 +1,212 @@
 import os
 import sqlite3
 import datetime
+import threading
+import time
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel,
                              QLineEdit, QDateTimeEdit, QTextEdit, QPushButton, QFileDialog,
                              QMessageBox, QProgressBar, QGridLayout, QDialog, QTabWidget,
-                             QTableWidget, QTableWidgetItem)
-from PyQt5.QtCore import QDateTime, QTimer
+                             QTableWidget, QTableWidgetItem, QCheckBox)
+from PyQt5.QtCore import Qt, QDateTime, QTimer, QObject, QThread, pyqtSignal
+
+from ingest import (CSV_EXTENSIONS, LOG_EXTENSIONS, VIDEO_EXTENSIONS, VIDEO_PROGRESS_UNIT,
+                    ImportCancelled, ImportManifest, ImportProgress, create_tables, find_files,
+                    import_csv_files, import_log_files, import_video_files, rollback_import,
+                    save_experiment, snapshot_row_ids, total_file_size)
+from db_schema import IMPORT_SCHEMA, create_indexes
+from log_search import update_log_index
+from sensor_rollup import build_rollups, drop_rollups
+from video_proxy import build_proxies
+
+# 进度条刻度（千分比）
+PROGRESS_SCALE = 1000
+
+# 进度信号的最小发送间隔（秒），避免大量信号堆积在界面线程
+PROGRESS_INTERVAL = 0.05
+
+
+def format_size(size):
+    """格式化文件大小显示"""
+    size = float(size)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+class ImportWorker(QObject):
+    """后台导入任务 - 在独立线程中解析数据文件并写入数据库"""
+
+    status = pyqtSignal(str)
+    progress = pyqtSignal('qint64', 'qint64', 'qint64', 'qint64')  # 已处理文件数, 文件总数, 已处理字节数, 总字节数
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    skipping_proxies = pyqtSignal()  # 数据已全部写入，此后取消只跳过代理视频生成
+
+    def __init__(self, db_path, experiment, sources, use_hash=False, make_proxies=False):
+        super().__init__()
+        self.db_path = db_path
+        self.experiment = experiment
+        self.sources = sources
+        self.use_hash = use_hash
+        self.make_proxies = make_proxies
+        self._cancel_event = threading.Event()
+        self._last_emit = 0.0
+
+    def cancel(self):
+        """请求取消导入（可在任意线程调用）"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def emit_progress(self, progress, force=False):
+        """按时间间隔节流发送进度信号"""
+        now = time.monotonic()
+        if force or now - self._last_emit >= PROGRESS_INTERVAL:
+            self._last_emit = now
+            self.progress.emit(progress.done_files, progress.total_files,
+                               progress.done_bytes, progress.total_bytes)
+
+    def emit_proxy_progress(self, done, total):
+        """代理视频的进度显示在状态栏"""
+        self.status.emit(f"正在生成代理视频 ({done}/{total})...")
+
+    def run(self):
+        """执行导入（在后台线程中运行）"""
+        # SQLite连接只能在创建它的线程中使用，因此在后台线程中打开
+        conn = None
+        snapshot = None
+        manifest = None
+        experiment_created = False
+        experiment_id = self.experiment["id"]
+        try:
+            self.status.emit("正在创建数据库...")
+            conn = sqlite3.connect(self.db_path)
+            create_tables(conn)
+            snapshot = snapshot_row_ids(conn)
+
+            self.status.emit("正在保存实验信息...")
+            try:
+                experiment_created = save_experiment(
+                    conn, experiment_id, self.experiment["name"], self.experiment["start_time"],
+                    self.experiment["end_time"], self.experiment["description"])
+            except sqlite3.Error as e:
+                snapshot = None  # 实验信息未写入，无需回滚
+                self.failed.emit(f"保存实验信息失败: {str(e)}")
+                return
+
+            # 扫描数据文件，根据导入清单跳过已导入且未变化的文件
+            self.status.emit("正在扫描数据文件...")
+            manifest = ImportManifest(conn, experiment_id, self.use_hash)
+            csv_files = manifest.pending_files(conn, find_files(self.sources["csv"], CSV_EXTENSIONS))
+            log_files = manifest.pending_files(conn, find_files(self.sources["log"], LOG_EXTENSIONS))
+            # 全部视频（含未变化的）用于生成代理视频，每个目录只扫描一次
+            nvr_videos = find_files(self.sources["nvr"], VIDEO_EXTENSIONS)
+            camera_videos = find_files(self.sources["camera"], VIDEO_EXTENSIONS)
+            all_videos = nvr_videos + camera_videos
+            nvr_files = manifest.pending_files(conn, nvr_videos)
+            camera_files = manifest.pending_files(conn, camera_videos)
+
+            video_count = len(nvr_files) + len(camera_files)
+            progress = ImportProgress(
+                total_files=len(csv_files) + len(log_files) + video_count,
+                total_bytes=(total_file_size(csv_files) + total_file_size(log_files)
+                             + video_count * VIDEO_PROGRESS_UNIT),
+                callback=self.emit_progress,
+                should_cancel=self.is_cancelled)
+            self.emit_progress(progress, force=True)
+
+            # 处理上位机数据
+            self.status.emit("正在处理上位机数据...")
+            csv_stats = import_csv_files(conn, experiment_id, csv_files, progress=progress,
+                                         manifest=manifest)
+
+            # 处理日志数据
+            self.status.emit("正在处理日志数据...")
+            log_stats = import_log_files(conn, experiment_id, log_files, progress=progress,
+                                         manifest=manifest)
+
+            # 处理视频数据
+            self.status.emit("正在处理视频数据...")
+            nvr_stats = import_video_files(conn, experiment_id, nvr_files, "NVR", 1000000,
+                                           progress, manifest)
+            # 高速摄像机文件通常更大，调整估算
+            camera_stats = import_video_files(conn, experiment_id, camera_files,
+                                              "HighSpeedCamera", 2000000, progress, manifest)
+            self.emit_progress(progress, force=True)
+
+            # 批量写入完成后再创建时间范围查询使用的索引，每个阶段之间都可以取消
+            self.status.emit("正在创建索引...")
+            create_indexes(conn)
+            progress.check_cancel()
+
+            # 上位机数据有变化时重新生成多粒度汇总，回放时直接按粒度读取
+            if csv_files:
+                self.status.emit("正在生成数据概览...")
+                build_rollups(conn, IMPORT_SCHEMA, experiment_id)
+                progress.check_cancel()
+
+            # 新导入的日志加入全文索引
+            if log_files:
+                self.status.emit("正在建立日志索引...")
+                update_log_index(conn, IMPORT_SCHEMA)
+                progress.check_cancel()
+
+            # 数据已全部写入，最后生成代理视频；已有的代理视频会直接复用
+            # 此阶段取消只停止转码，不回滚已导入的数据；转码出错也不影响导入结果
+            proxy_count = 0
+            if self.make_proxies and all_videos:
+                self.status.emit("正在生成代理视频...")
+                self.skipping_proxies.emit()
+                try:
+                    proxy_count = build_proxies(all_videos, progress=self.emit_proxy_progress,
+                                                should_cancel=self.is_cancelled)
+                except Exception as e:
+                    print(f"生成代理视频时出错: {str(e)}")
+
+            self.finished.emit({"db_path": self.db_path, "csv": csv_stats,
+                                "log": log_stats, "video": nvr_stats.files + camera_stats.files,
+                                "skipped": manifest.skipped_files, "proxies": proxy_count,
+                                "failed": sum(stats.failed_files for stats in
+                                              (csv_stats, log_stats, nvr_stats, camera_stats))})
+
+        except ImportCancelled:
+            self.rollback(conn, snapshot, manifest, experiment_created)
+            self.cancelled.emit()
+        except Exception as e:
+            message = f"导入数据时出现问题: {str(e)}"
+            if snapshot is not None:
+                # 与取消一样撤销本次导入已提交的数据
+                self.status.emit("导入出错，正在回滚...")
+                if self.rollback(conn, snapshot, manifest, experiment_created):
+                    message += "\n本次导入的数据已回滚"
+            self.failed.emit(message)
+        finally:
+            if conn:
+                conn.close()
+
+    def rollback(self, conn, snapshot, manifest, experiment_created):
+        """撤销本次导入，并清除由这些数据生成的汇总和日志索引，返回是否成功"""
+        experiment_id = self.experiment["id"]
+        try:
+            if manifest is None:
+                # 扫描文件之前出错，只写入了实验信息
+                if conn.in_transaction:
+                    conn.rollback()
+                if experiment_created:
+                    conn.execute("DELETE FROM experiments WHERE id = ?", (experiment_id,))
+                    conn.commit()
+                return True
+            rollback_import(conn, snapshot, manifest, experiment_created)
+            drop_rollups(conn, IMPORT_SCHEMA, experiment_id)
+            update_log_index(conn, IMPORT_SCHEMA)
+            return True
+        except sqlite3.Error as e:
+            print(f"回滚导入数据失败: {str(e)}")
+            return False
 
 
 class DataCollectionWidget(QWidget):
@@ -16,6 +217,10 @@ class DataCollectionWidget(QWidget):
         self.initUI()
         self.conn = None  # 数据库连接
         self.cursor = None  # 数据库游标
+        self.csv_stats = None  # 上位机数据导入统计
+        self.import_thread = None  # 后台导入线程
+        self.import_worker = None  # 后台导入任务
+        self.proxy_stage = False  # 数据已写入，正在生成代理视频
 
     def initUI(self):
         layout = QVBoxLayout()
@@ -139,6 +344,19 @@ class DataCollectionWidget(QWidget):
         self.show_db_btn.clicked.connect(self.show_database_content)
         btn_layout.addWidget(self.show_db_btn)
 
+        self.hash_check = QCheckBox("校验文件内容")
+        self.hash_check.setToolTip("重新导入时除大小和修改时间外，再比较文件内容哈希")
+        btn_layout.addWidget(self.hash_check)
+
+        self.proxy_check = QCheckBox("生成代理视频")
+        self.proxy_check.setToolTip("导入后用ffmpeg生成低分辨率的全关键帧视频，拖动进度条和多路播放时更流畅")
+        btn_layout.addWidget(self.proxy_check)
+
+        self.cancel_btn = QPushButton("取消导入")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_import)
+        btn_layout.addWidget(self.cancel_btn)
+
         layout.addLayout(btn_layout)
 
         # 进度条
@@ -206,239 +424,6 @@ class DataCollectionWidget(QWidget):
         elif data_type == "video" and self.camera_data_path.text() == folder_path:
             self.camera_selected_folder.setText(f"已选择: {folder_path} (发现 {len(found_files)} 个视频文件)")
 
-    def create_database_tables(self, db_path):
-        """创建数据库表结构"""
-        try:
-            # 连接到SQLite数据库（如果不存在则创建）
-            self.conn = sqlite3.connect(db_path)
-            self.cursor = self.conn.cursor()
-
-            # 创建实验信息表
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS experiments (
-                id TEXT PRIMARY KEY,
-                name TEXT,
-                start_time TEXT,
-                end_time TEXT,
-                description TEXT
-            )
-            ''')
-
-            # 创建上位机数据表
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sensor_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                experiment_id TEXT,
-                timestamp TEXT,
-                sensor_type TEXT,
-                value REAL,
-                file_source TEXT,
-                FOREIGN KEY (experiment_id) REFERENCES experiments(id)
-            )
-            ''')
-
-            # 创建视频数据表
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS video_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                experiment_id TEXT,
-                device_id TEXT,
-                file_path TEXT,
-                duration INTEGER,
-                file_size INTEGER,
-                FOREIGN KEY (experiment_id) REFERENCES experiments(id)
-            )
-            ''')
-
-            # 创建日志数据表
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS log_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                experiment_id TEXT,
-                timestamp TEXT,
-                level TEXT,
-                message TEXT,
-                file_source TEXT,
-                FOREIGN KEY (experiment_id) REFERENCES experiments(id)
-            )
-            ''')
-
-            self.conn.commit()
-            return True
-
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "数据库错误", f"创建数据库表失败: {str(e)}")
-            if self.conn:
-                self.conn.close()
-                self.conn = None
-            return False
-
-    def save_experiment_info(self, experiment_id):
-        """保存实验基本信息"""
-        try:
-            exp_name = self.exp_name_input.text()
-            start_time = self.start_time_input.dateTime().toString("yyyy-MM-dd hh:mm:ss")
-            end_time = self.end_time_input.dateTime().toString("yyyy-MM-dd hh:mm:ss")
-            description = self.desc_input.toPlainText()
-
-            self.cursor.execute('''
-            INSERT INTO experiments (id, name, start_time, end_time, description)
-            VALUES (?, ?, ?, ?, ?)
-            ''', (experiment_id, exp_name, start_time, end_time, description))
-
-            self.conn.commit()
-            return True
-
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "数据库错误", f"保存实验信息失败: {str(e)}")
-            return False
-
-    def process_csv_data(self, experiment_id):
-        """处理并保存上位机CSV数据"""
-        folder_path = self.csv_data_path.text()
-        if not folder_path or not os.path.exists(folder_path):
-            return 0
-
-        try:
-            # 查找CSV文件
-            csv_files = []
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(('.csv', '.txt', '.dat')):
-                        csv_files.append(os.path.join(root, file))
-
-            file_count = 0
-            for file_path in csv_files:
-                try:
-                    with open(file_path, 'r') as f:
-                        # 简单处理CSV文件，假设格式为: 时间,传感器类型,数值
-                        lines = f.readlines()
-                        for i, line in enumerate(lines):
-                            if i == 0 and ',' in line:  # 跳过可能的标题行
-                                continue
-
-                            parts = line.strip().split(',')
-                            if len(parts) >= 3:
-                                try:
-                                    timestamp = parts[0].strip()
-                                    sensor_type = parts[1].strip()
-                                    value = float(parts[2].strip())
-
-                                    self.cursor.execute('''
-                                    INSERT INTO sensor_data (experiment_id, timestamp, sensor_type, value, file_source)
-                                    VALUES (?, ?, ?, ?, ?)
-                                    ''', (experiment_id, timestamp, sensor_type, value, file_path))
-                                except (ValueError, IndexError):
-                                    continue  # 跳过不符合格式的行
-
-                    file_count += 1
-                    self.conn.commit()
-
-                except Exception as e:
-                    print(f"处理文件 {file_path} 时出错: {str(e)}")
-                    continue
-
-            return file_count
-
-        except Exception as e:
-            QMessageBox.warning(self, "数据处理警告", f"处理上位机数据时出现问题: {str(e)}")
-            return 0
-
-    def process_log_data(self, experiment_id):
-        """处理并保存日志数据"""
-        folder_path = self.log_data_path.text()
-        if not folder_path or not os.path.exists(folder_path):
-            return 0
-
-        try:
-            # 查找日志文件
-            log_files = []
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(('.log', '.txt')):
-                        log_files.append(os.path.join(root, file))
-
-            file_count = 0
-            for file_path in log_files:
-                try:
-                    with open(file_path, 'r') as f:
-                        lines = f.readlines()
-                        for line in lines:
-                            # 尝试解析日志行，假设格式为: [时间] [级别] 消息
-                            # 或者简单的格式如: 时间 级别 消息
-                            parts = line.strip().split(' ', 2)
-                            if len(parts) >= 3:
-                                timestamp = parts[0].strip()
-                                level = parts[1].strip()
-                                message = parts[2].strip()
-
-                                self.cursor.execute('''
-                                INSERT INTO log_data (experiment_id, timestamp, level, message, file_source)
-                                VALUES (?, ?, ?, ?, ?)
-                                ''', (experiment_id, timestamp, level, message, file_path))
-
-                    file_count += 1
-                    self.conn.commit()
-
-                except Exception as e:
-                    print(f"处理文件 {file_path} 时出错: {str(e)}")
-                    continue
-
-            return file_count
-
-        except Exception as e:
-            QMessageBox.warning(self, "数据处理警告", f"处理日志数据时出现问题: {str(e)}")
-            return 0
-
-    def process_video_data(self, experiment_id):
-        """处理并保存视频数据(NVR和高速摄像机)"""
-        nvr_path = self.nvr_data_path.text()
-        camera_path = self.camera_data_path.text()
-
-        total_videos = 0
-
-        # 处理NVR视频
-        if nvr_path and os.path.exists(nvr_path):
-            video_files = []
-            for root, _, files in os.walk(nvr_path):
-                for file in files:
-                    if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                        video_files.append(os.path.join(root, file))
-
-            for file_path in video_files:
-                file_size = os.path.getsize(file_path)  # 获取文件大小（字节）
-                # 这里简单假设视频时长（秒），实际应该使用视频库获取
-                duration = file_size // 1000000  # 简单估算，每MB约1秒
-
-                self.cursor.execute('''
-                INSERT INTO video_data (experiment_id, device_id, file_path, duration, file_size)
-                VALUES (?, ?, ?, ?, ?)
-                ''', (experiment_id, "NVR", file_path, duration, file_size))
-
-                total_videos += 1
-
-        # 处理高速摄像机视频
-        if camera_path and os.path.exists(camera_path):
-            video_files = []
-            for root, _, files in os.walk(camera_path):
-                for file in files:
-                    if file.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-                        video_files.append(os.path.join(root, file))
-
-            for file_path in video_files:
-                file_size = os.path.getsize(file_path)
-                duration = file_size // 2000000  # 高速摄像机文件通常更大，调整估算
-
-                self.cursor.execute('''
-                INSERT INTO video_data (experiment_id, device_id, file_path, duration, file_size)
-                VALUES (?, ?, ?, ?, ?)
-                ''', (experiment_id, "HighSpeedCamera", file_path, duration, file_size))
-
-                total_videos += 1
-
-        self.conn.commit()
-        return total_videos
-
     def save_database(self):
         """保存数据库"""
         # 检查是否输入了试验编号
@@ -463,55 +448,151 @@ class DataCollectionWidget(QWidget):
         if not filename.lower().endswith('.db'):
             filename += '.db'
 
-        # 设置进度条开始导入
-        self.status_label.setText("正在创建数据库...")
-        self.progress_bar.setValue(5)
-
-        # 创建数据库和表结构
-        if not self.create_database_tables(filename):
-            self.status_label.setText("数据库创建失败")
-            return
-
-        # 获取实验ID
-        experiment_id = self.exp_id_input.text()
-
-        # 保存实验信息
-        self.status_label.setText("正在保存实验信息...")
-        self.progress_bar.setValue(10)
-        if not self.save_experiment_info(experiment_id):
-            self.close_database()
-            self.status_label.setText("保存实验信息失败")
-            return
+        # 导入期间由后台线程独占写入，先关闭当前连接
+        self.close_database()
 
-        # 处理上位机数据
-        self.status_label.setText("正在处理上位机数据...")
-        self.progress_bar.setValue(30)
-        csv_count = self.process_csv_data(experiment_id)
+        experiment = {
+            "id": self.exp_id_input.text(),
+            "name": self.exp_name_input.text(),
+            "start_time": self.start_time_input.dateTime().toString("yyyy-MM-dd hh:mm:ss"),
+            "end_time": self.end_time_input.dateTime().toString("yyyy-MM-dd hh:mm:ss"),
+            "description": self.desc_input.toPlainText(),
+        }
+        sources = {
+            "csv": self.csv_data_path.text(),
+            "log": self.log_data_path.text(),
+            "nvr": self.nvr_data_path.text(),
+            "camera": self.camera_data_path.text(),
+        }
 
-        # 处理日志数据
-        self.status_label.setText("正在处理日志数据...")
-        self.progress_bar.setValue(60)
-        log_count = self.process_log_data(experiment_id)
+        # 设置进度条开始导入
+        self.status_label.setText("正在准备导入...")
+        self.progress_bar.setRange(0, PROGRESS_SCALE)
+        self.progress_bar.setValue(0)
+        self.set_importing(True)
+
+        # 在后台线程中执行导入，保持界面响应
+        self.import_thread = QThread(self)
+        self.import_worker = ImportWorker(filename, experiment, sources, self.hash_check.isChecked(),
+                                          self.proxy_check.isChecked())
+        self.import_worker.moveToThread(self.import_thread)
+        self.import_thread.started.connect(self.import_worker.run)
+        self.import_worker.status.connect(self.status_label.setText)
+        self.import_worker.progress.connect(self.update_import_progress)
+        self.import_worker.finished.connect(self.import_finished)
+        self.import_worker.failed.connect(self.import_failed)
+        self.import_worker.cancelled.connect(self.import_cancelled)
+        self.import_worker.skipping_proxies.connect(self.enter_proxy_stage)
+        for signal in (self.import_worker.finished, self.import_worker.failed,
+                       self.import_worker.cancelled):
+            # 直接在后台线程中结束事件循环，关闭窗口时界面线程可以等待线程结束
+            signal.connect(self.import_thread.quit, Qt.DirectConnection)
+        self.import_thread.finished.connect(self.import_worker.deleteLater)
+        self.import_thread.finished.connect(self.import_thread.deleteLater)
+        self.import_thread.start()
+
+    def cancel_import(self):
+        """取消正在进行的导入，生成代理视频阶段只停止转码"""
+        if self.import_worker is not None:
+            self.cancel_btn.setEnabled(False)
+            if self.proxy_stage:
+                self.status_label.setText("正在停止生成代理视频...")
+            else:
+                self.status_label.setText("正在取消导入...")
+            self.import_worker.cancel()
+
+    def enter_proxy_stage(self):
+        """数据已全部写入，取消按钮改为跳过代理视频"""
+        self.proxy_stage = True
+        self.cancel_btn.setText("跳过代理视频")
+
+    def set_importing(self, importing):
+        """导入期间禁用相关按钮"""
+        self.save_db_btn.setEnabled(not importing)
+        self.show_db_btn.setEnabled(not importing)
+        self.cancel_btn.setEnabled(importing)
+        self.cancel_btn.setText("取消导入")
+        self.proxy_stage = False
+
+    def stop_import(self):
+        """关闭窗口前结束后台导入，返回是否可以关闭
+
+        导入进行中时询问是否取消；取消后等待后台线程回滚完成，避免线程被销毁时仍在运行。
+        """
+        if self.import_thread is None or self.import_worker is None:
+            return True
+        if self.proxy_stage:
+            # 数据已全部写入，取消只停止生成代理视频，不回滚
+            question = "数据已导入完成，正在生成代理视频。是否停止生成代理视频并关闭?\n已导入的数据会保留"
+        else:
+            question = "数据导入正在进行，是否取消导入并关闭?\n本次导入的数据会回滚"
+        reply = QMessageBox.question(self, "确认", question,
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.No:
+            return False
+        self.status_label.setText("正在停止生成代理视频..." if self.proxy_stage else "正在取消导入...")
+        self.import_worker.cancel()
+        self.import_thread.wait()
+        return True
+
+    def closeEvent(self, event):
+        if self.stop_import():
+            event.accept()
+        else:
+            event.ignore()
+
+    def update_import_progress(self, done_files, total_files, done_bytes, total_bytes):
+        """更新导入进度"""
+        if total_bytes > 0:
+            self.progress_bar.setValue(int(done_bytes * PROGRESS_SCALE / total_bytes))
+        self.progress_bar.setFormat(f"%p%  ({done_files}/{total_files}个文件, "
+                                    f"{format_size(done_bytes)}/{format_size(total_bytes)})")
+
+    def import_finished(self, result):
+        """导入完成"""
+        self.import_worker = None
+        self.import_thread = None
+        self.set_importing(False)
+        self.progress_bar.setValue(PROGRESS_SCALE)
+        self.status_label.setText("数据导入完成")
 
-        # 处理视频数据
-        self.status_label.setText("正在处理视频数据...")
-        self.progress_bar.setValue(80)
-        video_count = self.process_video_data(experiment_id)
+        # 保持数据库连接打开，以便显示数据库内容
+        self.conn = sqlite3.connect(result["db_path"])
+        self.cursor = self.conn.cursor()
 
-        # 完成并关闭数据库
-        self.progress_bar.setValue(100)
-        self.status_label.setText("数据导入完成")
+        csv_stats = result["csv"]
+        self.csv_stats = csv_stats
 
         # 显示导入结果信息
         QMessageBox.information(self, "导入成功",
                                 f"数据库创建成功!\n\n"
                                 f"导入实验信息: 1条\n"
-                                f"处理上位机数据文件: {csv_count}个\n"
-                                f"处理日志文件: {log_count}个\n"
-                                f"处理视频文件: {video_count}个\n\n"
-                                f"数据库保存路径: {filename}")
-
-        # 保持数据库连接打开，以便显示数据库内容
+                                f"处理上位机数据文件: {csv_stats.files}个\n"
+                                f"写入上位机数据: {csv_stats.rows}行 "
+                                f"({csv_stats.rows_per_sec:,.0f}行/秒)\n"
+                                f"处理日志文件: {result['log'].files}个\n"
+                                f"处理视频文件: {result['video']}个\n"
+                                f"跳过未变化的文件: {result['skipped']}个\n"
+                                f"无法读取而跳过的文件: {result['failed']}个\n"
+                                f"生成代理视频: {result['proxies']}个\n\n"
+                                f"数据库保存路径: {result['db_path']}")
+
+    def import_failed(self, message):
+        """导入失败"""
+        self.import_worker = None
+        self.import_thread = None
+        self.set_importing(False)
+        self.status_label.setText("数据导入失败")
+        QMessageBox.critical(self, "数据库错误", message)
+
+    def import_cancelled(self):
+        """导入已取消并回滚"""
+        self.import_worker = None
+        self.import_thread = None
+        self.set_importing(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.resetFormat()
+        self.status_label.setText("导入已取消，本次导入的数据已回滚")
 
     def close_database(self):
         """关闭数据库连接"""
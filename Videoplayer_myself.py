@@ -2,16 +2,24 @@ import sqlite3, sys, os
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QPushButton, QHBoxLayout, QFileDialog, QSlider,
                              QLabel, QMessageBox, QStyle, QFrame, QScrollArea, QGroupBox, QSizePolicy)
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
+from PyQt5.QtMultimedia import QMediaPlayer
 from PyQt5.QtMultimediaWidgets import QVideoWidget
-from PyQt5.QtCore import Qt, QUrl, QSize, QTime, QTimer
-from PyQt5.QtGui import QIcon, QCursor
+from PyQt5.QtCore import Qt, QSize, QTime, QTimer
+from PyQt5.QtGui import QIcon, QCursor, QPixmap, QPainter, QColor
+
+from db_migration import migrate_with_progress
+from db_schema import detect_schema, video_duration_sql
+from keyframe_index import KeyframeIndex
+from player_pool import WARM_NEIGHBOURS, WarmPlayerPool, estimate_player_bytes
+from segment_track import build_tracks
+from slider_preview import SliderPreview
+from video_thumbnail import FilmstripLoader, ThumbnailLoader
 
 
 class CustomVideoWidget(QWidget):
     """自定义视频控件，带有悬停显示的控制条"""
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, videoWidget=None):
         super().__init__(parent)
 
         # 创建布局
@@ -19,8 +27,8 @@ class CustomVideoWidget(QWidget):
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.setSpacing(0)
 
-        # 创建视频显示区域
-        self.videoWidget = QVideoWidget()
+        # 创建视频显示区域（可由调用方传入，如分段轨道播放器的双缓冲视频输出）
+        self.videoWidget = videoWidget or QVideoWidget()
         self.layout.addWidget(self.videoWidget)
 
         # 创建控制层
@@ -90,6 +98,8 @@ class CustomVideoWidget(QWidget):
         # 设置鼠标跟踪
         self.setMouseTracking(True)
         self.videoWidget.setMouseTracking(True)
+        for child in self.videoWidget.findChildren(QWidget):
+            child.setMouseTracking(True)
 
         # 创建计时器用于自动隐藏控制层
         self.hideTimer = QTimer(self)
@@ -142,7 +152,7 @@ class CustomVideoWidget(QWidget):
 class VideoThumbnail(QLabel):
     """视频缩略图控件"""
 
-    def __init__(self, video_path, index, parent=None):
+    def __init__(self, video_path, index, parent=None, title=None):
         super().__init__(parent)
         self.video_path = video_path
         self.index = index
@@ -154,15 +164,32 @@ class VideoThumbnail(QLabel):
         self.setFrameShape(QFrame.Box)
         self.setStyleSheet("border: 2px solid gray; background-color: #2c3e50; color: white;")
 
-        # 设置视频名称
-        video_name = os.path.basename(video_path)
+        # 设置视频名称，生成缩略图前先显示名称
+        self.full_name = title or os.path.basename(video_path)
+        video_name = self.full_name
         if len(video_name) > 15:
             video_name = video_name[:12] + "..."
+        self.video_name = video_name
         self.setText(video_name)
+        self.setToolTip(self.full_name)
 
         # 设置鼠标悬停跟踪
         self.setMouseTracking(True)
 
+    def setImage(self, image_path):
+        """显示视频画面缩略图，底部叠加视频名称"""
+        pixmap = QPixmap(image_path)
+        if pixmap.isNull():
+            return
+        pixmap = pixmap.scaled(self.width() - 4, self.height() - 4, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        painter = QPainter(pixmap)
+        strip = painter.fontMetrics().height() + 2
+        painter.fillRect(0, pixmap.height() - strip, pixmap.width(), strip, QColor(0, 0, 0, 150))
+        painter.setPen(Qt.white)
+        painter.drawText(0, pixmap.height() - strip, pixmap.width(), strip, Qt.AlignCenter, self.video_name)
+        painter.end()
+        self.setPixmap(pixmap)
+
     def enterEvent(self, event):
         """鼠标进入时高亮显示"""
         if not self.selected:
@@ -192,24 +219,35 @@ class VideoPlayer(QMainWindow):
         # 初始化变量
         self.conn = None
         self.cursor = None
-        self.videoList = []
+        self.videoList = []  # 按设备拼接的录像轨道
         self.current_video_index = -1  # 表示没有选择任何视频
         self.isFullScreen = False
         self.preMuteVolume = 50  # 默认音量
+        self.frameSizes = {}  # 轨道键 -> (宽, 高)，用于估算预热播放器的内存
 
         # 窗口设置
         self.setWindowTitle("视频播放器")
         self.setGeometry(100, 100, 800, 600)
 
-        # 创建媒体播放器
-        self.mediaPlayer = QMediaPlayer(None, QMediaPlayer.VideoSurface)
+        # 创建媒体播放器，同一设备的分段录像作为一条连续轨道播放
+        # 相邻和最近看过的视频在预热播放器中保持打开，切换时直接换到前台
+        self.playerPool = WarmPlayerPool(self, cost=self.estimateTrackBytes)
+        self.playerPool.activated.connect(self.playerActivated)
+        self.mediaPlayer = self.playerPool.current
+
+        # 缩略图在后台生成，完成后逐个显示
+        self.thumbnailLoader = ThumbnailLoader(self)
+        self.thumbnailLoader.ready.connect(self.showThumbnailImage)
+        self.thumbnails = []
 
-        # 创建自定义视频控件
-        self.videoContainer = CustomVideoWidget(self)
+        # 创建自定义视频控件，视频输出由播放器池提供
+        self.videoContainer = CustomVideoWidget(self, self.playerPool.view)
         self.videoWidget = self.videoContainer.videoWidget
 
-        # 设置媒体播放器的视频输出
-        self.mediaPlayer.setVideoOutput(self.videoWidget)
+        # 进度条悬停预览，画面取自后台生成的胶片条
+        self.filmstripLoader = FilmstripLoader(self)
+        self.sliderPreview = SliderPreview(self.videoContainer.positionSlider, self.previewFrame, self.previewTime)
+        self.filmstripLoader.ready.connect(lambda key, path: self.sliderPreview.refresh())
 
         # 数据库加载区域
         db_group = QGroupBox("数据库加载")
@@ -258,23 +296,46 @@ class VideoPlayer(QMainWindow):
         try:
             # 连接控制信号
             self.videoContainer.playButton.clicked.connect(self.togglePlayPause)
+            self.videoContainer.positionSlider.sliderPressed.connect(self.startScrub)
             self.videoContainer.positionSlider.sliderMoved.connect(self.setPosition)
+            self.videoContainer.positionSlider.sliderReleased.connect(self.seekExact)
             self.videoContainer.volumeButton.clicked.connect(self.muteToggle)
             self.videoContainer.volumeSlider.valueChanged.connect(self.setVolume)
             self.videoContainer.fullScreenButton.clicked.connect(self.toggleFullScreen)
 
             # 连接媒体播放器信号
-            self.mediaPlayer.stateChanged.connect(self.mediaStateChanged)
-            self.mediaPlayer.positionChanged.connect(self.positionChanged)
-            self.mediaPlayer.durationChanged.connect(self.durationChanged)
-            self.mediaPlayer.volumeChanged.connect(self.volumeChanged)
-            self.mediaPlayer.error.connect(self.handleError)
+            for signal, slot in self.playerSignals(self.mediaPlayer):
+                signal.connect(slot)
         except Exception as e:
             print(f"初始化过程中出错: {str(e)}")
 
         # 设置初始音量
         self.mediaPlayer.setVolume(self.preMuteVolume)
 
+    def playerSignals(self, player):
+        """需要连接到界面的播放器信号"""
+        return [(player.stateChanged, self.mediaStateChanged),
+                (player.positionChanged, self.positionChanged),
+                (player.durationChanged, self.durationChanged),
+                (player.volumeChanged, self.volumeChanged),
+                (player.error, self.handleError)]
+
+    def playerActivated(self, player, previous):
+        """切换到另一个播放器后改接信号，并按新播放器的状态刷新界面"""
+        for signal, slot in self.playerSignals(previous):
+            signal.disconnect(slot)
+        self.mediaPlayer = player
+        for signal, slot in self.playerSignals(player):
+            signal.connect(slot)
+        player.setVolume(previous.volume())
+        self.durationChanged(player.duration())
+        self.positionChanged(player.position())
+        self.mediaStateChanged(player.state())
+
+    def estimateTrackBytes(self, track):
+        """预热该轨道的估算内存"""
+        return estimate_player_bytes(*self.frameSizes.get(track.key, (0, 0)))
+
     def resizeEvent(self, event):
         """窗口大小改变时调整覆盖层大小"""
         if hasattr(self, 'videoOverlay') and self.videoOverlay:
@@ -287,6 +348,11 @@ class VideoPlayer(QMainWindow):
             # 释放媒体播放器
             if self.mediaPlayer:
                 self.mediaPlayer.stop()
+            self.playerPool.clear()
+
+            # 丢弃未开始的截图任务
+            self.thumbnailLoader.clear()
+            self.filmstripLoader.clear()
 
             # 关闭数据库连接
             if self.conn:
@@ -300,18 +366,29 @@ class VideoPlayer(QMainWindow):
         try:
             if 0 <= index < len(self.videoList):
                 self.current_video_index = index
-                video_path = self.videoList[index][0]
-
-                if os.path.exists(video_path):
-                    # 停止当前播放
-                    self.mediaPlayer.stop()
+                track = self.videoList[index]
 
+                if all(os.path.exists(segment.file_path) for segment in track.segments):
                     # 隐藏导入按钮覆盖层
                     if hasattr(self, 'videoOverlay') and self.videoOverlay:
                         self.videoOverlay.setVisible(False)
 
-                    # 加载视频但不播放
-                    self.mediaPlayer.setMedia(QMediaContent(QUrl.fromLocalFile(video_path)))
+                    # 切换到该视频但不播放，之前的视频暂停后保留在预热播放器中；
+                    # 关键帧索引在定位到某一分段时再读取
+                    keyframe_loader = lambda video_id: KeyframeIndex.load(self.conn, video_id)
+                    self.playerPool.activate(track, keyframe_loader)
+
+                    # 预热相邻的视频，下次切换时无需等待打开文件
+                    self.playerPool.prewarm(self.neighbourTracks(index), keyframe_loader)
+
+                    # 在后台为当前分段及其前后分段生成胶片条，供进度条悬停预览；
+                    # 其余分段在悬停到时再生成（NVR轨道可能有上千个分段）
+                    self.filmstripLoader.clear()
+                    current = track.locate(self.mediaPlayer.position())
+                    current = 0 if current is None else current
+                    for segment in track.segments[max(current - 1, 0):current + 2]:
+                        self.filmstripLoader.request(segment.video_id, segment.file_path,
+                                                     segment.end - segment.start)
 
                     # 更新缩略图选中状态
                     for i in range(self.thumbnailLayout.count()):
@@ -328,19 +405,27 @@ class VideoPlayer(QMainWindow):
                                         "border: 2px solid gray; background-color: #2c3e50; color: white;")
                                     widget.selected = False
                 else:
-                    QMessageBox.warning(self, "警告", f"视频文件不存在: {video_path}")
+                    QMessageBox.warning(self, "警告", f"视频文件不存在: {track.segments[0].file_path}")
         except Exception as e:
             print(f"选择视频时出错: {str(e)}")
 
+    def neighbourTracks(self, index):
+        """缩略图栏中与该视频相邻、文件都存在的轨道"""
+        tracks = []
+        for i in range(index - WARM_NEIGHBOURS, index + WARM_NEIGHBOURS + 1):
+            if i != index and 0 <= i < len(self.videoList):
+                track = self.videoList[i]
+                if all(os.path.exists(segment.file_path) for segment in track.segments):
+                    tracks.append(track)
+        return tracks
+
     def togglePlayPause(self):
         """切换播放/暂停状态"""
         try:
-            if self.mediaPlayer.media().isNull():
+            if self.mediaPlayer.track is None:
                 if self.current_video_index >= 0 and self.current_video_index < len(self.videoList):
                     # 有选择视频但尚未加载，先加载视频
-                    video_path = self.videoList[self.current_video_index][0]
-                    if os.path.exists(video_path):
-                        self.mediaPlayer.setMedia(QMediaContent(QUrl.fromLocalFile(video_path)))
+                    self.selectVideo(self.current_video_index)
                 else:
                     QMessageBox.warning(self, "警告", "请先选择一个视频")
                     return
@@ -374,12 +459,26 @@ class VideoPlayer(QMainWindow):
                 current_time = current_time.addMSecs(position)
                 total_time = QTime(0, 0)
                 total_time = total_time.addMSecs(duration)
-                time_format = "mm:ss"
+                time_format = "hh:mm:ss" if duration >= 3600000 else "mm:ss"
                 self.videoContainer.timeLabel.setText(
                     f"{current_time.toString(time_format)} / {total_time.toString(time_format)}")
         except Exception as e:
             print(f"更新位置时出错: {str(e)}")
 
+    def previewFrame(self, position):
+        """进度条悬停位置的画面，胶片条尚未生成时返回None"""
+        track = self.mediaPlayer.track
+        index = track.locate(position) if track is not None else None
+        if index is None:
+            return None
+        segment = track.segments[index]
+        strip = self.filmstripLoader.filmstrip(segment.video_id, segment.file_path, segment.end - segment.start)
+        return strip.frame_at(position - segment.start) if strip else None
+
+    def previewTime(self, position):
+        time_format = "hh:mm:ss" if self.mediaPlayer.duration() >= 3600000 else "mm:ss"
+        return QTime(0, 0).addMSecs(position).toString(time_format)
+
     def durationChanged(self, duration):
         """媒体时长改变时更新进度条范围"""
         try:
@@ -388,12 +487,28 @@ class VideoPlayer(QMainWindow):
             print(f"更新时长时出错: {str(e)}")
 
     def setPosition(self, position):
-        """设置播放位置"""
+        """设置播放位置，拖动进度条时跳到最近的关键帧"""
         try:
+            if self.videoContainer.positionSlider.isSliderDown():
+                # 拖动时直接找到所在分段，跳到该分段内最近的关键帧
+                self.mediaPlayer.prefetch(position)
+                position = self.mediaPlayer.nearest_keyframe(position)
             self.mediaPlayer.setPosition(position)
         except Exception as e:
             print(f"设置位置时出错: {str(e)}")
 
+    def startScrub(self):
+        """拖动进度条期间播放代理视频，每帧都能立即解码"""
+        self.mediaPlayer.set_use_proxy(True)
+
+    def seekExact(self):
+        """松开进度条后切回原始录像并精确定位"""
+        try:
+            self.mediaPlayer.set_use_proxy(False)
+            self.mediaPlayer.setPosition(self.videoContainer.positionSlider.value())
+        except Exception as e:
+            print(f"设置位置时出错: {str(e)}")
+
     def volumeChanged(self, volume):
         """音量改变时更新滑块和图标"""
         try:
@@ -456,17 +571,26 @@ class VideoPlayer(QMainWindow):
     def createThumbnails(self):
         """创建视频缩略图"""
         try:
-            # 清空现有缩略图
+            # 清空现有缩略图，未完成的截图不再需要
+            self.thumbnailLoader.clear()
+            self.thumbnails = []
             while self.thumbnailLayout.count():
                 item = self.thumbnailLayout.takeAt(0)
                 widget = item.widget()
                 if widget:
                     widget.deleteLater()
 
-            # 为每个视频创建缩略图
-            for i, (video_path, _) in enumerate(self.videoList):
-                thumbnail = VideoThumbnail(video_path, i, self.thumbnailContainer)
+            # 为每条轨道创建缩略图，多段录像显示设备和分段数
+            for i, track in enumerate(self.videoList):
+                title = f"{track.key[1]} ({len(track)}段)" if len(track) > 1 else None
+                segment = track.segments[0]
+                thumbnail = VideoThumbnail(segment.file_path, i, self.thumbnailContainer, title)
                 self.thumbnailLayout.addWidget(thumbnail)
+                self.thumbnails.append(thumbnail)
+                # 已缓存的缩略图立即显示，其余在后台生成
+                image_path = self.thumbnailLoader.request(i, segment.file_path, segment.end - segment.start)
+                if image_path:
+                    thumbnail.setImage(image_path)
 
             # 添加弹簧确保缩略图靠左对齐
             self.thumbnailLayout.addStretch()
@@ -476,6 +600,11 @@ class VideoPlayer(QMainWindow):
         except Exception as e:
             print(f"创建缩略图时出错: {str(e)}")
 
+    def showThumbnailImage(self, index, image_path):
+        """后台生成的缩略图完成后显示"""
+        if 0 <= index < len(self.thumbnails):
+            self.thumbnails[index].setImage(image_path)
+
     def loadData(self):
         """加载数据库中的视频信息"""
         try:
@@ -497,9 +626,42 @@ class VideoPlayer(QMainWindow):
                 QMessageBox.warning(self, "警告", "数据库中不存在video_data表")
                 return
 
-            # 查询视频数据
-            self.cursor.execute("SELECT file_path, duration FROM video_data")
-            self.videoList = list(self.cursor.fetchall())
+            # 旧数据库在后台迁移，完成后再读取视频信息
+            migrate_with_progress(self, db_path, lambda completed: self.databaseMigrated(db_path, completed))
+
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "数据库错误", f"读取数据库失败: {str(e)}")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"加载数据时发生错误: {str(e)}")
+
+    def databaseMigrated(self, db_path, completed):
+        """数据库迁移完成后读取视频信息，取消迁移时关闭数据库"""
+        if not completed:
+            self.conn.close()
+            self.conn = None
+            return
+        try:
+            # 查询视频数据，同一设备的分段录像拼接为一条轨道
+            camera = detect_schema(self.conn)["camera"]  # 导入模块为device_id，回放模块为camera_id
+            self.cursor.execute(f'''
+            SELECT id, experiment_id, {camera}, file_path, {video_duration_sql(self.conn)},
+                   start_ts, end_ts
+            FROM video_data
+            ORDER BY {camera}
+            ''')
+            self.videoList, missing_files = build_tracks(self.cursor.fetchall())
+            self.playerPool.clear()
+
+            # 各设备的画面尺寸，用于估算预热播放器占用的内存
+            self.cursor.execute(f'''
+            SELECT experiment_id, {camera}, MAX(width), MAX(height)
+            FROM video_data
+            GROUP BY experiment_id, {camera}
+            ''')
+            self.frameSizes = {(exp_id, device_id): (width, height)
+                               for exp_id, device_id, width, height in self.cursor.fetchall()}
+            for file_path in missing_files:
+                print(f"视频文件不存在: {file_path}")
 
             if not self.videoList:
                 QMessageBox.warning(self, "警告", "未找到视频数据")
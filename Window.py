@@ -30,6 +30,13 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(central_widget)
 
+    def closeEvent(self, event):
+        # 数据导入进行中时先取消并等待后台线程结束
+        if self.data_collection_widget.stop_import():
+            event.accept()
+        else:
+            event.ignore()
+
 
 def main():
     app = QApplication(sys.argv)
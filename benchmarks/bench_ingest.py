@@ -0,0 +1,144 @@
+"""
+导入性能基准 - 生成合成的上位机CSV文件夹，比较逐行INSERT与批量导入的速度
+
+逐行导入按原DataCollectionWidget.process_csv_data的做法: readlines()读入整个文件，
+每行一次cursor.execute，每个文件提交一次；批量导入使用ingest.import_csv_files。
+
+原来的做法已经是每个文件一个事务，没有逐行提交的fsync开销，逐行execute
+比executemany多出的只是Python层的调用开销。另外测量"写入下限": 不做任何解析，
+用executemany把同样行数的现成数据写入同一张表，任何保留sensor_data逐行存储的
+导入方式都不可能比它更快，逐行导入时间除以写入下限就是可能达到的最大加速比。
+单核机器上10M行（10个文件）的实测: 逐行导入59秒，批量导入63秒，写入下限39秒，
+最大加速比约1.5倍，达不到10倍；多核时批量导入的解析可以并行，但写入仍然是
+单线程，加速比同样受写入下限限制。
+
+用法: python benchmarks/bench_ingest.py [--rows 10000000] [--files 10] [--workers N]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from itertools import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+
+LEGACY_INSERT_SQL = '''
+INSERT INTO sensor_data (experiment_id, timestamp, sensor_type, value, file_source)
+VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def write_folder(folder, rows, files):
+    """生成files个CSV文件，共rows行，格式为: 时间,传感器类型,数值"""
+    rows_per_file = rows // files
+    paths = []
+    for index in range(files):
+        path = os.path.join(folder, f"sensor_{index:03d}.csv")
+        with open(path, "w") as f:
+            f.write("timestamp,sensor_type,value\n")
+            base = index * rows_per_file
+            for block in range(0, rows_per_file, 10000):
+                f.write("".join(
+                    f"2024-04-16 {(i // 3600000) % 24:02d}:{(i // 60000) % 60:02d}:{(i // 1000) % 60:02d}"
+                    f".{i % 1000:03d},sensor{i % 16},{i * 0.001:.3f}\n"
+                    for i in range(base + block, base + min(block + 10000, rows_per_file))))
+        paths.append(path)
+    return paths
+
+
+def legacy_import(conn, experiment_id, csv_files):
+    """原来的逐行导入"""
+    cursor = conn.cursor()
+    rows = 0
+    for file_path in csv_files:
+        with open(file_path, 'r') as f:
+            lines = f.readlines()
+            for i, line in enumerate(lines):
+                if i == 0 and ',' in line:
+                    continue
+                parts = line.strip().split(',')
+                if len(parts) >= 3:
+                    try:
+                        value = float(parts[2].strip())
+                    except ValueError:
+                        continue
+                    cursor.execute(LEGACY_INSERT_SQL, (experiment_id, parts[0].strip(),
+                                                       parts[1].strip(), value, file_path))
+                    rows += 1
+        conn.commit()
+    return rows
+
+
+def writer_floor(conn, experiment_id, rows):
+    """不做解析，用executemany写入rows行现成数据，返回用时（秒）"""
+    row = (experiment_id, "2024-04-16 00:00:00.000", 1713225600000000, "sensor0", 0.0,
+           "sensor_000.csv")
+    start = time.perf_counter()
+    with ingest.import_pragmas(conn):
+        for offset in range(0, rows, ingest.BATCH_SIZE):
+            conn.execute("BEGIN")
+            conn.executemany(ingest.SENSOR_INSERT_SQL,
+                             repeat(row, min(ingest.BATCH_SIZE, rows - offset)))
+            conn.commit()
+    return time.perf_counter() - start
+
+
+def open_database(path):
+    conn = sqlite3.connect(path)
+    ingest.create_tables(conn)
+    ingest.save_experiment(conn, "BENCH", "bench", None, None, None)
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000000, help="总行数")
+    parser.add_argument("--files", type=int, default=10, help="文件数")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数，默认为CPU核数")
+    parser.add_argument("--skip-legacy", action="store_true", help="不运行逐行导入")
+    parser.add_argument("--dir", default=None, help="生成数据和数据库的目录，默认为临时目录")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_ingest_", dir=args.dir)
+    try:
+        start = time.perf_counter()
+        csv_files = write_folder(folder, args.rows, args.files)
+        size = sum(os.path.getsize(path) for path in csv_files)
+        print(f"生成 {len(csv_files)} 个文件, {args.rows} 行, {size / (1 << 20):.0f} MB, "
+              f"用时 {time.perf_counter() - start:.1f} 秒")
+
+        legacy_elapsed = None
+        if not args.skip_legacy:
+            conn = open_database(os.path.join(folder, "legacy.db"))
+            start = time.perf_counter()
+            rows = legacy_import(conn, "BENCH", csv_files)
+            legacy_elapsed = time.perf_counter() - start
+            conn.close()
+            print(f"逐行导入: {rows} 行, {legacy_elapsed:.2f} 秒, {rows / legacy_elapsed:,.0f} 行/秒")
+
+        conn = open_database(os.path.join(folder, "bulk.db"))
+        stats = ingest.import_csv_files(conn, "BENCH", csv_files, workers=args.workers)
+        conn.close()
+        print(f"批量导入: {stats}")
+
+        conn = open_database(os.path.join(folder, "floor.db"))
+        floor_elapsed = writer_floor(conn, "BENCH", stats.rows)
+        conn.close()
+        print(f"写入下限: {stats.rows} 行, {floor_elapsed:.2f} 秒, "
+              f"{stats.rows / floor_elapsed:,.0f} 行/秒")
+
+        if legacy_elapsed:
+            print(f"加速比: {legacy_elapsed / stats.elapsed:.1f}x, "
+                  f"写入下限决定的最大加速比: {legacy_elapsed / floor_elapsed:.1f}x")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+时间范围查询基准 - 比较按TEXT列timestamp查询与按整数ts列走复合索引查询的用时
+
+生成不同行数的传感器数据库，对每个数据库执行同样的窄时间范围查询（导出数据）
+和按时间排序的日志查询。timestamp列没有索引，查询为全表扫描加排序，用时随行数线性增长；
+ts列有(experiment_id, sensor_type, ts)和(experiment_id, ts)索引，用时基本不随行数变化。
+
+用法: python benchmarks/bench_queries.py [--sizes 100000,1000000,4000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from itertools import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+from db_schema import create_indexes, format_timestamp_us  # noqa: E402
+
+START_TS = 1713276964000000  # 2024-04-16 14:16:04
+SAMPLE_INTERVAL_US = 1000  # 每路传感器1kHz采样
+SENSOR_TYPES = [f"sensor{i}" for i in range(8)]
+EXPERIMENTS = ["E1", "E2"]
+
+# 查询的时间窗口: 某一路传感器1秒的数据
+WINDOW_US = 1000000
+
+# 每组查询: (名称, 旧查询, 新查询)，参数为 (试验, 传感器类型, 起始, 结束)
+QUERIES = [
+    ("传感器时间范围",
+     "SELECT timestamp, value FROM sensor_data WHERE experiment_id = ? AND sensor_type = ? "
+     "AND timestamp BETWEEN ? AND ? ORDER BY timestamp",
+     "SELECT timestamp, value FROM sensor_data WHERE experiment_id = ? AND sensor_type = ? "
+     "AND ts BETWEEN ? AND ? ORDER BY ts"),
+    ("日志时间范围",
+     "SELECT timestamp, level, message FROM log_data WHERE experiment_id = ? "
+     "AND timestamp BETWEEN ? AND ? ORDER BY timestamp",
+     "SELECT timestamp, level, message FROM log_data WHERE experiment_id = ? "
+     "AND ts BETWEEN ? AND ? ORDER BY ts"),
+]
+
+
+def sensor_rows(experiment_id, count):
+    per_type = count // len(SENSOR_TYPES)
+    for i in range(per_type):
+        ts = START_TS + i * SAMPLE_INTERVAL_US
+        text = format_timestamp_us(ts)
+        for sensor_type in SENSOR_TYPES:
+            yield experiment_id, text, ts, sensor_type, i * 0.001, "bench.csv"
+
+
+def log_rows(experiment_id, count):
+    for i in range(count):
+        ts = START_TS + i * SAMPLE_INTERVAL_US * len(SENSOR_TYPES) // 10
+        yield experiment_id, format_timestamp_us(ts), ts, "INFO", f"message {i}", "bench.log"
+
+
+def build_database(path, rows):
+    """生成数据库: 每个试验rows/2行传感器数据和rows/20行日志"""
+    conn = sqlite3.connect(path)
+    ingest.create_tables(conn)
+    with ingest.import_pragmas(conn):
+        for experiment_id in EXPERIMENTS:
+            count = rows // len(EXPERIMENTS)
+            conn.executemany(ingest.SENSOR_INSERT_SQL, sensor_rows(experiment_id, count))
+            conn.executemany(ingest.LOG_INSERT_SQL, log_rows(experiment_id, count // 10))
+            conn.commit()
+    create_indexes(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def time_query(conn, sql, params, repeat_count):
+    """多次执行取最短用时（毫秒），返回 (用时, 行数)"""
+    best = None
+    for _ in range(repeat_count):
+        start = time.perf_counter()
+        count = len(conn.execute(sql, params).fetchall())
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100000,1000000,4000000", help="数据库行数，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询执行次数")
+    parser.add_argument("--dir", default=None, help="生成数据库的目录，默认为临时目录")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_queries_", dir=args.dir)
+    try:
+        print(f"{'行数':>10} {'查询':<10} {'timestamp(ms)':>14} {'ts(ms)':>10} {'行':>6}  查询计划(ts)")
+        for rows in (int(size) for size in args.sizes.split(",")):
+            conn = build_database(os.path.join(folder, f"bench_{rows}.db"), rows)
+            # 在数据中段取1秒的窗口
+            middle_ts = START_TS + rows // len(EXPERIMENTS) // len(SENSOR_TYPES) // 2 * SAMPLE_INTERVAL_US
+            window = (middle_ts, middle_ts + WINDOW_US)
+            for name, old_sql, new_sql in QUERIES:
+                params = (EXPERIMENTS[-1], SENSOR_TYPES[-1]) if "sensor_type" in old_sql else (EXPERIMENTS[-1],)
+                old_time, old_count = time_query(
+                    conn, old_sql, params + tuple(format_timestamp_us(ts) for ts in window), args.repeat)
+                new_time, new_count = time_query(conn, new_sql, params + window, args.repeat)
+                plan = conn.execute("EXPLAIN QUERY PLAN " + new_sql, params + window).fetchall()
+                print(f"{rows:>10} {name:<10} {old_time:>14.2f} {new_time:>10.2f} {new_count:>6}  "
+                      f"{'; '.join(row[-1] for row in plan)}")
+                assert old_count == new_count
+            conn.close()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
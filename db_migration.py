@@ -0,0 +1,81 @@
+"""
+旧数据库迁移 - 打开旧数据库时在后台回填时间戳、建立索引，界面显示进度并可取消
+不需要耗时迁移的数据库直接在界面线程中补齐结构。
+取消后已回填的部分保留，下次打开时继续。
+"""
+
+import sqlite3
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QMessageBox, QProgressDialog
+
+from db_schema import migrate_database, needs_migration
+from task_runner import start_task
+
+# 进度条的刻度数（回填的行数可能超出int范围，按比例换算）
+PROGRESS_STEPS = 1000
+
+
+def migrate_with_progress(parent, db_path, on_done):
+    """迁移数据库，完成后调用on_done(True)，取消时调用on_done(False)"""
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            required = needs_migration(conn)
+            if not required:
+                migrate_database(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"检查数据库结构失败: {e}")
+        required = False
+    if not required:
+        on_done(True)
+        return
+
+    dialog = QProgressDialog("正在迁移旧数据库（回填时间戳、建立索引）...\n取消后下次打开时继续",
+                             "取消", 0, PROGRESS_STEPS, parent)
+    dialog.setWindowTitle("迁移数据库")
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(0)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+    dialog.setValue(0)
+
+    def query(conn, token):
+        return migrate_database(conn, progress=token.report_progress, should_cancel=token.is_cancelled)
+
+    def close_dialog():
+        # 关闭对话框也会发出canceled信号，先断开
+        dialog.canceled.disconnect(cancel)
+        dialog.close()
+        dialog.deleteLater()
+
+    def progress(done, total):
+        if task.token.is_cancelled():
+            return
+        if total:
+            dialog.setValue(int(done * PROGRESS_STEPS / total))
+        else:
+            dialog.setLabelText("正在建立索引...")
+            dialog.setRange(0, 0)
+
+    def finished(completed):
+        close_dialog()
+        if not completed:
+            QMessageBox.warning(parent, "警告", "数据库迁移未完成，部分查询可能较慢")
+        on_done(True)
+
+    def failed(message):
+        close_dialog()
+        QMessageBox.warning(parent, "警告", f"数据库迁移失败: {message}")
+        on_done(True)
+
+    def cancel():
+        # 已回填的批次已提交，正在执行的SQL被中断
+        task.cancel()
+        close_dialog()
+        on_done(False)
+
+    task = start_task(db_path, query, finished, failed, progress)
+    dialog.canceled.connect(cancel)
@@ -0,0 +1,332 @@
+"""
+数据库结构工具 - 时间戳规范化、索引和旧数据库迁移
+
+时间戳统一存储为整数微秒(ts列)，不带时区的时间按墙钟时间直接换算，
+不做时区转换，这样换算回字符串时与原始数据一致。
+"""
+
+import datetime
+import sqlite3
+import warnings
+
+import numpy as np
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+# 旧数据库回填ts列时每批处理的行数
+BACKFILL_BATCH_ROWS = 50000
+
+# 合理的时间戳范围（微秒）: 1970-01-01 至 2100-01-01，超出的按无法解析处理
+TIMESTAMP_MIN_US = 0
+TIMESTAMP_MAX_US = 4102444800 * 1000000
+
+# 数据导入模块(DataCollection)生成的数据库结构
+IMPORT_SCHEMA = {
+    "experiments_sql": "SELECT id, id, name FROM experiments",
+    "sensor_table": "sensor_data",
+    "sensor_type": "sensor_type",
+    "log_table": "log_data",
+    "log_level": "level",
+    "log_source": "file_source",
+    "camera": "device_id",
+}
+
+# 回放模块(playback_system.create_tables)使用的数据库结构
+PLAYBACK_SCHEMA = {
+    "experiments_sql": "SELECT id, experiment_id, name FROM experiments",
+    "sensor_table": "realtime_data",
+    "sensor_type": "data_type",
+    "log_table": "logs",
+    "log_level": "log_level",
+    "log_source": None,
+    "camera": "camera_id",
+}
+
+# 带时间戳的表及其索引，索引在批量导入完成后创建
+TIMESTAMP_INDEXES = {
+    "sensor_data": [("idx_sensor_data_exp_type_ts", "experiment_id, sensor_type, ts")],
+    "log_data": [("idx_log_data_exp_ts", "experiment_id, ts")],
+    "realtime_data": [("idx_realtime_data_exp_type_ts", "experiment_id, data_type, ts")],
+    "logs": [("idx_logs_exp_ts", "experiment_id, ts")],
+}
+
+
+# 视频表中由导入时探测得到的元数据列
+VIDEO_COLUMNS = [
+    ("duration_ms", "INTEGER"),
+    ("fps", "REAL"),
+    ("width", "INTEGER"),
+    ("height", "INTEGER"),
+    ("codec", "TEXT"),
+    ("frame_count", "INTEGER"),
+    ("start_time", "TEXT"),
+    ("start_ts", "INTEGER"),
+    ("end_time", "TEXT"),
+    ("end_ts", "INTEGER"),
+]
+
+
+def datetime_to_us(dt):
+    """datetime转换为整数微秒"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (dt - EPOCH) // ONE_MICROSECOND
+
+
+def parse_timestamp_us(text):
+    """解析时间字符串为整数微秒，无法解析时返回None
+
+    支持 "2025-04-16 14:16:04"、"2025-04-16T14:16:04.123"、"2025/04/16 14:16:04"
+    以及数字时间戳（按数值大小判断单位为秒、毫秒或微秒）。
+    超出TIMESTAMP_MIN_US~TIMESTAMP_MAX_US的结果视为无法解析。
+    """
+    if text is None:
+        return None
+    text = str(text).strip()
+    if not text:
+        return None
+
+    try:
+        value = float(text)
+    except ValueError:
+        value = None
+    if value is not None:
+        return _checked_ts(_epoch_number_to_us(value))
+
+    try:
+        return _checked_ts(datetime_to_us(datetime.datetime.fromisoformat(text.replace('/', '-'))))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _epoch_number_to_us(value):
+    """数字时间戳换算为微秒: 小于1e11按秒，小于1e14按毫秒，其余按微秒"""
+    magnitude = abs(value)
+    if magnitude < 1e11:
+        return int(round(value * 1000000))
+    if magnitude < 1e14:
+        return int(round(value * 1000))
+    return int(round(value))
+
+
+def _checked_ts(ts):
+    if ts is None or not TIMESTAMP_MIN_US <= ts < TIMESTAMP_MAX_US:
+        return None
+    return ts
+
+
+def _parse_datetime64(texts):
+    with warnings.catch_warnings():
+        # 带时区的时间会被换算为UTC，与datetime_to_us一致，忽略numpy的提示
+        warnings.simplefilter("ignore")
+        return np.array(texts, dtype='datetime64[us]')
+
+
+def _is_date_text(text):
+    """是否是年-月-日开头的时间字符串（numpy.datetime64能整体解析的格式）"""
+    return text[4:5] in ('-', '/') and text[:4].isdigit()
+
+
+def parse_timestamps_us(texts):
+    """批量解析时间字符串为整数微秒列表，无法解析的位置为None
+
+    年-月-日格式的时间用numpy.datetime64整体解析，比逐行解析快数倍；
+    数字时间戳等其他格式交给parse_timestamp_us逐行解析
+    （numpy会把"1713276964"当作年份，不能整体解析）。
+    超出TIMESTAMP_MIN_US~TIMESTAMP_MAX_US的结果视为无法解析。
+    """
+    if not texts:
+        return []
+    result = [None] * len(texts)
+    date_rows = []
+    for i, text in enumerate(texts):
+        if _is_date_text(text):
+            date_rows.append(i)
+        else:
+            result[i] = parse_timestamp_us(text)
+    if not date_rows:
+        return result
+
+    dates = texts if len(date_rows) == len(texts) else [texts[i] for i in date_rows]
+    try:
+        parsed = _parse_datetime64(dates)
+    except ValueError:
+        try:
+            parsed = _parse_datetime64([text.replace('/', '-') for text in dates])
+        except ValueError:
+            for i in date_rows:
+                result[i] = parse_timestamp_us(texts[i])
+            return result
+
+    values = parsed.astype(np.int64)
+    invalid = np.isnat(parsed) | (values < TIMESTAMP_MIN_US) | (values >= TIMESTAMP_MAX_US)
+    values = values.tolist()
+    for row, ts in zip(date_rows, values):
+        result[row] = ts
+    if invalid.any():
+        for j in np.flatnonzero(invalid).tolist():
+            result[date_rows[j]] = None
+    return result
+
+
+def format_timestamp_us(ts):
+    """整数微秒转换为时间字符串"""
+    dt = EPOCH + datetime.timedelta(microseconds=ts)
+    if dt.microsecond:
+        return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def table_exists(conn, table):
+    """检查表是否存在"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (table,)).fetchone() is not None
+
+
+def table_columns(conn, table):
+    """获取表的所有列名"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def detect_schema(conn):
+    """根据数据库中的表判断使用哪种数据库结构"""
+    if table_exists(conn, "sensor_data"):
+        return IMPORT_SCHEMA
+    return PLAYBACK_SCHEMA
+
+
+def add_timestamp_columns(conn, progress=None, should_cancel=None):
+    """为旧数据库添加ts列，并从timestamp文本列按rowid分批回填，返回是否全部完成
+
+    每批用parse_timestamps_us整批解析，与回填进度一起提交；
+    取消或中断后ts_backfill表中留有进度，下次调用从断点继续。
+    progress(done, total) 报告已处理的行数（按rowid估算）；should_cancel() 返回True时返回False。
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS ts_backfill (table_name TEXT PRIMARY KEY, last_rowid INTEGER)")
+    for table in TIMESTAMP_INDEXES:
+        if table_exists(conn, table) and "ts" not in table_columns(conn, table):
+            with conn:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN ts INTEGER")
+                conn.execute("INSERT OR REPLACE INTO ts_backfill VALUES (?, 0)", (table,))
+    conn.commit()
+
+    pending = []
+    for table, last_rowid in conn.execute("SELECT table_name, last_rowid FROM ts_backfill").fetchall():
+        max_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+        pending.append((table, last_rowid, max_rowid))
+    total = sum(max_rowid - last_rowid for _, last_rowid, max_rowid in pending)
+    done = 0
+    for table, last_rowid, max_rowid in pending:
+        while last_rowid < max_rowid:
+            if should_cancel and should_cancel():
+                return False
+            end = min(last_rowid + BACKFILL_BATCH_ROWS, max_rowid)
+            rows = conn.execute(f"SELECT rowid, timestamp FROM {table} "
+                                f"WHERE rowid > ? AND rowid <= ? AND timestamp IS NOT NULL",
+                                (last_rowid, end)).fetchall()
+            values = parse_timestamps_us([str(text) for _, text in rows])
+            with conn:
+                conn.executemany(f"UPDATE {table} SET ts = ? WHERE rowid = ?",
+                                 zip(values, (rowid for rowid, _ in rows)))
+                conn.execute("UPDATE ts_backfill SET last_rowid = ? WHERE table_name = ?", (end, table))
+            done += end - last_rowid
+            last_rowid = end
+            if progress:
+                progress(done, total)
+        with conn:
+            conn.execute("DELETE FROM ts_backfill WHERE table_name = ?", (table,))
+    return True
+
+
+def needs_migration(conn):
+    """是否需要耗时的迁移: 有表缺少ts列、ts列尚未回填完成或缺少时间索引"""
+    for table, indexes in TIMESTAMP_INDEXES.items():
+        if not table_exists(conn, table):
+            continue
+        if "ts" not in table_columns(conn, table):
+            return True
+        for name, _ in indexes:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                            (name,)).fetchone() is None:
+                return True
+    return table_exists(conn, "ts_backfill") and \
+        conn.execute("SELECT 1 FROM ts_backfill LIMIT 1").fetchone() is not None
+
+
+def add_missing_columns(conn, table, columns):
+    """为已存在的表补充缺少的列"""
+    if not table_exists(conn, table):
+        return
+    existing = table_columns(conn, table)
+    for name, column_type in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    conn.commit()
+
+
+def add_video_columns(conn):
+    """为旧数据库的视频表补充元数据列，并从start_time/end_time文本列回填起止时刻"""
+    if not table_exists(conn, "video_data"):
+        return
+    add_missing_columns(conn, "video_data", VIDEO_COLUMNS)
+    conn.create_function("parse_timestamp_us", 1, parse_timestamp_us, deterministic=True)
+    for column in ("start", "end"):
+        conn.execute(f"UPDATE video_data SET {column}_ts = parse_timestamp_us({column}_time) "
+                     f"WHERE {column}_ts IS NULL AND {column}_time IS NOT NULL")
+    conn.commit()
+
+
+def video_duration_sql(conn):
+    """查询视频时长（毫秒）的SQL表达式
+
+    导入模块的视频表有按文件大小估算的duration列（秒），探测失败时duration_ms为空，
+    退回该列；回放模块建的视频表没有duration列。
+    """
+    if "duration" in table_columns(conn, "video_data"):
+        return "COALESCE(duration_ms, duration * 1000)"
+    return "duration_ms"
+
+
+def create_keyframe_table(conn):
+    """创建视频关键帧索引表"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS video_keyframes (
+        video_id INTEGER,
+        pts_ms INTEGER,
+        byte_pos INTEGER,
+        PRIMARY KEY (video_id, pts_ms)
+    ) WITHOUT ROWID
+    ''')
+    conn.commit()
+
+
+def create_indexes(conn):
+    """创建时间范围查询使用的复合索引"""
+    for table, indexes in TIMESTAMP_INDEXES.items():
+        if not table_exists(conn, table):
+            continue
+        for name, columns in indexes:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    conn.commit()
+
+
+def migrate_database(conn, progress=None, should_cancel=None):
+    """把旧数据库(如3.db、4.db)迁移到当前结构，返回是否完成
+
+    大数据库回填ts列和建索引需要较长时间，界面通过db_migration在后台调用，
+    progress和should_cancel的含义同add_timestamp_columns。
+    """
+    try:
+        if not add_timestamp_columns(conn, progress, should_cancel):
+            return False
+        add_video_columns(conn)
+        create_keyframe_table(conn)
+        if progress:
+            progress(0, 0)  # 建索引无法报告进度
+        create_indexes(conn)
+        return True
+    except sqlite3.Error as e:
+        if not (should_cancel and should_cancel()):
+            print(f"数据库迁移失败: {e}")
+        return False
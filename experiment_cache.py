@@ -0,0 +1,151 @@
+"""
+试验数据缓存 - 在进程内按LRU保留最近加载过的试验数据
+缓存键包含数据库路径和文件修改时间，数据库被写入后旧的缓存自然失效。
+超出内存预算时淘汰最久未使用的数据。内存预算在启动时从EXPERIMENT_CACHE_MB环境变量读取。
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 默认内存预算（字节）
+DEFAULT_CACHE_BYTES = 256 << 20
+
+# 指定内存预算（兆字节）的环境变量，0表示不缓存
+CACHE_BUDGET_ENV = "EXPERIMENT_CACHE_MB"
+
+
+def configured_budget():
+    """环境变量指定的内存预算（字节），未指定或无效时使用默认值"""
+    value = os.environ.get(CACHE_BUDGET_ENV)
+    if not value:
+        return DEFAULT_CACHE_BYTES
+    try:
+        megabytes = float(value)
+    except ValueError:
+        megabytes = -1
+    if megabytes < 0:
+        print(f"{CACHE_BUDGET_ENV}={value} 无效，使用默认的缓存预算")
+        return DEFAULT_CACHE_BYTES
+    return int(megabytes * (1 << 20))
+
+
+def database_version(db_path):
+    """数据库文件的修改时间，WAL模式下写入先进入-wal文件，一并计入"""
+    version = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            version.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+
+def cache_key(db_path, experiment_id, kind, *params):
+    """生成缓存键: (数据库路径, 修改时间, 试验编号, 数据种类, 查询参数)"""
+    db_path = os.path.abspath(db_path)
+    return db_path, database_version(db_path), experiment_id, kind, params
+
+
+def estimate_size(value):
+    """估算缓存数据占用的内存（字节）"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ExperimentCache:
+    """LRU缓存 - 可在多个线程中使用"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # 缓存键 -> (数据, 字节数)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """读取缓存，命中时标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        """写入缓存，超出预算时淘汰最久未使用的数据"""
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return  # 单个数据超过预算，不缓存
+            self._entries[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def set_budget(self, max_bytes):
+        """调整内存预算"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """命中统计，用于调整内存预算"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def format_stats(stats):
+    """缓存统计的显示文本"""
+    return (f"命中 {stats['hits']}/{stats['hits'] + stats['misses']} ({stats['hit_rate']:.0%})，"
+            f"{stats['entries']} 项，{stats['bytes'] / (1 << 20):.1f}/{stats['max_bytes'] / (1 << 20):.0f} MB，"
+            f"淘汰 {stats['evictions']} 次")
+
+
+# 回放和导出模块共用的缓存
+experiment_cache = ExperimentCache(configured_budget())
+
+
+def cached(key, compute):
+    """读取缓存，未命中时调用compute()计算并写入缓存"""
+    value = experiment_cache.get(key)
+    if value is None:
+        value = compute()
+        if value is not None:
+            experiment_cache.put(key, value)
+    return value
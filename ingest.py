@@ -0,0 +1,728 @@
+"""
+数据导入引擎 - 批量写入SQLite
+按批解析数据行，在显式事务中用executemany写入，
+并在导入期间临时调整PRAGMA以提高写入速度，导入结束后恢复原值。
+"""
+
+import datetime
+import hashlib
+import locale
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+
+from db_schema import (add_timestamp_columns, add_video_columns, create_keyframe_table,
+                       format_timestamp_us, parse_timestamps_us)
+from keyframe_index import extract_keyframes, store_keyframes
+from video_probe import create_probe_executor, probe_video, recording_times
+
+# 各类数据文件的扩展名
+CSV_EXTENSIONS = ('.csv', '.txt', '.dat')
+LOG_EXTENSIONS = ('.log', '.txt')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# 处理一个视频文件折算成的进度字节数（视频只登记信息，不读取内容）
+VIDEO_PROGRESS_UNIT = 1 << 20
+
+# 每批写入的行数
+BATCH_SIZE = 50000
+
+# 大文件按此大小切分成多个解析任务
+CHUNK_BYTES = 4 << 20
+
+# 单行最大字节数，超长的行会被截断，避免没有换行符的文件被整体读入内存
+MAX_LINE_BYTES = 1 << 20
+
+# 每个解析进程最多积压的已完成任务数，用于限制内存占用
+MAX_PENDING_PER_WORKER = 2
+
+# 待解析数据小于此大小时在当前线程解析，省去启动进程池的开销
+PARALLEL_MIN_BYTES = 16 << 20
+
+# 导入期间使用的PRAGMA（cache_size为负数时单位为KiB，这里约256MB）
+IMPORT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": -262144,
+    "temp_store": "MEMORY",
+}
+
+SENSOR_INSERT_SQL = '''
+INSERT INTO sensor_data (experiment_id, timestamp, ts, sensor_type, value, file_source)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+LOG_INSERT_SQL = '''
+INSERT INTO log_data (experiment_id, timestamp, ts, level, message, file_source)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# 日志行格式: [2025-04-16 14:16:04.123] [INFO] 消息 或 2025-04-16 14:16:04 INFO 消息
+LOG_LINE_PATTERN = re.compile(
+    r'^\[?(\d{4}[-/]\d{2}[-/]\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)\]?\s+'
+    r'\[?([A-Za-z]+)\]?:?\s+(.*)$')
+
+VIDEO_INSERT_SQL = '''
+INSERT INTO video_data (experiment_id, device_id, file_path, duration, file_size,
+                        duration_ms, fps, width, height, codec, frame_count, start_time, start_ts,
+                        end_time, end_ts)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# 导入时写入数据的表，取消导入时按id回滚
+DATA_TABLES = ("sensor_data", "log_data", "video_data")
+
+# 各数据表中记录来源文件路径的列
+SOURCE_COLUMNS = {
+    "sensor_data": "file_source",
+    "log_data": "file_source",
+    "video_data": "file_path",
+}
+
+# 按数据表id关联的附属表，删除数据行时一并删除: 数据表 -> (附属表, 关联列)
+DEPENDENT_TABLES = {
+    "video_data": ("video_keyframes", "video_id"),
+}
+
+# 计算文件内容哈希时每次读取的字节数
+HASH_BLOCK_BYTES = 1 << 20
+
+
+class ImportCancelled(Exception):
+    """导入被用户取消"""
+
+
+def create_tables(conn):
+    """创建数据库表结构"""
+    cursor = conn.cursor()
+
+    # 创建实验信息表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS experiments (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        description TEXT
+    )
+    ''')
+
+    # 创建上位机数据表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        experiment_id TEXT,
+        timestamp TEXT,
+        ts INTEGER,
+        sensor_type TEXT,
+        value REAL,
+        file_source TEXT,
+        FOREIGN KEY (experiment_id) REFERENCES experiments(id)
+    )
+    ''')
+
+    # 创建视频数据表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS video_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        experiment_id TEXT,
+        device_id TEXT,
+        file_path TEXT,
+        duration INTEGER,
+        file_size INTEGER,
+        duration_ms INTEGER,
+        fps REAL,
+        width INTEGER,
+        height INTEGER,
+        codec TEXT,
+        frame_count INTEGER,
+        start_time TEXT,
+        start_ts INTEGER,
+        end_time TEXT,
+        end_ts INTEGER,
+        FOREIGN KEY (experiment_id) REFERENCES experiments(id)
+    )
+    ''')
+
+    # 创建日志数据表
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS log_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        experiment_id TEXT,
+        timestamp TEXT,
+        ts INTEGER,
+        level TEXT,
+        message TEXT,
+        file_source TEXT,
+        FOREIGN KEY (experiment_id) REFERENCES experiments(id)
+    )
+    ''')
+
+    # 创建导入清单表，记录已导入的文件，用于增量导入和断点续传
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS import_manifest (
+        experiment_id TEXT,
+        path TEXT,
+        kind TEXT,
+        file_size INTEGER,
+        mtime_ns INTEGER,
+        content_hash TEXT,
+        first_row_id INTEGER,
+        last_row_id INTEGER,
+        row_count INTEGER,
+        run_id INTEGER,
+        imported_at TEXT,
+        PRIMARY KEY (experiment_id, path)
+    )
+    ''')
+
+    conn.commit()
+
+    # 旧数据库补充ts列和视频元数据列，索引在批量导入完成后再创建
+    add_timestamp_columns(conn)
+    add_video_columns(conn)
+    create_keyframe_table(conn)
+
+
+def save_experiment(conn, experiment_id, name, start_time, end_time, description):
+    """保存实验基本信息，已存在时更新，返回是否为新建的实验"""
+    created = conn.execute("SELECT 1 FROM experiments WHERE id = ?",
+                           (experiment_id,)).fetchone() is None
+    conn.execute('''
+    INSERT INTO experiments (id, name, start_time, end_time, description)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name = excluded.name,
+        start_time = excluded.start_time,
+        end_time = excluded.end_time,
+        description = excluded.description
+    ''', (experiment_id, name, start_time, end_time, description))
+    conn.commit()
+    return created
+
+
+def snapshot_row_ids(conn):
+    """记录导入开始前各数据表的最大id，用于取消时回滚"""
+    snapshot = {}
+    for table in DATA_TABLES:
+        snapshot[table] = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    return snapshot
+
+
+def rollback_import(conn, snapshot, manifest, experiment_created):
+    """撤销本次导入已提交的数据"""
+    if conn.in_transaction:
+        conn.rollback()
+    for table, max_id in snapshot.items():
+        conn.execute(f"DELETE FROM {table} WHERE id > ?", (max_id,))
+        if table in DEPENDENT_TABLES:
+            dependent, column = DEPENDENT_TABLES[table]
+            conn.execute(f"DELETE FROM {dependent} WHERE {column} > ?", (max_id,))
+    conn.execute("DELETE FROM import_manifest WHERE run_id = ?", (manifest.run_id,))
+    if experiment_created:
+        conn.execute("DELETE FROM experiments WHERE id = ?", (manifest.experiment_id,))
+    conn.commit()
+
+
+def file_content_hash(file_path):
+    """计算文件内容哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sequence_value(conn, table):
+    """AUTOINCREMENT表当前分配到的最大id"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+class ImportManifest:
+    """导入清单 - 按路径、大小、修改时间和可选的内容哈希判断文件是否需要重新导入
+
+    每个文件的数据行和它的清单记录在同一个事务中提交，导入中断后重新运行时
+    会从最后一个已提交的文件之后继续。
+    """
+
+    def __init__(self, conn, experiment_id, use_hash=False):
+        self.experiment_id = experiment_id
+        self.use_hash = use_hash
+        self.run_id = conn.execute(
+            "SELECT COALESCE(MAX(run_id), 0) + 1 FROM import_manifest").fetchone()[0]
+        self.entries = {}
+        for row in conn.execute('''
+                SELECT path, file_size, mtime_ns, content_hash, first_row_id, last_row_id
+                FROM import_manifest WHERE experiment_id = ?''', (experiment_id,)):
+            self.entries[row[0]] = row[1:]
+        self.file_info = {}  # 本次待导入文件: 路径 -> (大小, 修改时间, 内容哈希)
+        self.skipped_files = 0
+        self._start_seq = 0
+
+    def pending_files(self, conn, files):
+        """筛选出新增或已变化的文件"""
+        pending = []
+        for file_path in files:
+            try:
+                st = os.stat(file_path)
+            except OSError as e:
+                print(f"处理文件 {file_path} 时出错: {str(e)}")
+                continue
+
+            entry = self.entries.get(file_path)
+            if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                self.skipped_files += 1
+                continue
+
+            content_hash = file_content_hash(file_path) if self.use_hash else None
+            if entry is not None and content_hash is not None and entry[2] == content_hash:
+                # 只有修改时间变化，内容未变，更新清单即可
+                conn.execute('''
+                UPDATE import_manifest SET file_size = ?, mtime_ns = ?
+                WHERE experiment_id = ? AND path = ?
+                ''', (st.st_size, st.st_mtime_ns, self.experiment_id, file_path))
+                self.skipped_files += 1
+                continue
+
+            self.file_info[file_path] = (st.st_size, st.st_mtime_ns, content_hash)
+            pending.append(file_path)
+
+        conn.commit()
+        return pending
+
+    def begin_file(self, conn, table, file_path):
+        """开始导入一个文件: 删除该文件上次导入的旧数据"""
+        entry = self.entries.get(file_path)
+        if entry is not None and entry[3] is not None:
+            stale_rows = f"FROM {table} WHERE id BETWEEN ? AND ? AND {SOURCE_COLUMNS[table]} = ?"
+            if table in DEPENDENT_TABLES:
+                dependent, column = DEPENDENT_TABLES[table]
+                conn.execute(f"DELETE FROM {dependent} WHERE {column} IN (SELECT id {stale_rows})",
+                             (entry[3], entry[4], file_path))
+            conn.execute(f"DELETE {stale_rows}", (entry[3], entry[4], file_path))
+        self._start_seq = _sequence_value(conn, table)
+
+    def finish_file(self, conn, table, kind, file_path, row_count):
+        """记录文件已导入（与数据在同一事务中提交）"""
+        size, mtime_ns, content_hash = self.file_info[file_path]
+        conn.execute('''
+        INSERT OR REPLACE INTO import_manifest
+            (experiment_id, path, kind, file_size, mtime_ns, content_hash,
+             first_row_id, last_row_id, row_count, run_id, imported_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (self.experiment_id, file_path, kind, size, mtime_ns, content_hash,
+              self._start_seq + 1, _sequence_value(conn, table), row_count, self.run_id,
+              datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def find_files(folder_path, extensions):
+    """递归查找文件夹下指定扩展名的文件"""
+    found_files = []
+    if not folder_path or not os.path.exists(folder_path):
+        return found_files
+
+    for root, _, files in os.walk(folder_path):
+        for file in files:
+            if file.lower().endswith(extensions):
+                found_files.append(os.path.join(root, file))
+    return found_files
+
+
+@contextmanager
+def import_pragmas(conn, pragmas=None):
+    """导入期间临时修改PRAGMA，退出时恢复原值"""
+    pragmas = IMPORT_PRAGMAS if pragmas is None else pragmas
+
+    # journal_mode不能在事务中修改，先提交已有事务
+    conn.commit()
+    saved = {}
+    for name, value in pragmas.items():
+        saved[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        conn.execute(f"PRAGMA {name} = {value}")
+
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        for name, value in saved.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+
+class ImportProgress:
+    """导入进度 - 累计已处理的文件数和字节数，并检查是否被取消"""
+
+    def __init__(self, total_files=0, total_bytes=0, callback=None, should_cancel=None):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.done_files = 0
+        self.done_bytes = 0
+        self.callback = callback  # callback(progress)
+        self.should_cancel = should_cancel
+
+    def advance(self, nbytes=0, files=0):
+        self.done_bytes += nbytes
+        self.done_files += files
+        if self.callback:
+            self.callback(self)
+        self.check_cancel()
+
+    def check_cancel(self):
+        if self.should_cancel and self.should_cancel():
+            raise ImportCancelled()
+
+
+class IngestStats:
+    """导入统计信息"""
+
+    def __init__(self):
+        self.files = 0
+        self.rows = 0
+        self.skipped_lines = 0
+        self.failed_files = 0  # 读取或解析出错而跳过的文件数
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.rows / self.elapsed
+
+    def __str__(self):
+        text = (f"{self.files}个文件, {self.rows}行, "
+                f"耗时{self.elapsed:.2f}秒, {self.rows_per_sec:,.0f}行/秒")
+        if self.failed_files:
+            text += f", {self.failed_files}个文件出错"
+        return text
+
+
+def default_workers():
+    """默认解析进程数"""
+    return os.cpu_count() or 1
+
+
+def plan_chunks(file_path, chunk_bytes=CHUNK_BYTES):
+    """把文件按字节范围切分成解析任务，返回[(start, end), ...]"""
+    file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        return [(0, 0)]
+    return [(start, min(start + chunk_bytes, file_size))
+            for start in range(0, file_size, chunk_bytes)]
+
+
+def read_chunk_lines(file_path, start, end, encoding=None):
+    """读取字节范围[start, end)内开始的所有完整行"""
+    encoding = encoding or locale.getpreferredencoding(False)
+    with open(file_path, 'rb') as f:
+        if start > 0:
+            # 跳过属于上一块的不完整行
+            f.seek(start - 1)
+            f.readline(MAX_LINE_BYTES)
+        begin = f.tell()
+        if begin >= end:
+            return []
+        data = f.read(end - begin)
+        if data and not data.endswith(b'\n'):
+            # 补全跨越块尾的最后一行
+            data += f.readline(MAX_LINE_BYTES)
+    return data.decode(encoding, errors='replace').split('\n')
+
+
+def parse_csv_chunk(file_path, start, end):
+    """解析CSV文件的一个字节范围，格式为: 时间,传感器类型,数值
+
+    在解析进程中运行，按列返回结果以减少进程间传输的开销:
+    (时间列表, 微秒时间戳列表, 传感器类型列表, 数值列表), 跳过的行数
+    """
+    timestamps = []
+    sensor_types = []
+    values = []
+    skipped = 0
+
+    for i, line in enumerate(read_chunk_lines(file_path, start, end)):
+        if i == 0 and start == 0 and ',' in line:  # 跳过可能的标题行
+            continue
+
+        parts = line.strip().split(',')
+        if len(parts) < 3:
+            continue
+
+        try:
+            value = float(parts[2].strip())
+        except ValueError:
+            # 跳过不符合格式的行
+            skipped += 1
+            continue
+
+        timestamps.append(parts[0].strip())
+        sensor_types.append(parts[1].strip())
+        values.append(value)
+
+    # 整块一次性解析时间戳
+    ts_values = parse_timestamps_us(timestamps)
+    return (timestamps, ts_values, sensor_types, values), skipped
+
+
+def parse_log_chunk(file_path, start, end):
+    """解析日志文件的一个字节范围
+
+    假设格式为: [时间] [级别] 消息，或者简单的格式如: 时间 级别 消息。
+    返回 (时间列表, 微秒时间戳列表, 级别列表, 消息列表), 跳过的行数
+    """
+    timestamps = []
+    levels = []
+    messages = []
+    skipped = 0
+
+    for line in read_chunk_lines(file_path, start, end):
+        line = line.strip()
+        match = LOG_LINE_PATTERN.match(line)
+        if match:
+            timestamp, level, message = match.groups()
+        else:
+            parts = line.split(' ', 2)
+            if len(parts) < 3:
+                if parts[0]:
+                    skipped += 1
+                continue
+            timestamp, level, message = parts
+
+        timestamps.append(timestamp.strip())
+        levels.append(level.strip())
+        messages.append(message.strip())
+
+    ts_values = parse_timestamps_us([timestamp.replace(',', '.') for timestamp in timestamps])
+    return (timestamps, ts_values, levels, messages), skipped
+
+
+class _InlineExecutor:
+    """在当前线程中直接执行任务，接口与ProcessPoolExecutor一致"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+
+def create_parse_executor(workers, total_bytes):
+    """按数据量和进程数选择解析执行器"""
+    if workers > 1 and total_bytes >= PARALLEL_MIN_BYTES:
+        # 使用spawn启动解析进程，避免在带Qt线程的进程中fork
+        return ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+    return _InlineExecutor()
+
+
+def iter_chunk_tasks(files, chunk_bytes=CHUNK_BYTES):
+    """按文件顺序生成解析任务: (文件路径, start, end, 是否为该文件最后一块)"""
+    for file_path in files:
+        try:
+            chunks = plan_chunks(file_path, chunk_bytes)
+        except OSError as e:
+            print(f"处理文件 {file_path} 时出错: {str(e)}")
+            continue
+        for i, (start, end) in enumerate(chunks):
+            yield file_path, start, end, i == len(chunks) - 1
+
+
+def import_chunked_files(conn, experiment_id, files, parse_chunk, insert_sql, table, kind,
+                         batch_size=BATCH_SIZE, progress=None, workers=None, manifest=None):
+    """按块流式导入数据文件
+
+    解析任务分发到进程池并行执行，结果按提交顺序交给当前线程唯一的写入者，
+    每个文件在一个显式事务中写入。在途任务数有上限，内存占用只取决于
+    块大小和进程数，与文件大小无关。
+    """
+    stats = IngestStats()
+    start_time = time.perf_counter()
+    workers = workers or default_workers()
+    max_pending = max(2, workers * MAX_PENDING_PER_WORKER)
+
+    with import_pragmas(conn), \
+            create_parse_executor(workers, total_file_size(files)) as executor:
+        pending = deque()
+        tasks = iter_chunk_tasks(files)
+        failed_file = None
+        file_rows = 0
+
+        try:
+            while True:
+                # 保持在途任务数不超过上限（有界队列）
+                while len(pending) < max_pending:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    file_path, start, end, _ = task
+                    pending.append((task, executor.submit(parse_chunk, file_path, start, end)))
+
+                if not pending:
+                    break
+
+                (file_path, start, end, is_last), future = pending.popleft()
+                if file_path != failed_file:
+                    try:
+                        columns, skipped = future.result()
+                        if not conn.in_transaction:
+                            conn.execute("BEGIN")
+                            file_rows = 0
+                            if manifest is not None:
+                                manifest.begin_file(conn, table, file_path)
+
+                        row_count = len(columns[0])
+                        for offset in range(0, row_count, batch_size):
+                            conn.executemany(insert_sql, zip(
+                                repeat(experiment_id),
+                                *(column[offset:offset + batch_size] for column in columns),
+                                repeat(file_path)))
+                        file_rows += row_count
+                        stats.skipped_lines += skipped
+
+                        if is_last:
+                            if manifest is not None:
+                                manifest.finish_file(conn, table, kind, file_path, file_rows)
+                            conn.commit()
+                            stats.files += 1
+                            stats.rows += file_rows
+
+                    except ImportCancelled:
+                        raise
+                    except Exception as e:
+                        if conn.in_transaction:
+                            conn.rollback()
+                        failed_file = file_path
+                        stats.failed_files += 1
+                        print(f"处理文件 {file_path} 时出错: {str(e)}")
+
+                if progress is not None:
+                    progress.advance(end - start, files=1 if is_last else 0)
+
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    stats.elapsed = time.perf_counter() - start_time
+    return stats
+
+
+def import_csv_files(conn, experiment_id, csv_files, batch_size=BATCH_SIZE, progress=None,
+                     workers=None, manifest=None):
+    """批量导入上位机CSV文件"""
+    return import_chunked_files(conn, experiment_id, csv_files, parse_csv_chunk,
+                                SENSOR_INSERT_SQL, "sensor_data", "csv",
+                                batch_size, progress, workers, manifest)
+
+
+def import_log_files(conn, experiment_id, log_files, batch_size=BATCH_SIZE, progress=None,
+                     workers=None, manifest=None):
+    """批量导入日志文件"""
+    return import_chunked_files(conn, experiment_id, log_files, parse_log_chunk,
+                                LOG_INSERT_SQL, "log_data", "log",
+                                batch_size, progress, workers, manifest)
+
+
+def probe_video_file(file_path, should_cancel=None):
+    """探测视频元数据并提取关键帧索引（在探测线程池中运行），取消时结束ffprobe"""
+    if should_cancel and should_cancel():
+        return None, None
+    return probe_video(file_path, should_cancel), extract_keyframes(file_path, should_cancel)
+
+
+def import_video_files(conn, experiment_id, video_files, device_id, size_per_second, progress=None,
+                       manifest=None, workers=None):
+    """登记视频文件信息(NVR和高速摄像机)，返回IngestStats（每个视频计一行）
+
+    视频元数据和关键帧索引由线程池并行探测（每个任务启动ffprobe进程），
+    探测结果按文件顺序写入。无法探测时按文件大小估算时长。
+    录像的起止时刻取自文件名或容器元数据，用于在回放时按墙钟时间对齐各路视频。
+    已不存在或无法读取的文件、探测出错的文件跳过并计入failed_files，不中断整个导入。
+    探测任务检查导入是否被取消，取消时结束正在运行的ffprobe。
+    """
+    stats = IngestStats()
+    start_time = time.perf_counter()
+    should_cancel = progress.should_cancel if progress is not None else None
+    executor = create_probe_executor(workers)
+    try:
+        futures = [(file_path, executor.submit(probe_video_file, file_path, should_cancel))
+                   for file_path in video_files]
+        with import_pragmas(conn):
+            for file_path, future in futures:
+                try:
+                    file_size = os.path.getsize(file_path)  # 获取文件大小（字节）
+                    info, keyframes = future.result()
+                except Exception as e:
+                    # NVR录像可能在扫描后被循环覆盖删除，探测也可能出错
+                    print(f"处理文件 {file_path} 时出错: {str(e)}")
+                    stats.failed_files += 1
+                    if progress is not None:
+                        progress.advance(VIDEO_PROGRESS_UNIT, files=1)
+                    continue
+                if progress is not None:
+                    progress.check_cancel()  # 取消时探测结果不完整，不再写入
+
+                if manifest is not None:
+                    manifest.begin_file(conn, "video_data", file_path)
+                if info is None:
+                    # 无法读取视频信息时按文件大小估算时长（秒）
+                    info = {"duration_ms": None, "fps": None, "width": None, "height": None,
+                            "codec": None, "frame_count": None, "start_ts": None}
+                    duration = file_size // size_per_second
+                else:
+                    duration = int(round(info["duration_ms"] / 1000))
+
+                start_ts, end_ts = recording_times(file_path, info)
+                if end_ts is None and start_ts is not None and duration:
+                    end_ts = start_ts + duration * 1000000  # 按估算的时长推算
+                cursor = conn.execute(VIDEO_INSERT_SQL, (
+                    experiment_id, device_id, file_path, duration, file_size,
+                    info["duration_ms"], info["fps"], info["width"], info["height"], info["codec"],
+                    info["frame_count"], format_timestamp_us(start_ts) if start_ts is not None else None,
+                    start_ts, format_timestamp_us(end_ts) if end_ts is not None else None, end_ts))
+                store_keyframes(conn, cursor.lastrowid, keyframes)
+                stats.files += 1
+                stats.rows += 1
+
+                # 每个文件与它的清单记录一起提交，中断后重新导入时从下一个文件继续
+                if manifest is not None:
+                    manifest.finish_file(conn, "video_data", "video", file_path, 1)
+                conn.commit()
+
+                if progress is not None:
+                    progress.advance(VIDEO_PROGRESS_UNIT, files=1)
+
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+
+    executor.shutdown()
+    stats.elapsed = time.perf_counter() - start_time
+    return stats
+
+
+def total_file_size(files):
+    """统计文件总字节数"""
+    total = 0
+    for file_path in files:
+        try:
+            total += os.path.getsize(file_path)
+        except OSError:
+            continue
+    return total
@@ -0,0 +1,186 @@
+"""
+关键帧索引 - 记录每个视频关键帧的时间和字节位置
+导入时提取并保存到video_keyframes表，播放时用于二分查找最近的可解码帧，
+并在跳转前预读目标附近的数据。
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from video_probe import av, find_tool, run_tool
+
+KEYFRAME_INSERT_SQL = '''
+INSERT OR REPLACE INTO video_keyframes (video_id, pts_ms, byte_pos)
+VALUES (?, ?, ?)
+'''
+
+# 提取关键帧的超时时间（秒），ffprobe只读封装层，多小时的录像也应在此时间内完成
+KEYFRAME_TIMEOUT = 600
+
+# 用PyAV读取数据包时每隔多少个包检查一次是否取消
+CANCEL_CHECK_PACKETS = 1000
+
+# 跳转时最多预读的字节数
+PREFETCH_MAX_BYTES = 64 << 20
+
+# 预读文件时每次读取的字节数
+PREFETCH_BLOCK_BYTES = 1 << 20
+
+# 预读在单独的线程中顺序执行，不阻塞界面
+_prefetch_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def _keyframes_with_ffprobe(ffprobe, file_path, should_cancel=None):
+    # 只解析封装层的数据包，不解码画面
+    args = [ffprobe, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,pos,flags", "-of", "compact=p=0", file_path]
+    output = run_tool(args, timeout=KEYFRAME_TIMEOUT, should_cancel=should_cancel)
+    if output is None:
+        return None
+
+    keyframes = []
+    start = None
+    for line in output.decode("utf-8", errors="replace").splitlines():
+        fields = dict(item.split('=', 1) for item in line.strip().split('|') if '=' in item)
+        try:
+            pts = float(fields.get("pts_time", ""))
+        except ValueError:
+            continue
+        if start is None or pts < start:
+            start = pts
+        if 'K' in fields.get("flags", ""):
+            pos = fields.get("pos", "")
+            keyframes.append((pts, int(pos) if pos.isdigit() else None))
+
+    if start is None:
+        return None
+    # 时间换算为相对视频开头的毫秒数，与QMediaPlayer的播放位置一致
+    return sorted((int(round((pts - start) * 1000)), pos) for pts, pos in keyframes)
+
+
+def _keyframes_with_pyav(file_path, should_cancel=None):
+    try:
+        with av.open(file_path) as container:
+            if not container.streams.video:
+                return None
+            stream = container.streams.video[0]
+            keyframes = []
+            start = None
+            for count, packet in enumerate(container.demux(stream)):
+                if should_cancel and count % CANCEL_CHECK_PACKETS == 0 and should_cancel():
+                    return None
+                if packet.pts is None:
+                    continue
+                pts = float(packet.pts * stream.time_base)
+                if start is None or pts < start:
+                    start = pts
+                if packet.is_keyframe:
+                    keyframes.append((pts, packet.pos))
+            if start is None:
+                return None
+            return sorted((int(round((pts - start) * 1000)), pos) for pts, pos in keyframes)
+    except Exception as e:
+        print(f"读取视频 {file_path} 关键帧时出错: {str(e)}")
+        return None
+
+
+def extract_keyframes(file_path, should_cancel=None):
+    """提取视频的关键帧列表[(毫秒, 字节位置)]，失败、超时或取消时返回None
+
+    should_cancel() 返回True时结束ffprobe（或停止读取），导入取消时不必等长视频读完。
+    """
+    ffprobe = find_tool("ffprobe")
+    if ffprobe:
+        return _keyframes_with_ffprobe(ffprobe, file_path, should_cancel)
+    if av is not None:
+        return _keyframes_with_pyav(file_path, should_cancel)
+    return None
+
+
+def store_keyframes(conn, video_id, keyframes):
+    """保存视频的关键帧索引（由调用方提交事务）"""
+    conn.execute("DELETE FROM video_keyframes WHERE video_id = ?", (video_id,))
+    if keyframes:
+        conn.executemany(KEYFRAME_INSERT_SQL,
+                         ((video_id, pts_ms, byte_pos) for pts_ms, byte_pos in keyframes))
+
+
+class KeyframeIndex:
+    """关键帧索引 - 按播放位置二分查找关键帧，复杂度O(log n)"""
+
+    def __init__(self, keyframes=()):
+        self.pts_ms = [pts_ms for pts_ms, _ in keyframes]
+        self.byte_pos = [byte_pos for _, byte_pos in keyframes]
+
+    @classmethod
+    def load(cls, conn, video_id):
+        """从数据库读取视频的关键帧索引，没有索引时返回空索引"""
+        try:
+            rows = conn.execute('''
+            SELECT pts_ms, byte_pos FROM video_keyframes
+            WHERE video_id = ? ORDER BY pts_ms
+            ''', (video_id,)).fetchall()
+        except Exception as e:
+            print(f"读取关键帧索引时出错: {str(e)}")
+            rows = []
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.pts_ms)
+
+    def floor_index(self, position_ms):
+        """不晚于指定位置的最后一个关键帧的下标，从该帧开始解码可以到达目标帧"""
+        return max(bisect_right(self.pts_ms, position_ms) - 1, 0)
+
+    def floor(self, position_ms):
+        """不晚于指定位置的关键帧时间（毫秒）"""
+        if not self.pts_ms:
+            return position_ms
+        return self.pts_ms[self.floor_index(position_ms)]
+
+    def nearest(self, position_ms):
+        """距离指定位置最近的关键帧时间（毫秒）"""
+        if not self.pts_ms:
+            return position_ms
+        i = bisect_left(self.pts_ms, position_ms)
+        candidates = self.pts_ms[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda pts: abs(pts - position_ms))
+
+    def byte_range(self, position_ms, keyframes_after=1):
+        """指定位置所在GOP的字节范围(起始, 结束)，结束为None表示到文件末尾"""
+        if not self.pts_ms:
+            return None
+        i = self.floor_index(position_ms)
+        start = self.byte_pos[i]
+        if start is None:
+            return None
+        j = i + keyframes_after
+        end = self.byte_pos[j] if j < len(self.byte_pos) else None
+        return start, end
+
+
+def _prefetch(file_path, start, end):
+    length = min(end - start, PREFETCH_MAX_BYTES) if end is not None else PREFETCH_MAX_BYTES
+    try:
+        with open(file_path, 'rb') as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), start, length, os.POSIX_FADV_WILLNEED)
+                return
+            # 不支持fadvise的系统上直接读取一遍，让数据进入系统缓存
+            f.seek(start)
+            while length > 0:
+                block = f.read(min(PREFETCH_BLOCK_BYTES, length))
+                if not block:
+                    break
+                length -= len(block)
+    except OSError as e:
+        print(f"预读视频 {file_path} 时出错: {str(e)}")
+
+
+def prefetch_around(file_path, keyframes, position_ms):
+    """在后台预读跳转目标所在GOP的数据"""
+    byte_range = keyframes.byte_range(position_ms) if keyframes else None
+    if byte_range is None:
+        return
+    _prefetch_executor.submit(_prefetch, file_path, *byte_range)
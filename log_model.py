@@ -0,0 +1,242 @@
+"""
+日志表格模型 - 按需分页读取日志
+表格滚动到底部时才读取下一页，按(ts, id)做键集分页，
+每页都是索引上的一次范围查询，与日志总量无关。
+"""
+
+from bisect import bisect_left
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from PyQt5.QtGui import QBrush, QColor
+
+# 每次读取的行数
+LOG_PAGE_SIZE = 500
+
+# 定位到某一时刻时最多继续读取的页数，超过后从该时刻附近重新分页
+SEEK_FETCH_PAGES = 4
+
+LOG_HEADERS = ["时间", "级别", "消息"]
+
+# 当前时刻对应日志行的背景色
+CURRENT_ROW_BRUSH = QBrush(QColor(255, 236, 153))
+
+# ts为NULL的日志排在最前面，二分查找时用此值代替
+NULL_TS = -(1 << 63)
+
+
+def fetch_log_page(conn, schema, experiment_id, after=None, limit=LOG_PAGE_SIZE):
+    """读取一页日志，after为上一页最后一行的(ts, id)，None表示从头读取
+
+    返回 [(id, ts, 时间, 级别, 消息)]。ts为NULL的日志排在最前面（与ORDER BY ts一致），
+    按id分页；之后的日志按(ts, id)分页，都可以使用(experiment_id, ts)索引。
+    """
+    columns = f"id, ts, timestamp, {schema['log_level']}, message"
+    table = schema['log_table']
+    rows = []
+    if after is None or after[0] is None:
+        last_id = after[1] if after is not None else 0
+        rows = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE experiment_id = ? AND ts IS NULL AND id > ? "
+            f"ORDER BY id LIMIT ?",
+            (experiment_id, last_id, limit)).fetchall()
+        if len(rows) == limit:
+            return rows
+        after = (None, None)
+
+    if after[0] is None:
+        rows += conn.execute(
+            f"SELECT {columns} FROM {table} WHERE experiment_id = ? AND ts IS NOT NULL "
+            f"ORDER BY ts, id LIMIT ?",
+            (experiment_id, limit - len(rows))).fetchall()
+    else:
+        rows += conn.execute(
+            f"SELECT {columns} FROM {table} WHERE experiment_id = ? AND (ts, id) > (?, ?) "
+            f"ORDER BY ts, id LIMIT ?",
+            (experiment_id, after[0], after[1], limit - len(rows))).fetchall()
+    return rows
+
+
+def fetch_log_page_before(conn, schema, experiment_id, before, limit=LOG_PAGE_SIZE):
+    """读取(ts, id)在before之前的一页日志，按正序返回"""
+    columns = f"id, ts, timestamp, {schema['log_level']}, message"
+    table = schema['log_table']
+    rows = []
+    if before[0] is not None:
+        rows = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE experiment_id = ? AND (ts, id) < (?, ?) "
+            f"ORDER BY ts DESC, id DESC LIMIT ?",
+            (experiment_id, before[0], before[1], limit)).fetchall()
+        if len(rows) == limit:
+            return rows[::-1]
+        before = (None, None)
+
+    condition, params = ("", ()) if before[1] is None else ("AND id < ?", (before[1],))
+    rows += conn.execute(
+        f"SELECT {columns} FROM {table} WHERE experiment_id = ? AND ts IS NULL {condition} "
+        f"ORDER BY id DESC LIMIT ?",
+        (experiment_id, *params, limit - len(rows))).fetchall()
+    return rows[::-1]
+
+
+class LogTableModel(QAbstractTableModel):
+    """日志表格模型 - 通过canFetchMore/fetchMore分页加载"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.conn = None
+        self.schema = None
+        self.experiment_id = None
+        self.page_size = LOG_PAGE_SIZE
+        self._rows = []  # [(id, ts, 时间, 级别, 消息)]
+        self._keys = []  # 每行的ts，用于二分查找
+        self._exhausted = True  # 后面没有更多日志
+        self._exhausted_before = True  # 前面没有更多日志
+        self.current_row = -1  # 高亮显示的行
+
+    def reset(self, conn, schema, experiment_id, first_page=None):
+        """切换到另一个试验的日志，first_page为已在后台读取的第一页"""
+        self.beginResetModel()
+        self.conn = conn
+        self.schema = schema
+        self.experiment_id = experiment_id
+        if first_page is None and conn is not None:
+            first_page = fetch_log_page(conn, schema, experiment_id, limit=self.page_size)
+        self._set_rows(list(first_page or []))
+        self._exhausted = conn is None or len(self._rows) < self.page_size
+        self._exhausted_before = True
+        self.endResetModel()
+
+    def _set_rows(self, rows):
+        self._rows = rows
+        self._keys = [NULL_TS if row[1] is None else row[1] for row in rows]
+        self.current_row = -1
+
+    def clear(self):
+        self.reset(None, None, None, [])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(LOG_HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        if role == Qt.BackgroundRole:
+            return CURRENT_ROW_BRUSH if index.row() == self.current_row else QVariant()
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return QVariant()
+        value = self._rows[index.row()][index.column() + 2]
+        return "" if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return LOG_HEADERS[section]
+        return QVariant()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        last = self._rows[-1] if self._rows else None
+        after = (last[1], last[0]) if last is not None else None
+        try:
+            rows = fetch_log_page(self.conn, self.schema, self.experiment_id, after, self.page_size)
+        except Exception as e:
+            print(f"读取日志时出错: {str(e)}")
+            rows = []
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(rows)
+        self._keys.extend(NULL_TS if row[1] is None else row[1] for row in rows)
+        self.endInsertRows()
+
+    def can_fetch_before(self):
+        return not self._exhausted_before
+
+    def fetch_before(self):
+        """在表格开头插入前一页日志，返回插入的行数"""
+        if self._exhausted_before or not self._rows:
+            return 0
+        first = self._rows[0]
+        try:
+            rows = fetch_log_page_before(self.conn, self.schema, self.experiment_id,
+                                         (first[1], first[0]), self.page_size)
+        except Exception as e:
+            print(f"读取日志时出错: {str(e)}")
+            rows = []
+        if len(rows) < self.page_size:
+            self._exhausted_before = True
+        if not rows:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._rows[0:0] = rows
+        self._keys[0:0] = [NULL_TS if row[1] is None else row[1] for row in rows]
+        if self.current_row >= 0:
+            self.current_row += len(rows)
+        self.endInsertRows()
+        return len(rows)
+
+    def anchor(self, ts):
+        """重新从指定时刻附近开始分页（目标距离已加载的范围太远时使用）"""
+        if self.conn is None:
+            return
+        try:
+            before = fetch_log_page_before(self.conn, self.schema, self.experiment_id,
+                                           (ts, -1), self.page_size // 2)
+            after = fetch_log_page(self.conn, self.schema, self.experiment_id, (ts, -1), self.page_size)
+        except Exception as e:
+            print(f"读取日志时出错: {str(e)}")
+            return
+        self.beginResetModel()
+        self._set_rows(before + after)
+        self._exhausted = len(after) < self.page_size
+        self._exhausted_before = len(before) < self.page_size // 2
+        self.endResetModel()
+
+    def row_for_ts(self, ts):
+        """已加载日志中时间最接近ts的行，范围之外时先重新分页；没有日志时返回-1"""
+        if not self._rows:
+            return -1
+        # 目标在已加载范围附近时继续分页读取，太远时从目标附近重新分页
+        for _ in range(SEEK_FETCH_PAGES):
+            if ts > self._keys[-1] and not self._exhausted:
+                self.fetchMore()
+            elif ts < self._keys[0] and not self._exhausted_before:
+                self.fetch_before()
+            else:
+                break
+        outside = ((ts > self._keys[-1] and not self._exhausted)
+                   or (ts < self._keys[0] and not self._exhausted_before))
+        if outside:
+            self.anchor(ts)
+            if not self._rows:
+                return -1
+        i = bisect_left(self._keys, ts)
+        if i == 0:
+            return 0
+        if i == len(self._keys):
+            return i - 1
+        return i if self._keys[i] - ts < ts - self._keys[i - 1] else i - 1
+
+    def set_current_row(self, row):
+        """高亮显示指定行"""
+        if row == self.current_row:
+            return
+        previous, self.current_row = self.current_row, row
+        last_column = self.columnCount() - 1
+        for changed in (previous, row):
+            if 0 <= changed < len(self._rows):
+                self.dataChanged.emit(self.index(changed, 0), self.index(changed, last_column),
+                                      [Qt.BackgroundRole])
+
+    def row_key(self, row):
+        """指定行的(ts, id)"""
+        entry = self._rows[row]
+        return entry[1], entry[0]
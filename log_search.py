@@ -0,0 +1,123 @@
+"""
+日志全文检索 - 基于SQLite FTS5的日志索引
+索引表只保存分词结果，内容读取自日志表(外部内容表)。
+新导入的日志按id增量加入索引；日志被删除过时(取消导入、重新导入变化的文件)重建索引。
+"""
+
+import sqlite3
+
+from db_schema import table_exists
+
+# 检索结果的最大条数
+SEARCH_LIMIT = 200
+
+# trigram分词器要求的最短检索词长度，更短的词改用LIKE查找
+TRIGRAM_MIN_CHARS = 3
+
+
+def fts_table(schema):
+    """日志表对应的全文索引表名"""
+    return f"{schema['log_table']}_fts"
+
+
+def fts_columns(schema):
+    """参与检索的列: 消息、级别和来源文件（回放模块的日志表没有来源列）"""
+    columns = ["message", schema["log_level"]]
+    if schema.get("log_source"):
+        columns.append(schema["log_source"])
+    return columns
+
+
+def create_log_index(conn, schema):
+    """创建全文索引表和索引进度表，返回使用的分词器"""
+    table = fts_table(schema)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS log_fts_state (
+        fts_table TEXT PRIMARY KEY,
+        tokenizer TEXT,
+        last_id INTEGER,
+        row_count INTEGER
+    )
+    ''')
+    row = conn.execute("SELECT tokenizer FROM log_fts_state WHERE fts_table = ?", (table,)).fetchone()
+    if row is not None and table_exists(conn, table):
+        return row[0]
+
+    # trigram分词器支持中文子串检索，SQLite 3.34以下没有时退回unicode61
+    columns = ", ".join(fts_columns(schema))
+    for tokenizer in ("trigram", "unicode61"):
+        try:
+            conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+                {columns}, content='{schema['log_table']}', content_rowid='id', tokenize='{tokenizer}')
+            ''')
+            break
+        except sqlite3.OperationalError as e:
+            error = e
+    else:
+        raise error
+    conn.execute("INSERT OR REPLACE INTO log_fts_state VALUES (?, ?, 0, 0)", (table, tokenizer))
+    conn.commit()
+    return tokenizer
+
+
+def update_log_index(conn, schema):
+    """把新增的日志加入全文索引，日志被删除过时重建索引"""
+    if not table_exists(conn, schema["log_table"]):
+        return
+    create_log_index(conn, schema)
+    table = fts_table(schema)
+    log_table = schema["log_table"]
+    last_id, indexed = conn.execute(
+        "SELECT last_id, row_count FROM log_fts_state WHERE fts_table = ?", (table,)).fetchone()
+    max_id, total = conn.execute(f"SELECT COALESCE(MAX(id), 0), COUNT(*) FROM {log_table}").fetchone()
+    if max_id == last_id and total == indexed:
+        return
+
+    columns = ", ".join(fts_columns(schema))
+    with conn:
+        added = conn.execute(f"SELECT COUNT(*) FROM {log_table} WHERE id > ?", (last_id,)).fetchone()[0]
+        if total - added == indexed:
+            # 只有新增的日志，增量加入索引
+            conn.execute(f"INSERT INTO {table} (rowid, {columns}) "
+                         f"SELECT id, {columns} FROM {log_table} WHERE id > ?", (last_id,))
+        else:
+            conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+        conn.execute("UPDATE log_fts_state SET last_id = ?, row_count = ? WHERE fts_table = ?",
+                     (max_id, total, table))
+
+
+def build_match_query(text):
+    """把用户输入转换为FTS5查询: 空格分隔的每个词作为短语，全部匹配"""
+    terms = [term for term in text.split() if term]
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search_logs(conn, schema, experiment_id, text, limit=SEARCH_LIMIT):
+    """检索日志，返回 [(id, ts, 时间, 级别, 消息)]
+
+    每个检索词都要在消息、级别或来源中的某一列出现。检索词都不短于TRIGRAM_MIN_CHARS时
+    使用全文索引，按相关度排序；有更短的词（如两个字的"中断"）时trigram索引无法使用，
+    改为对同样的列逐行LIKE匹配，结果按时间顺序而不是相关度排列。
+    """
+    terms = text.split()
+    if not terms:
+        return []
+    log_table = schema["log_table"]
+    columns = f"l.id, l.ts, l.timestamp, l.{schema['log_level']}, l.message"
+
+    if min(len(term) for term in terms) < TRIGRAM_MIN_CHARS:
+        # 检索词太短，trigram索引无法使用，按时间顺序逐行匹配全文索引的各列
+        match_any = "(" + " OR ".join(f"l.{column} LIKE ?" for column in fts_columns(schema)) + ")"
+        where = " AND ".join(match_any for _ in terms)
+        params = [f"%{term}%" for term in terms for _ in fts_columns(schema)]
+        return conn.execute(
+            f"SELECT {columns} FROM {log_table} l WHERE l.experiment_id = ? AND {where} "
+            f"ORDER BY l.ts LIMIT ?",
+            (experiment_id, *params, limit)).fetchall()
+
+    table = fts_table(schema)
+    return conn.execute(
+        f"SELECT {columns} FROM {table} JOIN {log_table} l ON l.id = {table}.rowid "
+        f"WHERE {table} MATCH ? AND l.experiment_id = ? ORDER BY {table}.rank LIMIT ?",
+        (build_match_query(text), experiment_id, limit)).fetchall()
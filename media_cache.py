@@ -0,0 +1,99 @@
+"""
+媒体文件缓存 - 在磁盘上保存由视频生成的代理视频、缩略图等文件
+缓存文件名由源文件路径、大小、修改时间和生成参数计算得到，源文件变化后旧的缓存自然失效。
+超出容量时按最近使用时间删除。
+"""
+
+import hashlib
+import os
+
+# 缓存目录，可通过MEDIA_CACHE_DIR环境变量指定
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "experiment_media")
+
+# 默认磁盘容量（字节）
+DEFAULT_CACHE_BYTES = 50 << 30
+
+# 生成过程中的临时文件后缀，完成后再改名，避免读到不完整的文件
+PARTIAL_SUFFIX = ".part"
+
+
+def cache_dir(kind):
+    """某一类缓存文件的目录"""
+    root = os.environ.get("MEDIA_CACHE_DIR") or DEFAULT_CACHE_DIR
+    return os.path.join(root, kind)
+
+
+def cache_path(source, kind, params="", ext=""):
+    """源文件对应的缓存文件路径，源文件不存在时返回None"""
+    source = os.path.abspath(source)
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+    key = f"{source}|{stat.st_size}|{stat.st_mtime_ns}|{params}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir(kind), digest + ext)
+
+
+def lookup(source, kind, params="", ext=""):
+    """已生成的缓存文件路径，没有时返回None；命中时更新修改时间作为最近使用时间"""
+    path = cache_path(source, kind, params, ext)
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+
+def partial_path(path):
+    """生成缓存文件时写入的临时文件，目录不存在时创建"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path + PARTIAL_SUFFIX
+
+
+def commit(path):
+    """临时文件生成完成，改名为正式的缓存文件"""
+    os.replace(partial_path(path), path)
+
+
+def discard(path):
+    """删除生成失败的临时文件"""
+    try:
+        os.remove(path + PARTIAL_SUFFIX)
+    except OSError:
+        pass
+
+
+def prune(kind, max_bytes=DEFAULT_CACHE_BYTES):
+    """缓存超出容量时按最近使用时间删除，返回删除的文件数"""
+    directory = cache_dir(kind)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    entries = []
+    total = 0
+    for name in names:
+        if name.endswith(PARTIAL_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
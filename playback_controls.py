@@ -0,0 +1,231 @@
+"""
+慢速和逐帧播放 - 高速摄像机录像的变速控制、帧序号与时刻的换算、逐帧解码
+播放速度最低到1/1000倍。低于NATIVE_MIN_RATE时播放器不能可靠地按该速度播放，
+改为暂停播放器、随主时钟逐帧定位。
+逐帧后退时从已解码帧的环形缓冲中取出画面，不必每次从上一个关键帧重新解码；
+逐帧解码需要PyAV，未安装时按播放位置定位（精度为1毫秒）。
+"""
+
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QPushButton, QWidget
+
+from db_schema import format_timestamp_us
+from video_probe import av
+from video_timeline import NATIVE_MIN_RATE
+
+# 可选的播放速度
+RATE_CHOICES = [
+    (1 / 1000, "1/1000x"), (1 / 500, "1/500x"), (1 / 200, "1/200x"), (1 / 100, "1/100x"),
+    (1 / 50, "1/50x"), (1 / 20, "1/20x"), (1 / 10, "1/10x"), (1 / 4, "1/4x"), (1 / 2, "1/2x"),
+    (1.0, "1x"), (2.0, "2x"), (4.0, "4x"),
+]
+
+# 慢速播放时按主时钟刷新画面的间隔（毫秒）
+SLOW_MOTION_INTERVAL = 40
+
+# 环形缓冲保留的已解码帧数
+FRAME_BUFFER_SIZE = 64
+
+# 缓冲的画面最大宽度，更大的画面缩小后保存
+FRAME_MAX_WIDTH = 1280
+
+# 视频墙中每个画面的逐帧缓冲较小，画面也更小，避免多路同时逐帧时占用过多内存
+WALL_FRAME_BUFFER_SIZE = 16
+WALL_FRAME_MAX_WIDTH = 640
+
+# 帧率未知时按此估算
+DEFAULT_FPS = 25.0
+
+
+class FrameTiming:
+    """帧序号、播放位置（毫秒）和试验墙钟时刻（微秒）的换算
+
+    fps是视频文件的帧率，播放位置按它换算为帧序号。
+    高速摄像机导出的文件帧率可能与拍摄帧率不同，已知录像起止时刻和总帧数时，
+    按起止时刻推算拍摄帧率，帧序号据此换算为墙钟时刻。
+    """
+
+    def __init__(self, fps, start_ts=None, end_ts=None, frame_count=None):
+        self.fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self.start_ts = start_ts
+        self.capture_fps = self.fps
+        if start_ts is not None and end_ts is not None and frame_count and end_ts > start_ts:
+            self.capture_fps = frame_count * 1000000 / (end_ts - start_ts)
+
+    @property
+    def frame_ms(self):
+        """一帧的播放时长（毫秒）"""
+        return 1000 / self.fps
+
+    def frame_at(self, position_ms):
+        """播放位置所在的帧序号"""
+        return max(int(position_ms * self.fps / 1000 + 1e-6), 0)
+
+    def position_of(self, frame):
+        """帧的播放位置（毫秒，可能不是整数）"""
+        return frame * 1000 / self.fps
+
+    def wall_ts(self, frame):
+        """帧的拍摄时刻（微秒），录像没有开始时刻时返回None"""
+        if self.start_ts is None:
+            return None
+        return self.start_ts + int(round(frame * 1000000 / self.capture_fps))
+
+    def wall_ts_at(self, position_ms):
+        """播放位置对应的拍摄时刻（微秒），录像没有开始时刻时返回None"""
+        if self.start_ts is None:
+            return None
+        return self.start_ts + int(round(position_ms * 1000 * self.fps / self.capture_fps))
+
+    def position_at_ts(self, ts):
+        """拍摄时刻（微秒）对应的播放位置（毫秒）"""
+        return (ts - self.start_ts) / 1000 * self.capture_fps / self.fps
+
+
+class FrameStepper:
+    """逐帧解码 - 解码过的帧保存在环形缓冲中
+
+    前进时接着上次的位置顺序解码；目标帧不在缓冲中且在已解码位置之前时，
+    从能填满整个缓冲的关键帧开始解码到目标帧，之后连续后退直接从缓冲中取。
+    """
+
+    def __init__(self, file_path, timing, buffer_size=FRAME_BUFFER_SIZE, max_width=FRAME_MAX_WIDTH):
+        self.file_path = file_path
+        self.timing = timing
+        self.buffer_size = buffer_size
+        self.max_width = max_width  # 更宽的画面缩小后保存
+        self.buffer = OrderedDict()  # 帧序号 -> QImage，按解码顺序，满了丢弃最早的
+        self._container = None
+        self._stream = None
+        self._frames = None  # 解码迭代器
+        self._next_frame = None  # 解码迭代器下一个产生的帧序号
+        self._start = 0.0  # 视频流的起始时间（秒）
+
+    @property
+    def available(self):
+        return av is not None and os.path.exists(self.file_path)
+
+    def frame(self, index):
+        """帧序号对应的画面，解码失败或超出视频末尾时返回None"""
+        image = self.buffer.get(index)
+        if image is not None:
+            return image
+        if not self.available:
+            return None
+        try:
+            if self._frames is None or self._next_frame is None or index < self._next_frame \
+                    or index >= self._next_frame + self.buffer_size * 4:
+                # 目标在已解码位置之前或远在之后，从关键帧重新开始
+                self._seek(max(index - self.buffer_size + 1, 0))
+            for frame in self._frames:
+                current = self._frame_index(frame)
+                self._next_frame = current + 1
+                if current < index - self.buffer_size + 1:
+                    continue  # 关键帧与缓冲窗口之间的帧不保存
+                self._store(current, frame)
+                if current >= index:
+                    break
+        except Exception as e:
+            print(f"逐帧解码时出错: {str(e)}")
+            self.close()
+            return None
+        return self.buffer.get(index)
+
+    def close(self):
+        if self._container is not None:
+            self._container.close()
+        self._container = None
+        self._frames = None
+        self._next_frame = None
+
+    def _open(self):
+        self._container = av.open(self.file_path)
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"
+        time_base = self._stream.time_base
+        self._start = float(self._stream.start_time * time_base) if self._stream.start_time else 0.0
+
+    def _seek(self, index):
+        """定位到该帧之前的关键帧"""
+        if self._container is None:
+            self._open()
+        seconds = self._start + index / self.timing.fps
+        self._container.seek(int(seconds / self._stream.time_base), stream=self._stream,
+                             backward=True, any_frame=False)
+        self._frames = self._container.decode(self._stream)
+        self._next_frame = None
+
+    def _frame_index(self, frame):
+        return int(round((frame.time - self._start) * self.timing.fps))
+
+    def _store(self, index, frame):
+        if frame.width > self.max_width:
+            frame = frame.reformat(width=self.max_width,
+                                   height=frame.height * self.max_width // frame.width // 2 * 2)
+        array = frame.to_ndarray(format="rgb24")
+        height, width = array.shape[:2]
+        image = QImage(array.data, width, height, 3 * width, QImage.Format_RGB888).copy()
+        self.buffer[index] = image
+        self.buffer.move_to_end(index)
+        while len(self.buffer) > self.buffer_size:
+            self.buffer.popitem(last=False)
+
+
+def format_frame_time(ts):
+    """墙钟时刻显示到微秒"""
+    if ts is None:
+        return "--"
+    text = format_timestamp_us(ts)
+    return text[11:] if "." in text else text[11:] + ".000000"
+
+
+class PlaybackControls(QWidget):
+    """变速和逐帧控制条: 速度选择、上一帧、下一帧和当前帧信息"""
+
+    rate_changed = pyqtSignal(float)
+    step_requested = pyqtSignal(int)  # 帧数，负数为后退
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        layout.addWidget(QLabel("速度:"))
+        self.rate_combo = QComboBox()
+        for rate, label in RATE_CHOICES:
+            self.rate_combo.addItem(label, rate)
+        self.rate_combo.setCurrentIndex([rate for rate, _ in RATE_CHOICES].index(1.0))
+        self.rate_combo.currentIndexChanged.connect(
+            lambda index: self.rate_changed.emit(self.rate_combo.itemData(index)))
+        layout.addWidget(self.rate_combo)
+
+        self.prev_frame_btn = QPushButton("上一帧")
+        self.prev_frame_btn.clicked.connect(lambda: self.step_requested.emit(-1))
+        layout.addWidget(self.prev_frame_btn)
+
+        self.next_frame_btn = QPushButton("下一帧")
+        self.next_frame_btn.clicked.connect(lambda: self.step_requested.emit(1))
+        layout.addWidget(self.next_frame_btn)
+
+        self.frame_label = QLabel("")
+        layout.addWidget(self.frame_label)
+        layout.addStretch(1)
+
+    def rate(self):
+        return self.rate_combo.currentData()
+
+    def set_frame_info(self, frame, ts):
+        """显示帧序号和拍摄时刻，frame为None时只显示时刻"""
+        text = f"时刻: {format_frame_time(ts)}"
+        if frame is not None:
+            text = f"帧: {frame}  " + text
+        self.frame_label.setText(text)
+
+
+def is_slow_motion(rate):
+    """该速度是否需要随主时钟逐帧定位"""
+    return rate < NATIVE_MIN_RATE
@@ -17,13 +17,59 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVB
                             QTableWidgetItem, QComboBox, QLineEdit, QSlider, QGridLayout,
                             QGroupBox, QTextEdit, QDateTimeEdit, QCheckBox, QMessageBox,
                             QListWidget, QListWidgetItem, QSplitter, QDialog, QRadioButton,
-                            QProgressBar,QInputDialog)
+                            QProgressBar,QInputDialog, QTableView, QHeaderView, QStackedWidget)
 from PyQt5.QtCore import Qt, QDateTime, QTimer, QUrl
 from PyQt5.QtGui import QIcon, QPixmap
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 from PyQt5.QtMultimediaWidgets import QVideoWidget
+import numpy as np
 import pyqtgraph as pg  # 用于绘制曲线图
 
+from db_schema import (PLAYBACK_SCHEMA, datetime_to_us, detect_schema, parse_timestamp_us,
+                       video_duration_sql)
+from db_migration import migrate_with_progress
+from sensor_rollup import RAW_LEVEL, choose_level, ensure_rollups, query_series, sensor_time_range
+from experiment_cache import cache_key, cached, experiment_cache, format_stats
+from log_model import LogTableModel, fetch_log_page
+from log_search import search_logs, update_log_index
+from playback_controls import (SLOW_MOTION_INTERVAL, FrameStepper, FrameTiming, PlaybackControls,
+                               is_slow_motion)
+from slider_preview import SliderPreview
+from task_runner import start_task
+from video_thumbnail import FilmstripLoader
+from video_timeline import MasterClock
+
+# 绘图区尚未显示时按此像素宽度选择汇总粒度
+PLOT_DEFAULT_PIXELS = 1000
+
+# 各面板对应的选项卡属性名和标题
+PANEL_TABS = {
+    "realtime": ("realtime_tab", "实时数据"),
+    "log": ("log_tab", "日志"),
+    "annotation": ("annotation_tab", "标注"),
+    "tag": ("tag_tab", "标签"),
+}
+
+# 缩放或平移曲线后等待此时间（毫秒）没有新的变化再重新查询
+PLOT_REFRESH_DELAY = 150
+
+# 查询时在可见范围两侧各多取的比例，小幅平移时不必等待新数据
+PLOT_WINDOW_MARGIN = 0.25
+
+
+def refresh_interval():
+    """显示器一帧的时长（毫秒）"""
+    screen = QApplication.primaryScreen()
+    rate = screen.refreshRate() if screen is not None else 0
+    return max(int(1000 / rate), 1) if rate > 0 else 16
+
+
+def format_hms(milliseconds):
+    """格式化为 时:分:秒"""
+    seconds = max(int(milliseconds), 0) // 1000
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
 # 创建数据库连接函数
 def create_connection(db_file):
     """创建与SQLite数据库的连接"""
@@ -35,6 +81,14 @@ def create_connection(db_file):
         print(e)
     return conn
 
+def show_cache_stats(label):
+    """在标签上显示试验数据缓存的命中率，详细统计放在提示中"""
+    stats = experiment_cache.stats()
+    label.setText(f"缓存命中率: {stats['hit_rate']:.0%}")
+    label.setToolTip(f"试验数据缓存: {format_stats(stats)}\n"
+                     f"内存预算可通过EXPERIMENT_CACHE_MB环境变量调整（兆字节）")
+
+
 # 创建表格函数
 def create_tables(conn):
     """创建所需的表格"""
@@ -90,6 +144,17 @@ def create_tables(conn):
             )
         ''')
 
+        conn.commit()
+        create_annotation_tables(conn)
+    except sqlite3.Error as e:
+        print(f"数据库错误: {e}")
+
+
+def create_annotation_tables(conn):
+    """创建标注和标签表（数据导入模块生成的数据库中没有这两张表）"""
+    try:
+        cursor = conn.cursor()
+
         # 创建标注表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS annotations (
@@ -456,7 +521,28 @@ class PlaybackWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.db_conn = None
+        self.db_file = None
+        self.schema = PLAYBACK_SCHEMA
         self.current_experiment_id = None
+        self.sensor_types = []  # 当前试验的传感器类型
+        self.sensor_start_ts = None  # 当前试验数据的起止时间（微秒）
+        self.sensor_end_ts = None
+        self.sensor_curves = {}  # 传感器类型 -> (平均值曲线, 最小值曲线, 最大值曲线)
+        self.plot_task = None  # 正在执行的曲线查询任务
+        self.plot_generation = 0  # 每次发起查询加1，用于丢弃过期的查询结果
+        self.load_tasks = {}  # 面板名称 -> 正在执行的加载任务
+        self.load_generation = 0  # 每次切换试验加1，用于丢弃过期的加载结果
+        self.search_task = None  # 正在执行的日志检索
+        self.plot_series = (RAW_LEVEL, {})  # 曲线当前显示的数据(粒度, 各传感器数组)
+        self.pending_position = None  # 尚未刷新到界面的播放位置（毫秒）
+        self.log_index_checked = False  # 本次打开数据库后是否已更新过全文索引
+        self.video_start_ts = None  # 视频开始时刻（微秒）
+        self.video_file = None  # 当前视频文件及其时长（毫秒），用于进度条悬停预览
+        self.video_duration = 0
+        self.video_timing = None  # 当前视频的帧与时刻换算
+        self.frame_stepper = None  # 当前视频的逐帧解码
+        self.current_frame = None  # 逐帧查看或慢放时显示的帧序号，正常播放时为None
+        self.slow_clock = MasterClock()  # 慢放时的主时钟，按它逐帧显示
         self.initUI()
 
     def initUI(self):
@@ -481,7 +567,9 @@ class PlaybackWidget(QWidget):
         exp_layout.addWidget(QLabel("选择试验:"))
         self.exp_combo = QComboBox()
         self.exp_combo.currentIndexChanged.connect(self.experiment_selected)
-        exp_layout.addWidget(self.exp_combo)
+        exp_layout.addWidget(self.exp_combo, 1)
+        self.cache_label = QLabel("")
+        exp_layout.addWidget(self.cache_label)
 
         layout.addLayout(exp_layout)
 
@@ -492,15 +580,36 @@ class PlaybackWidget(QWidget):
         left_panel = QWidget()
         left_layout = QVBoxLayout()
 
-        # 视频播放组件
+        # 视频播放组件，逐帧查看时换成显示解码画面的标签
         self.video_widget = QVideoWidget()
         self.video_widget.setMinimumHeight(500)
-        left_layout.addWidget(self.video_widget)
+        self.frame_view = QLabel()
+        self.frame_view.setAlignment(Qt.AlignCenter)
+        self.frame_view.setStyleSheet("background-color: black;")
+        self.video_stack = QStackedWidget()
+        self.video_stack.addWidget(self.video_widget)
+        self.video_stack.addWidget(self.frame_view)
+        left_layout.addWidget(self.video_stack)
 
         # 媒体播放器
         self.media_player = QMediaPlayer(None, QMediaPlayer.VideoSurface)
         self.media_player.setVideoOutput(self.video_widget)
 
+        # 播放位置按显示器刷新率通知，界面更新再经定时器节流，每帧最多一次
+        playhead_interval = refresh_interval()
+        self.media_player.setNotifyInterval(playhead_interval)
+        self.media_player.positionChanged.connect(self.position_changed)
+        self.media_player.durationChanged.connect(self.duration_changed)
+        self.playhead_timer = QTimer(self)
+        self.playhead_timer.setSingleShot(True)
+        self.playhead_timer.setInterval(playhead_interval)
+        self.playhead_timer.timeout.connect(self.update_playhead)
+
+        # 慢放时定时按主时钟显示对应的帧
+        self.slow_timer = QTimer(self)
+        self.slow_timer.setInterval(SLOW_MOTION_INTERVAL)
+        self.slow_timer.timeout.connect(self.advance_slow_motion)
+
         # 播放控制
         controls_layout = QHBoxLayout()
 
@@ -524,9 +633,24 @@ class PlaybackWidget(QWidget):
         self.progress_slider.sliderMoved.connect(self.set_position)
         left_layout.addWidget(self.progress_slider)
 
+        # 进度条悬停预览，画面取自后台生成的胶片条
+        self.filmstrip_loader = FilmstripLoader(self)
+        self.slider_preview = SliderPreview(self.progress_slider, self.preview_frame, format_hms)
+        self.filmstrip_loader.ready.connect(lambda key, path: self.slider_preview.refresh())
+
         # 时间显示
         self.time_label = QLabel("00:00:00 / 00:00:00")
         left_layout.addWidget(self.time_label)
+
+        # 变速和逐帧控制（高速摄像机录像慢放）
+        self.playback_controls = PlaybackControls()
+        self.playback_controls.rate_changed.connect(self.set_rate)
+        self.playback_controls.step_requested.connect(self.step_frames)
+        left_layout.addWidget(self.playback_controls)
+
+        # 视频加载状态
+        self.video_status_label = QLabel("")
+        left_layout.addWidget(self.video_status_label)
         left_layout.addStretch(1)
         left_panel.setLayout(left_layout)
 
@@ -535,7 +659,7 @@ class PlaybackWidget(QWidget):
         right_layout = QVBoxLayout()
 
         # 数据展示选项卡
-        data_tabs = QTabWidget()
+        self.data_tabs = QTabWidget()
 
         # 实时数据选项卡
         self.realtime_tab = QWidget()
@@ -549,16 +673,59 @@ class PlaybackWidget(QWidget):
         self.plot_widget.showGrid(x=True, y=True)
         realtime_layout.addWidget(self.plot_widget)
 
+        # 缩放或平移后只查询可见范围的数据，按像素宽度选择粒度
+        self.plot_refresh_timer = QTimer(self)
+        self.plot_refresh_timer.setSingleShot(True)
+        self.plot_refresh_timer.setInterval(PLOT_REFRESH_DELAY)
+        self.plot_refresh_timer.timeout.connect(self.refresh_plot_window)
+        self.plot_widget.getPlotItem().getViewBox().sigXRangeChanged.connect(
+            self.plot_refresh_timer.start)
+
+        # 当前时刻游标
+        self.plot_cursor = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen(color=(0, 0, 0), width=1))
+        self.plot_cursor.setVisible(False)
+        self.plot_widget.addItem(self.plot_cursor, ignoreBounds=True)
+
+        # 当前时刻各传感器的数值
+        self.sensor_readout = QLabel("")
+        self.sensor_readout.setWordWrap(True)
+        realtime_layout.addWidget(self.sensor_readout)
+
         self.realtime_tab.setLayout(realtime_layout)
 
         # 日志选项卡
         self.log_tab = QWidget()
         log_layout = QVBoxLayout()
 
-        self.log_table = QTableWidget()
-        self.log_table.setColumnCount(3)
-        self.log_table.setHorizontalHeaderLabels(["时间", "级别", "消息"])
+        # 日志全文检索
+        search_layout = QHBoxLayout()
+        self.log_search_edit = QLineEdit()
+        self.log_search_edit.setPlaceholderText("检索日志内容、级别或来源，如: 视频流中断")
+        self.log_search_edit.returnPressed.connect(self.start_log_search)
+        search_layout.addWidget(self.log_search_edit)
+        self.log_search_btn = QPushButton("检索")
+        self.log_search_btn.clicked.connect(self.start_log_search)
+        search_layout.addWidget(self.log_search_btn)
+        log_layout.addLayout(search_layout)
+
+        # 检索结果按相关度排序（检索词过短时按时间顺序），点击跳转到对应时刻
+        self.log_search_results = QListWidget()
+        self.log_search_results.setMaximumHeight(150)
+        self.log_search_results.setVisible(False)
+        self.log_search_results.itemClicked.connect(self.search_result_selected)
+        log_layout.addWidget(self.log_search_results)
+
+        # 日志按需分页读取，行高固定，不按内容计算列宽
+        self.log_model = LogTableModel(self)
+        self.log_table = QTableView()
+        self.log_table.setModel(self.log_model)
+        self.log_table.setSelectionBehavior(QTableView.SelectRows)
+        self.log_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_table.verticalHeader().setDefaultSectionSize(22)
+        self.log_table.setColumnWidth(0, 180)
+        self.log_table.setColumnWidth(1, 70)
         self.log_table.horizontalHeader().setStretchLastSection(True)
+        self.log_table.verticalScrollBar().valueChanged.connect(self.log_scrolled)
         log_layout.addWidget(self.log_table)
 
         self.log_tab.setLayout(log_layout)
@@ -629,12 +796,12 @@ class PlaybackWidget(QWidget):
         self.tag_tab.setLayout(tag_layout)
 
         # 添加选项卡
-        data_tabs.addTab(self.realtime_tab, "实时数据")
-        data_tabs.addTab(self.log_tab, "日志")
-        data_tabs.addTab(self.annotation_tab, "标注")
-        data_tabs.addTab(self.tag_tab, "标签")
+        self.data_tabs.addTab(self.realtime_tab, "实时数据")
+        self.data_tabs.addTab(self.log_tab, "日志")
+        self.data_tabs.addTab(self.annotation_tab, "标注")
+        self.data_tabs.addTab(self.tag_tab, "标签")
 
-        right_layout.addWidget(data_tabs)
+        right_layout.addWidget(self.data_tabs)
 
         right_panel.setLayout(right_layout)
 
@@ -665,6 +832,22 @@ class PlaybackWidget(QWidget):
         if self.db_conn is None:
             QMessageBox.critical(self, "错误", "无法连接到数据库")
             return
+        self.db_file = db_file
+        self.log_index_checked = False
+        self.cancel_panel_loads()
+
+        # 旧数据库在后台迁移，完成后再识别数据库结构
+        migrate_with_progress(self, db_file, self.database_migrated)
+
+    def database_migrated(self, completed):
+        if not completed:
+            self.db_conn.close()
+            self.db_conn = None
+            self.db_file = None
+            self.exp_combo.clear()
+            return
+        create_annotation_tables(self.db_conn)
+        self.schema = detect_schema(self.db_conn)
 
         # 加载试验列表
         self.load_experiments()
@@ -674,7 +857,7 @@ class PlaybackWidget(QWidget):
             return
 
         cursor = self.db_conn.cursor()
-        cursor.execute("SELECT id, experiment_id, name FROM experiments")
+        cursor.execute(self.schema["experiments_sql"])
         experiments = cursor.fetchall()
 
         self.exp_combo.clear()
@@ -689,6 +872,11 @@ class PlaybackWidget(QWidget):
             return
 
         self.current_experiment_id = self.exp_combo.currentData()
+        # 切换试验时记录缓存统计，用于调整内存预算
+        print(f"试验数据缓存: {format_stats(experiment_cache.stats())}")
+
+        # 取消上一个试验尚未完成的加载，各面板在后台同时加载
+        self.cancel_panel_loads()
 
         # 加载视频数据
         self.load_video_data()
@@ -704,20 +892,116 @@ class PlaybackWidget(QWidget):
 
         # 加载标签
         self.load_tags()
+        show_cache_stats(self.cache_label)
+
+    def cancel_panel_loads(self):
+        """取消所有面板正在进行的加载，已发出的结果会被丢弃"""
+        self.load_generation += 1
+        for task in self.load_tasks.values():
+            task.cancel()
+        for panel in list(self.load_tasks):
+            self.set_panel_loading(panel, False)
+        self.load_tasks = {}
+        self.cancel_plot_task()
+        if self.search_task is not None:
+            self.search_task.cancel()
+            self.search_task = None
+        self.log_search_results.clear()
+        self.log_search_results.setVisible(False)
+
+    def set_panel_loading(self, panel, loading):
+        """显示或清除面板的加载状态"""
+        if panel == "video":
+            self.video_status_label.setText("视频加载中..." if loading else "")
+            return
+        tab, title = PANEL_TABS[panel]
+        index = self.data_tabs.indexOf(getattr(self, tab))
+        self.data_tabs.setTabText(index, f"{title} (加载中...)" if loading else title)
 
-    def load_video_data(self):
-        if self.db_conn is None or self.current_experiment_id is None:
+    def start_panel_load(self, panel, query, apply):
+        """在后台执行面板的查询，完成后在界面线程中调用apply(结果)
+
+        查询结果按面板缓存，切换回最近加载过的试验时直接使用缓存。
+        """
+        if self.db_file is None or self.current_experiment_id is None:
             return
 
-        cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT file_path FROM video_data WHERE experiment_id = ?",
-            (self.current_experiment_id,)
-        )
+        previous = self.load_tasks.pop(panel, None)
+        if previous is not None:
+            previous.cancel()
 
-        video_data = cursor.fetchone()
-        if video_data and os.path.exists(video_data[0]):
-            self.media_player.setMedia(QMediaContent(QUrl.fromLocalFile(video_data[0])))
+        db_file = self.db_file
+        experiment_id = self.current_experiment_id
+        result = experiment_cache.get(cache_key(db_file, experiment_id, panel))
+        if result is not None:
+            self.set_panel_loading(panel, False)
+            apply(result)
+            return
+
+        generation = self.load_generation
+        self.set_panel_loading(panel, True)
+
+        def cached_query(conn, token):
+            result = query(conn, token)
+            # 查询可能写入了数据库（如生成汇总数据），缓存键在查询之后计算
+            if result is not None and not token.is_cancelled():
+                experiment_cache.put(cache_key(db_file, experiment_id, panel), result)
+            return result
+
+        def finished(result):
+            if generation != self.load_generation:
+                return  # 已切换到其他试验
+            self.load_tasks.pop(panel, None)
+            self.set_panel_loading(panel, False)
+            apply(result)
+            show_cache_stats(self.cache_label)
+
+        def failed(message):
+            if generation != self.load_generation:
+                return
+            self.load_tasks.pop(panel, None)
+            self.set_panel_loading(panel, False)
+            print(f"加载{panel}数据失败: {message}")
+
+        self.load_tasks[panel] = start_task(db_file, cached_query, finished, failed)
+
+    def load_video_data(self):
+        experiment_id = self.current_experiment_id
+
+        def query(conn, token):
+            video_data = conn.execute(
+                f"SELECT file_path, start_ts, {video_duration_sql(conn)}, "
+                "fps, end_ts, frame_count "
+                "FROM video_data WHERE experiment_id = ?",
+                (experiment_id,)
+            ).fetchone()
+            if not video_data or not os.path.exists(video_data[0]):
+                return None, None, 0, FrameTiming(None)
+            start_ts = video_data[1]
+            # 录像的起止时刻和总帧数都已知时据此换算拍摄帧率
+            timing = FrameTiming(video_data[3], start_ts, video_data[4], video_data[5])
+            if start_ts is None:
+                # 视频没有记录开始时刻时按试验开始时间对齐
+                experiment = conn.execute("SELECT start_time FROM experiments WHERE id = ?",
+                                          (experiment_id,)).fetchone()
+                start_ts = parse_timestamp_us(experiment[0]) if experiment else None
+                timing.start_ts = start_ts
+            return video_data[0], start_ts, video_data[2] or 0, timing
+
+        self.start_panel_load("video", query, self.video_data_loaded)
+
+    def video_data_loaded(self, result):
+        file_path, self.video_start_ts, self.video_duration, self.video_timing = result
+        self.video_file = file_path
+        self.filmstrip_loader.clear()
+        self.slow_timer.stop()
+        self.show_video_output()
+        if self.frame_stepper is not None:
+            self.frame_stepper.close()
+        self.frame_stepper = FrameStepper(file_path, self.video_timing) if file_path else None
+        if file_path:
+            self.media_player.setMedia(QMediaContent(QUrl.fromLocalFile(file_path)))
+            self.filmstrip_loader.request(file_path, file_path, self.video_duration)
             self.play_btn.setEnabled(True)
             self.pause_btn.setEnabled(True)
             self.stop_btn.setEnabled(True)
@@ -725,79 +1009,296 @@ class PlaybackWidget(QWidget):
             self.play_btn.setEnabled(False)
             self.pause_btn.setEnabled(False)
             self.stop_btn.setEnabled(False)
-            QMessageBox.warning(self, "警告", "未找到视频数据或文件不存在")
+            self.video_status_label.setText("未找到视频数据或文件不存在")
 
     def load_realtime_data(self):
-        if self.db_conn is None or self.current_experiment_id is None:
+        self.cancel_plot_task()
+        self.plot_widget.clear()
+        self.plot_cursor.setVisible(False)
+        self.plot_widget.addItem(self.plot_cursor, ignoreBounds=True)
+        self.sensor_curves = {}
+        self.sensor_types = []
+        self.sensor_start_ts = None
+        self.plot_series = (RAW_LEVEL, {})
+        self.sensor_readout.setText("")
+
+        schema = self.schema
+        experiment_id = self.current_experiment_id
+
+        def query(conn, token):
+            # 旧数据库第一次打开时在后台生成汇总数据
+            ensure_rollups(conn, schema, experiment_id)
+            return sensor_time_range(conn, schema, experiment_id)
+
+        self.start_panel_load("realtime", query, self.realtime_data_loaded)
+
+    def realtime_data_loaded(self, result):
+        types, start_ts, end_ts = result
+        if start_ts is None:
             return
 
-        cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT timestamp, data_type, value FROM realtime_data WHERE experiment_id = ? ORDER BY timestamp",
-            (self.current_experiment_id,)
-        )
+        self.sensor_types = types
+        self.sensor_start_ts = start_ts
+        self.sensor_end_ts = end_ts
+
+        # 每个传感器一条平均值曲线，另画每个时间段最小值和最大值之间的范围
+        for i, sensor_type in enumerate(types):
+            color = pg.intColor(i, hues=max(len(types), 1))
+            lower = pg.PlotDataItem(pen=None)
+            upper = pg.PlotDataItem(pen=None)
+            fill_color = pg.mkColor(color)
+            fill_color.setAlpha(60)
+            self.plot_widget.addItem(pg.FillBetweenItem(lower, upper, brush=fill_color))
+            mean_curve = self.plot_widget.plot(pen=pg.mkPen(color=color, width=2), name=str(sensor_type))
+            self.sensor_curves[sensor_type] = (mean_curve, lower, upper)
+
+        # X轴范围由查询决定，关闭自动范围，避免更新数据后再次触发查询
+        view_box = self.plot_widget.getPlotItem().getViewBox()
+        view_box.disableAutoRange(axis=pg.ViewBox.XAxis)
+        view_box.enableAutoRange(axis=pg.ViewBox.YAxis)
+        self.plot_widget.setXRange(0, (end_ts - start_ts) / 1000000, padding=0)
+        self.plot_refresh_timer.stop()
+        self.refresh_plot_window()
+
+    def cancel_plot_task(self):
+        """取消正在执行的曲线查询"""
+        self.plot_generation += 1
+        if self.plot_task is not None:
+            self.plot_task.cancel()
+            self.plot_task = None
+
+    def refresh_plot_window(self):
+        """在后台查询当前可见时间范围的曲线数据"""
+        if self.db_file is None or self.sensor_start_ts is None:
+            return
 
-        data = cursor.fetchall()
-        if data:
-            # 解析时间和数值数据
-            timestamps = []
-            values = []
-
-            for row in data:
-                # 解析时间戳为 datetime 对象
-                timestamp = datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-                # 将 datetime 转换为从开始时间的秒数
-                if not timestamps:  # 第一个点
-                    start_time = timestamp
-                    timestamps.append(0)
-                else:
-                    delta = (timestamp - start_time).total_seconds()
-                    timestamps.append(delta)
-
-                values.append(row[2])
-
-            # 绘制曲线
-            self.plot_widget.clear()
-            plot_pen = pg.mkPen(color=(255, 0, 0), width=2)
-            self.plot_widget.plot(timestamps, values, pen=plot_pen, symbol='o', symbolSize=5, symbolBrush=(255, 0, 0))
+        view_box = self.plot_widget.getPlotItem().getViewBox()
+        x_min, x_max = view_box.viewRange()[0]
+        margin = (x_max - x_min) * PLOT_WINDOW_MARGIN
+        start_ts = max(self.sensor_start_ts + int((x_min - margin) * 1000000), self.sensor_start_ts)
+        end_ts = min(self.sensor_start_ts + int((x_max + margin) * 1000000), self.sensor_end_ts)
+        if end_ts <= start_ts:
+            return
 
-    def load_log_data(self):
-        if self.db_conn is None or self.current_experiment_id is None:
+        # 查询范围比可见范围宽，像素数按同样比例放大
+        pixels = int(view_box.width()) or PLOT_DEFAULT_PIXELS
+        pixels = int(pixels * (end_ts - start_ts) / max((x_max - x_min) * 1000000, 1))
+        level = choose_level(start_ts, end_ts, pixels)
+
+        self.cancel_plot_task()
+        generation = self.plot_generation
+        schema = self.schema
+        experiment_id = self.current_experiment_id
+        types = list(self.sensor_types)
+        # 原始数据按像素宽度抽稀，像素数也是查询参数
+        raw_pixels = pixels if level == RAW_LEVEL else None
+        key = cache_key(self.db_file, experiment_id, "plot", start_ts, end_ts, level, raw_pixels)
+        result = experiment_cache.get(key)
+        if result is not None:
+            self.plot_window_loaded(generation, result)
             return
 
-        cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT timestamp, log_level, message FROM logs WHERE experiment_id = ? ORDER BY timestamp",
-            (self.current_experiment_id,)
-        )
+        def query(conn, token):
+            result = level, query_series(conn, schema, experiment_id, types, start_ts, end_ts, level, raw_pixels)
+            if not token.is_cancelled():
+                experiment_cache.put(key, result)
+            return result
+
+        self.plot_task = start_task(self.db_file, query,
+                                    lambda result: self.plot_window_loaded(generation, result),
+                                    lambda message: print(f"读取实时数据失败: {message}"))
 
-        logs = cursor.fetchall()
+    def plot_window_loaded(self, generation, result):
+        """查询完成后替换曲线数据，过期的结果直接丢弃"""
+        if generation != self.plot_generation:
+            return
+        self.plot_task = None
+
+        level, series = result
+        self.plot_series = result
+        show_cache_stats(self.cache_label)
+        # 将微秒时间戳转换为从开始时间的秒数，汇总数据画在时间段中点
+        offset = level * 1000000 / 2
+        for sensor_type, (mean_curve, lower, upper) in self.sensor_curves.items():
+            if sensor_type not in series:
+                mean_curve.setData([], [])
+                lower.setData([], [])
+                upper.setData([], [])
+                continue
+            timestamps, mins, maxs, means = series[sensor_type]
+            x = (timestamps + (offset - self.sensor_start_ts)) / 1000000
+            mean_curve.setData(x, means)
+            # 原始数据比像素稀疏时最小值和最大值相同，范围退化为曲线本身
+            lower.setData(x, mins)
+            upper.setData(x, maxs)
 
-        # 清空表格
-        self.log_table.setRowCount(0)
+    def load_log_data(self):
+        schema = self.schema
+        experiment_id = self.current_experiment_id
+        self.log_model.clear()
 
-        # 添加日志数据
-        for row_idx, log in enumerate(logs):
-            self.log_table.insertRow(row_idx)
-            self.log_table.setItem(row_idx, 0, QTableWidgetItem(log[0]))
-            self.log_table.setItem(row_idx, 1, QTableWidgetItem(log[1]))
-            self.log_table.setItem(row_idx, 2, QTableWidgetItem(log[2]))
+        def query(conn, token):
+            # 后台只读取第一页，之后滚动时由模型继续分页读取
+            return fetch_log_page(conn, schema, experiment_id)
 
-        # 调整列宽
-        self.log_table.resizeColumnsToContents()
+        self.start_panel_load("log", query, self.log_data_loaded)
 
-    def load_annotations(self):
-        if self.db_conn is None or self.current_experiment_id is None:
+    def log_data_loaded(self, first_page):
+        self.log_model.reset(self.db_conn, self.schema, self.current_experiment_id, first_page)
+
+    def start_log_search(self):
+        """在后台检索日志，首次检索时建立或更新全文索引"""
+        text = self.log_search_edit.text().strip()
+        if not text or self.db_file is None or self.current_experiment_id is None:
             return
+        if self.search_task is not None:
+            self.search_task.cancel()
 
-        cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT id, timestamp, annotation_type, description FROM annotations WHERE experiment_id = ? ORDER BY timestamp",
-            (self.current_experiment_id,)
-        )
+        schema = self.schema
+        experiment_id = self.current_experiment_id
+        generation = self.load_generation
+        index_checked = self.log_index_checked
+
+        def query(conn, token):
+            if not index_checked:
+                update_log_index(conn, schema)
+            return search_logs(conn, schema, experiment_id, text)
+
+        def finished(hits):
+            if generation != self.load_generation:
+                return
+            self.search_task = None
+            self.log_index_checked = True
+            self.log_search_btn.setText("检索")
+            self.log_search_results.clear()
+            for hit_id, ts, timestamp, level, message in hits:
+                item = QListWidgetItem(f"{timestamp} [{level}] {message}")
+                item.setData(Qt.UserRole, ts)
+                self.log_search_results.addItem(item)
+            if not hits:
+                self.log_search_results.addItem("没有找到匹配的日志")
+            self.log_search_results.setVisible(True)
+
+        def failed(message):
+            self.search_task = None
+            self.log_search_btn.setText("检索")
+            QMessageBox.warning(self, "错误", f"检索日志失败: {message}")
+
+        self.log_search_btn.setText("检索中...")
+        self.search_task = start_task(self.db_file, query, finished, failed)
+
+    def search_result_selected(self, item):
+        ts = item.data(Qt.UserRole)
+        if ts is not None:
+            self.seek_to_time(ts)
+
+    def seek_to_time(self, ts):
+        """把视频、曲线游标和日志跳转到指定时刻（微秒）"""
+        if self.video_start_ts is not None and not self.media_player.media().isNull():
+            self.leave_frame_view()
+            self.media_player.setPosition(max(int(self.video_timing.position_at_ts(ts)), 0))
+        self.show_playhead(ts, follow_log=True)
+
+    def position_changed(self, position):
+        """播放位置变化，合并到下一次界面刷新"""
+        self.pending_position = position
+        if not self.playhead_timer.isActive():
+            self.playhead_timer.start()
+
+    def duration_changed(self, duration):
+        self.progress_slider.setRange(0, duration)
+        self.time_label.setText(f"{format_hms(self.media_player.position())} / {format_hms(duration)}")
+
+    def preview_frame(self, position):
+        """进度条悬停位置的画面，胶片条尚未生成时返回None"""
+        if not self.video_file:
+            return None
+        strip = self.filmstrip_loader.filmstrip(self.video_file, self.video_file, self.video_duration)
+        return strip.frame_at(position) if strip else None
+
+    def update_playhead(self):
+        """刷新进度条、时间和游标（每个显示帧最多一次）"""
+        position = self.pending_position
+        if position is None:
+            return
+        self.pending_position = None
+
+        if not self.progress_slider.isSliderDown():
+            self.progress_slider.setValue(position)
+        self.time_label.setText(f"{format_hms(position)} / {format_hms(self.media_player.duration())}")
+
+        # 视频没有开始时刻时按数据开始时刻对齐
+        if self.video_start_ts is not None and self.video_timing is not None:
+            ts = self.video_timing.wall_ts_at(position)
+            self.playback_controls.set_frame_info(self.video_timing.frame_at(position), ts)
+            self.show_playhead(ts)
+        elif self.sensor_start_ts is not None:
+            self.show_playhead(self.sensor_start_ts + position * 1000)
+
+    def show_playhead(self, ts, follow_log=False):
+        """在曲线上显示当前时刻，更新各传感器读数并高亮最近的日志
+
+        日志表格只在高亮行变化、且用户没有把表格滚离之前的高亮行时跟随滚动，
+        播放时也能自由翻看日志；follow_log为True（主动跳转）时总是滚动到高亮行。
+        """
+        if self.sensor_start_ts is not None:
+            x = (ts - self.sensor_start_ts) / 1000000
+            self.plot_cursor.setPos(x)
+            self.plot_cursor.setVisible(True)
+            # 游标不在可见范围内时平移曲线，保持缩放比例
+            x_min, x_max = self.plot_widget.getPlotItem().getViewBox().viewRange()[0]
+            if not x_min <= x <= x_max:
+                half = (x_max - x_min) / 2
+                self.plot_widget.setXRange(x - half, x + half, padding=0)
+            self.sensor_readout.setText(self.sensor_values_text(ts))
+
+        previous = self.log_model.current_row
+        following = follow_log or self.log_row_visible(previous)
+        row = self.log_model.row_for_ts(ts)
+        self.log_model.set_current_row(row)
+        if row >= 0 and following and (follow_log or row != previous):
+            self.log_table.scrollTo(self.log_model.index(row, 0))
+
+    def log_row_visible(self, row):
+        """日志行是否在表格的可见范围内，没有高亮行或表格未显示时视为可见"""
+        if row < 0 or row >= self.log_model.rowCount() or not self.log_table.isVisible():
+            return True
+        rect = self.log_table.visualRect(self.log_model.index(row, 0))
+        return self.log_table.viewport().rect().intersects(rect)
+
+    def sensor_values_text(self, ts):
+        """各传感器在指定时刻的数值，在已排序的时间数组上二分查找"""
+        level, series = self.plot_series
+        width = level * 1000000
+        parts = []
+        for sensor_type in self.sensor_types:
+            if sensor_type not in series:
+                continue
+            timestamps, _, _, means = series[sensor_type]
+            i = int(np.searchsorted(timestamps, ts, side='right')) - 1
+            if i < 0 or (width and ts >= timestamps[i] + width):
+                continue
+            parts.append(f"{sensor_type}: {means[i]:.3f}")
+        return "    ".join(parts)
+
+    def log_scrolled(self, value):
+        """日志滚动到顶部时读取前一页"""
+        if value == 0 and self.log_model.can_fetch_before():
+            inserted = self.log_model.fetch_before()
+            self.log_table.verticalScrollBar().setValue(inserted)
+
+    def load_annotations(self):
+        experiment_id = self.current_experiment_id
+
+        def query(conn, token):
+            return conn.execute(
+                "SELECT id, timestamp, annotation_type, description FROM annotations WHERE experiment_id = ? ORDER BY timestamp",
+                (experiment_id,)
+            ).fetchall()
 
-        annotations = cursor.fetchall()
+        self.start_panel_load("annotation", query, self.annotations_loaded)
 
+    def annotations_loaded(self, annotations):
         # 清空列表
         self.annotation_list.clear()
 
@@ -808,17 +1309,17 @@ class PlaybackWidget(QWidget):
             self.annotation_list.addItem(item)
 
     def load_tags(self):
-        if self.db_conn is None or self.current_experiment_id is None:
-            return
+        experiment_id = self.current_experiment_id
 
-        cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT id, start_time, end_time, name, description FROM tags WHERE experiment_id = ? ORDER BY start_time",
-            (self.current_experiment_id,)
-        )
+        def query(conn, token):
+            return conn.execute(
+                "SELECT id, start_time, end_time, name, description FROM tags WHERE experiment_id = ? ORDER BY start_time",
+                (experiment_id,)
+            ).fetchall()
 
-        tags = cursor.fetchall()
+        self.start_panel_load("tag", query, self.tags_loaded)
 
+    def tags_loaded(self, tags):
         # 清空列表
         self.tag_list.clear()
 
@@ -829,16 +1330,102 @@ class PlaybackWidget(QWidget):
             self.tag_list.addItem(item)
 
     def play_video(self):
-        self.media_player.play()
+        rate = self.playback_controls.rate()
+        if is_slow_motion(rate) and self.video_timing is not None:
+            # 播放器不能可靠地按极低速度播放，暂停后按主时钟逐帧显示
+            self.media_player.pause()
+            position = (self.video_timing.position_of(self.current_frame) if self.current_frame is not None
+                        else self.media_player.position())
+            self.slow_clock.seek(position)
+            self.slow_clock.set_rate(rate)
+            self.slow_clock.start()
+            self.slow_timer.start()
+        else:
+            self.leave_frame_view()
+            self.media_player.setPlaybackRate(rate)
+            self.media_player.play()
 
     def pause_video(self):
+        self.slow_timer.stop()
+        self.slow_clock.pause()
         self.media_player.pause()
 
     def stop_video(self):
+        self.slow_timer.stop()
+        self.slow_clock.pause()
+        self.current_frame = None
+        self.show_video_output()
         self.media_player.stop()
 
     def set_position(self, position):
+        slow = self.slow_timer.isActive()
+        self.leave_frame_view()
         self.media_player.setPosition(position)
+        if slow:
+            self.slow_clock.seek(position)
+            self.slow_timer.start()
+
+    def set_rate(self, rate):
+        """改变播放速度，播放中时按新速度继续"""
+        playing = self.slow_timer.isActive() or self.media_player.state() == QMediaPlayer.PlayingState
+        if playing:
+            self.pause_video()
+            self.play_video()
+
+    def advance_slow_motion(self):
+        """慢放: 显示主时钟位置所在的帧"""
+        position = self.slow_clock.position()
+        if self.video_duration and position >= self.video_duration:
+            self.pause_video()
+            return
+        frame = self.video_timing.frame_at(position)
+        if frame != self.current_frame:
+            self.show_frame(frame)
+
+    def step_frames(self, frames):
+        """暂停后前进或后退若干帧"""
+        if self.video_timing is None or self.media_player.media().isNull():
+            return
+        self.pause_video()
+        current = (self.current_frame if self.current_frame is not None
+                   else self.video_timing.frame_at(self.media_player.position()))
+        last = self.video_timing.frame_at(self.video_duration) if self.video_duration else None
+        frame = max(current + frames, 0)
+        if last is not None:
+            frame = min(frame, max(last - 1, 0))
+        self.show_frame(frame)
+
+    def show_frame(self, frame):
+        """显示指定帧: 能逐帧解码时显示解码的画面，否则让播放器定位到该帧的位置"""
+        self.current_frame = frame
+        position = self.video_timing.position_of(frame)
+        image = self.frame_stepper.frame(frame) if self.frame_stepper is not None else None
+        if image is None:
+            self.show_video_output()
+            self.media_player.setPosition(int(position))
+            return
+        self.frame_view.setPixmap(QPixmap.fromImage(image).scaled(
+            self.frame_view.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        self.video_stack.setCurrentWidget(self.frame_view)
+
+        # 帧的时刻按帧序号换算，不经过毫秒取整
+        if not self.progress_slider.isSliderDown():
+            self.progress_slider.setValue(int(position))
+        self.time_label.setText(f"{format_hms(position)} / {format_hms(self.media_player.duration())}")
+        ts = self.video_timing.wall_ts(frame)
+        self.playback_controls.set_frame_info(frame, ts)
+        if ts is not None:
+            self.show_playhead(ts)
+
+    def leave_frame_view(self):
+        """恢复播放器输出，从当前查看的帧继续"""
+        if self.current_frame is not None and self.video_stack.currentWidget() is self.frame_view:
+            self.media_player.setPosition(int(self.video_timing.position_of(self.current_frame)))
+        self.current_frame = None
+        self.show_video_output()
+
+    def show_video_output(self):
+        self.video_stack.setCurrentWidget(self.video_widget)
 
     def add_annotation(self):
         if self.db_conn is None or self.current_experiment_id is None:
@@ -963,6 +1550,8 @@ class DataExportWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.db_conn = None
+        self.db_file = None
+        self.schema = PLAYBACK_SCHEMA
         self.current_experiment_id = None
         self.initUI()
 
@@ -988,7 +1577,9 @@ class DataExportWidget(QWidget):
         exp_layout.addWidget(QLabel("选择试验:"))
         self.exp_combo = QComboBox()
         self.exp_combo.currentIndexChanged.connect(self.experiment_selected)
-        exp_layout.addWidget(self.exp_combo)
+        exp_layout.addWidget(self.exp_combo, 1)
+        self.cache_label = QLabel("")
+        exp_layout.addWidget(self.cache_label)
 
         layout.addLayout(exp_layout)
 
@@ -1127,6 +1718,19 @@ class DataExportWidget(QWidget):
         if self.db_conn is None:
             QMessageBox.critical(self, "错误", "无法连接到数据库")
             return
+        self.db_file = db_file
+
+        # 旧数据库在后台迁移，完成后再识别数据库结构
+        migrate_with_progress(self, db_file, self.database_migrated)
+
+    def database_migrated(self, completed):
+        if not completed:
+            self.db_conn.close()
+            self.db_conn = None
+            self.db_file = None
+            self.exp_combo.clear()
+            return
+        self.schema = detect_schema(self.db_conn)
 
         # 加载试验列表
         self.load_experiments()
@@ -1136,7 +1740,7 @@ class DataExportWidget(QWidget):
             return
 
         cursor = self.db_conn.cursor()
-        cursor.execute("SELECT id, experiment_id, name FROM experiments")
+        cursor.execute(self.schema["experiments_sql"])
         experiments = cursor.fetchall()
 
         self.exp_combo.clear()
@@ -1151,6 +1755,7 @@ class DataExportWidget(QWidget):
             return
 
         self.current_experiment_id = self.exp_combo.currentData()
+        print(f"试验数据缓存: {format_stats(experiment_cache.stats())}")
 
         # 加载相机列表
         self.load_cameras()
@@ -1160,18 +1765,17 @@ class DataExportWidget(QWidget):
 
         # 加载时间范围
         self.load_time_range()
+        show_cache_stats(self.cache_label)
 
     def load_cameras(self):
         if self.db_conn is None or self.current_experiment_id is None:
             return
 
         cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT DISTINCT camera_id FROM video_data WHERE experiment_id = ?",
+        cameras = cached(cache_key(self.db_file, self.current_experiment_id, "cameras"), lambda: cursor.execute(
+            f"SELECT DISTINCT {self.schema['camera']} FROM video_data WHERE experiment_id = ?",
             (self.current_experiment_id,)
-        )
-
-        cameras = cursor.fetchall()
+        ).fetchall())
 
         self.camera_list.clear()
         for camera in cameras:
@@ -1182,12 +1786,11 @@ class DataExportWidget(QWidget):
             return
 
         cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT DISTINCT data_type FROM realtime_data WHERE experiment_id = ?",
+        data_types = cached(cache_key(self.db_file, self.current_experiment_id, "data_types"), lambda: cursor.execute(
+            f"SELECT DISTINCT {self.schema['sensor_type']} FROM {self.schema['sensor_table']} "
+            f"WHERE experiment_id = ?",
             (self.current_experiment_id,)
-        )
-
-        data_types = cursor.fetchall()
+        ).fetchall())
 
         self.data_type_list.clear()
         for data_type in data_types:
@@ -1198,12 +1801,10 @@ class DataExportWidget(QWidget):
             return
 
         cursor = self.db_conn.cursor()
-        cursor.execute(
+        experiment = cached(cache_key(self.db_file, self.current_experiment_id, "time_range"), lambda: cursor.execute(
             "SELECT start_time, end_time FROM experiments WHERE id = ?",
             (self.current_experiment_id,)
-        )
-
-        experiment = cursor.fetchone()
+        ).fetchone())
         if experiment:
             start_time = QDateTime.fromString(experiment[0], "yyyy-MM-dd hh:mm:ss")
             end_time = QDateTime.fromString(experiment[1], "yyyy-MM-dd hh:mm:ss")
@@ -1277,9 +1878,9 @@ class DataExportWidget(QWidget):
             QMessageBox.warning(self, "错误", "请至少选择一种数据类型")
             return
 
-        # 获取时间范围
-        start_time = self.data_start_time.dateTime().toString("yyyy-MM-dd hh:mm:ss")
-        end_time = self.data_end_time.dateTime().toString("yyyy-MM-dd hh:mm:ss")
+        # 获取时间范围（微秒），结束时间包含整秒
+        start_ts = datetime_to_us(self.data_start_time.dateTime().toPyDateTime().replace(microsecond=0))
+        end_ts = datetime_to_us(self.data_end_time.dateTime().toPyDateTime().replace(microsecond=0)) + 999999
 
         # 获取导出选项
         include_headers = self.include_headers.isChecked()
@@ -1309,11 +1910,11 @@ class DataExportWidget(QWidget):
                 for data_type in selected_data_types:
                     cursor = self.db_conn.cursor()
                     cursor.execute(
-                        """SELECT timestamp, value 
-                        FROM realtime_data 
-                        WHERE experiment_id = ? AND data_type = ? AND timestamp BETWEEN ? AND ?
-                        ORDER BY timestamp""",
-                        (self.current_experiment_id, data_type, start_time, end_time)
+                        f"""SELECT timestamp, value
+                        FROM {self.schema['sensor_table']}
+                        WHERE experiment_id = ? AND {self.schema['sensor_type']} = ? AND ts BETWEEN ? AND ?
+                        ORDER BY ts""",
+                        (self.current_experiment_id, data_type, start_ts, end_ts)
                     )
 
                     data = cursor.fetchall()
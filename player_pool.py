@@ -0,0 +1,122 @@
+"""
+预热播放器池 - 为即将切换到的视频预先打开文件并解码画面
+选中视频的相邻视频和最近看过的视频各占用一个轨道播放器，暂停在开头或上次离开的位置，
+切换时只需把该播放器的画面切到前台，不必重新打开文件和缓冲。
+预热的播放器数量和估算的解码内存都有上限，超出时释放最久未使用的。
+"""
+
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtWidgets import QStackedWidget
+
+from segment_track import TrackPlayer
+
+# 除当前播放器外最多预热的播放器数量
+WARM_PLAYERS = 4
+
+# 预热播放器估算的解码内存上限（字节），不含当前播放器
+WARM_MEMORY_BYTES = 512 << 20
+
+# 预热当前视频前后各几个视频
+WARM_NEIGHBOURS = 1
+
+# 每个播放器估算缓冲的解码帧数，以及分辨率未知时按1080p估算
+DECODER_BUFFER_FRAMES = 16
+DEFAULT_FRAME_SIZE = (1920, 1080)
+
+
+def estimate_player_bytes(width, height):
+    """播放器解码缓冲的估算内存（YUV420每像素1.5字节）"""
+    if not width or not height:
+        width, height = DEFAULT_FRAME_SIZE
+    return int(width * height * 1.5 * DECODER_BUFFER_FRAMES)
+
+
+class WarmPlayerPool(QObject):
+    """预热播放器池
+
+    view是所有播放器画面叠放的控件，当前播放器的画面在最前。
+    切换到另一条轨道时发送activated(新的播放器, 之前的播放器)，调用方据此改接信号。
+    cost(track) 返回预热该轨道的估算内存（字节）。
+    """
+
+    activated = pyqtSignal(object, object)
+
+    def __init__(self, parent=None, max_players=WARM_PLAYERS, memory_cap=WARM_MEMORY_BYTES, cost=None):
+        super().__init__(parent)
+        self.max_players = max_players
+        self.memory_cap = memory_cap
+        self.cost = cost or (lambda track: estimate_player_bytes(0, 0))
+        self.warm = OrderedDict()  # 轨道键 -> 预热的播放器，最近使用的在后
+
+        # 播放器一次创建好，画面都放入view，之后只切换轨道
+        self.view = QStackedWidget()
+        self.idle = []
+        for _ in range(max_players + 1):
+            player = TrackPlayer(self)
+            self.view.addWidget(player.view)
+            self.idle.append(player)
+        self.current = self.idle.pop()
+        self.view.setCurrentWidget(self.current.view)
+
+    def is_warm(self, key):
+        return key in self.warm
+
+    def activate(self, track, keyframe_loader=None):
+        """切换到轨道，已预热时直接切到前台，之前的播放器暂停后保留为预热状态"""
+        previous = self.current
+        previous_track = previous.track
+        player = self.warm.pop(track.key, None)
+        if player is None:
+            if previous_track is not None and previous_track.key == track.key:
+                return previous
+            player = self._take_player()
+            player.setTrack(track, keyframe_loader)
+        if previous_track is not None:
+            previous.pause()
+            self.warm[previous_track.key] = previous
+        else:
+            self.idle.append(previous)
+        self.current = player
+        self.view.setCurrentWidget(player.view)
+        self._trim()
+        self.activated.emit(player, previous)
+        return player
+
+    def prewarm(self, tracks, keyframe_loader=None):
+        """预热一组轨道（通常是当前视频的相邻视频），已预热的只更新使用顺序"""
+        for track in tracks:
+            if self.current.track is not None and self.current.track.key == track.key:
+                continue
+            if track.key in self.warm:
+                self.warm.move_to_end(track.key)
+                continue
+            player = self._take_player()
+            player.setTrack(track, keyframe_loader)
+            player.pause()  # 暂停状态下打开文件并解码第一帧
+            self.warm[track.key] = player
+            self._trim()
+
+    def clear(self):
+        """释放所有预热的播放器，当前播放器也关闭文件"""
+        while self.warm:
+            self._release(self.warm.popitem(last=False)[1])
+        self.current.setTrack(None)
+
+    def warm_bytes(self):
+        return sum(self.cost(player.track) for player in self.warm.values())
+
+    def _take_player(self):
+        if not self.idle:
+            self._release(self.warm.popitem(last=False)[1])
+        return self.idle.pop()
+
+    def _release(self, player):
+        player.setTrack(None)
+        self.idle.append(player)
+
+    def _trim(self):
+        """超出数量或内存上限时释放最久未使用的预热播放器"""
+        while self.warm and (len(self.warm) > self.max_players or self.warm_bytes() > self.memory_cap):
+            self._release(self.warm.popitem(last=False)[1])
@@ -0,0 +1,393 @@
+"""
+分段录像轨道 - 把同一设备的多段录像拼接为一条连续的时间轴
+NVR按固定时长把录像切分为许多短文件，回放时同一设备的所有分段组成一条轨道，
+按轨道内的位置二分查找所在分段和段内偏移。
+轨道播放器使用两个QMediaPlayer交替播放：当前分段快结束时在后台播放器中预先加载下一段，
+结束时直接切换，分段之间没有加载停顿。
+已生成代理视频时可切换为播放代理视频，切换时保持当前位置。
+"""
+
+import os
+from bisect import bisect_right
+from collections import namedtuple
+
+from PyQt5.QtCore import QObject, QUrl, pyqtSignal
+from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer
+from PyQt5.QtMultimediaWidgets import QVideoWidget
+from PyQt5.QtWidgets import QStackedWidget
+
+from keyframe_index import KeyframeIndex, prefetch_around
+from video_proxy import proxy_for
+
+# 当前分段剩余多少毫秒时预先加载下一段
+PRELOAD_AHEAD = 10000
+
+# 相邻分段间隔不超过该值（毫秒）时视为连续录像，直接切换到下一段
+SEGMENT_GAP_TOLERANCE = 1000
+
+# 分段: 视频id、文件路径、在轨道内的起止位置（毫秒）
+Segment = namedtuple("Segment", "video_id file_path start end")
+
+
+def track_key(experiment_id, device_id):
+    """同一试验、同一设备的录像属于同一条轨道"""
+    return experiment_id, device_id
+
+
+class SegmentTrack:
+    """分段录像轨道 - 按开始位置排序的分段和二分查找用的起点列表"""
+
+    def __init__(self, key, segments, start_ts=None):
+        self.key = key
+        self.segments = sorted(segments, key=lambda segment: segment.start)
+        self.starts = [segment.start for segment in self.segments]
+        self.start_ts = start_ts  # 轨道起点的墙钟时刻（微秒），分段都没有记录时刻时为None
+        self.duration = max((segment.end for segment in self.segments), default=0)
+
+    @property
+    def end_ts(self):
+        if self.start_ts is None:
+            return None
+        return self.start_ts + self.duration * 1000
+
+    @classmethod
+    def from_videos(cls, key, videos):
+        """由同一设备的视频记录 [(视频id, 文件路径, 时长毫秒, 开始时刻, 结束时刻)] 建立轨道
+
+        有开始时刻的分段按时刻排列，没有的按文件名顺序接在后面。
+        """
+        timed = sorted((video for video in videos if video[3] is not None), key=lambda video: video[3])
+        untimed = sorted((video for video in videos if video[3] is None), key=lambda video: video[1])
+        start_ts = timed[0][3] if timed else None
+
+        segments = []
+        position = 0
+        for video_id, file_path, duration, video_start_ts, video_end_ts in timed:
+            start = (video_start_ts - start_ts) // 1000
+            if not duration and video_end_ts is not None:
+                duration = (video_end_ts - video_start_ts) // 1000
+            segments.append(Segment(video_id, file_path, start, start + (duration or 0)))
+            position = max(position, start + (duration or 0))
+        for video_id, file_path, duration, _, _ in untimed:
+            segments.append(Segment(video_id, file_path, position, position + (duration or 0)))
+            position += duration or 0
+        return cls(key, segments, start_ts)
+
+    def locate(self, position):
+        """轨道内位置所在的分段序号，落在分段之间的空白时返回None"""
+        index = bisect_right(self.starts, position) - 1
+        if index < 0 or position >= self.segments[index].end:
+            return None
+        return index
+
+    def next_index(self, index):
+        """下一个分段的序号，没有时返回None"""
+        return index + 1 if index + 1 < len(self.segments) else None
+
+    def is_continuous(self, index):
+        """该分段与下一段之间是否没有空白"""
+        following = self.next_index(index)
+        return (following is not None and
+                self.segments[following].start - self.segments[index].end <= SEGMENT_GAP_TOLERANCE)
+
+    def __len__(self):
+        return len(self.segments)
+
+
+def build_tracks(videos):
+    """按设备把视频记录组成轨道，返回 (轨道列表, 不存在的文件列表)
+
+    videos为 [(视频id, 试验编号, 设备编号, 文件路径, 时长毫秒, 开始时刻, 结束时刻)]，
+    轨道按设备首次出现的顺序排列；文件不存在的分段跳过。
+    """
+    groups = {}
+    missing = []
+    for video_id, experiment_id, device_id, file_path, duration, start_ts, end_ts in videos:
+        if not os.path.exists(file_path):
+            missing.append(file_path)
+            continue
+        groups.setdefault(track_key(experiment_id, device_id), []).append(
+            (video_id, file_path, duration, start_ts, end_ts))
+    return [SegmentTrack.from_videos(key, segments) for key, segments in groups.items()], missing
+
+
+class TrackPlayer(QObject):
+    """轨道播放器 - 接口与QMediaPlayer一致，位置和时长都是轨道内的毫秒数
+
+    view是两路视频输出叠放的控件，由调用方放入界面。
+    skip_gaps为True时当前分段结束后跳过空白直接播放下一段（单路播放），
+    为False时停在空白处，由外部时钟决定何时继续（多路同步播放）。
+    """
+
+    positionChanged = pyqtSignal('qint64')
+    durationChanged = pyqtSignal('qint64')
+    stateChanged = pyqtSignal(int)
+    mediaStatusChanged = pyqtSignal(int)
+    volumeChanged = pyqtSignal(int)
+    error = pyqtSignal(int)
+
+    def __init__(self, parent=None, skip_gaps=True):
+        super().__init__(parent)
+        self.skip_gaps = skip_gaps
+        self.track = None
+        self.keyframe_loader = None  # 视频id -> KeyframeIndex
+        self._keyframes = {}
+        self.use_proxy = False  # 有代理视频的分段播放代理视频
+        self._proxies = {}  # 视频id -> 代理视频路径，没有时为None
+        self._players = []
+        self.view = QStackedWidget()
+        for slot in range(2):
+            player = QMediaPlayer(None, QMediaPlayer.VideoSurface)
+            video_widget = QVideoWidget()
+            self.view.addWidget(video_widget)
+            player.setVideoOutput(video_widget)
+            player.positionChanged.connect(lambda position, slot=slot: self._on_position(slot, position))
+            player.mediaStatusChanged.connect(lambda status, slot=slot: self._on_status(slot, status))
+            player.volumeChanged.connect(lambda volume, slot=slot: self._on_volume(slot, volume))
+            player.error.connect(self.error)
+            self._players.append(player)
+        self._active = 0  # 正在播放的播放器
+        self._loaded = [None, None]  # 两个播放器中加载的分段序号
+        self._index = None  # 当前分段序号
+        self._in_gap = False  # 停在分段之间的空白处
+        self._position = 0  # 停在空白处时的轨道位置
+        self._state = QMediaPlayer.StoppedState
+        self._ended = False
+
+    # 轨道
+
+    def setTrack(self, track, keyframe_loader=None):
+        """切换到另一条轨道"""
+        for player in self._players:
+            player.stop()
+            player.setMedia(QMediaContent())
+        self.track = track
+        self.keyframe_loader = keyframe_loader
+        self._keyframes = {}
+        self._proxies = {}
+        self._loaded = [None, None]
+        self._index = None
+        self._in_gap = False
+        self._position = 0
+        self._ended = False
+        self._set_state(QMediaPlayer.StoppedState)
+        if track is not None and len(track):
+            self._activate(0, 0)
+        self.durationChanged.emit(self.duration())
+
+    def covers(self, position):
+        """轨道内该位置是否有录像"""
+        return self.track is not None and self.track.locate(position) is not None
+
+    def current_segment(self):
+        if self.track is None or self._index is None:
+            return None
+        return self.track.segments[self._index]
+
+    def set_use_proxy(self, use):
+        """切换代理视频和原始录像，正在播放的分段重新加载并回到原位置"""
+        if use == self.use_proxy:
+            return
+        self.use_proxy = use
+        reload = self._index is not None and not self._in_gap and self._source_changed(self._index)
+        self._loaded = [None, None]
+        if reload:
+            self._activate(self._index, self._players[self._active].position())
+            if self._state == QMediaPlayer.PausedState:
+                self._players[self._active].pause()  # 暂停时也显示新加载的画面
+
+    def proxy_path(self, segment):
+        """分段的代理视频路径，首次使用时查找"""
+        if segment.video_id not in self._proxies:
+            self._proxies[segment.video_id] = proxy_for(segment.file_path)
+        return self._proxies[segment.video_id]
+
+    def _source(self, segment):
+        """分段实际播放的文件"""
+        if self.use_proxy:
+            return self.proxy_path(segment) or segment.file_path
+        return segment.file_path
+
+    def _source_changed(self, index):
+        return self.proxy_path(self.track.segments[index]) is not None
+
+    def _activate(self, index, local):
+        """把指定分段切换到前台播放器并定位到段内位置，下一段已预先加载时直接切换"""
+        standby = 1 - self._active
+        if self._loaded[self._active] != index:
+            if self._loaded[standby] == index:
+                self._players[self._active].pause()
+                self._active = standby
+            else:
+                segment = self.track.segments[index]
+                self._players[self._active].setMedia(QMediaContent(QUrl.fromLocalFile(self._source(segment))))
+                self._loaded[self._active] = index
+        self.view.setCurrentIndex(self._active)
+        self._index = index
+        self._in_gap = False
+        self._ended = False
+        player = self._players[self._active]
+        player.setPosition(int(local))
+        if self._state == QMediaPlayer.PlayingState:
+            player.play()
+
+    def _preload(self, index):
+        """在后台播放器中加载分段并暂停在开头，切换时不必等待打开文件和解码第一帧"""
+        standby = 1 - self._active
+        if index is None or self._loaded[standby] == index:
+            return
+        player = self._players[standby]
+        player.setMedia(QMediaContent(QUrl.fromLocalFile(self._source(self.track.segments[index]))))
+        player.pause()
+        self._loaded[standby] = index
+
+    def _advance(self):
+        """当前分段播放结束，切换到下一段"""
+        following = self.track.next_index(self._index)
+        if following is not None and (self.skip_gaps or self.track.is_continuous(self._index)):
+            self._activate(following, 0)
+            self.positionChanged.emit(self.position())
+            return
+        # 没有下一段，或停在空白处等待外部时钟
+        self._in_gap = True
+        self._position = self.track.segments[self._index].end
+        self._ended = following is None
+        if self._ended:
+            self._set_state(QMediaPlayer.StoppedState)
+            self.mediaStatusChanged.emit(QMediaPlayer.EndOfMedia)
+
+    # 播放器信号，只转发前台播放器的
+
+    def _on_position(self, slot, position):
+        if slot != self._active or self._index is None:
+            return
+        segment = self.track.segments[self._index]
+        if segment.end - segment.start - position <= PRELOAD_AHEAD:
+            self._preload(self.track.next_index(self._index))
+        self.positionChanged.emit(segment.start + position)
+
+    def _on_status(self, slot, status):
+        if slot != self._active or self._index is None:
+            return
+        if status == QMediaPlayer.EndOfMedia:
+            self._advance()
+        else:
+            self.mediaStatusChanged.emit(status)
+
+    def _on_volume(self, slot, volume):
+        if slot == self._active:
+            self.volumeChanged.emit(volume)
+
+    def _set_state(self, state):
+        if state != self._state:
+            self._state = state
+            self.stateChanged.emit(state)
+
+    # 与QMediaPlayer一致的接口
+
+    def play(self):
+        if self.track is None or not len(self.track):
+            return
+        if self._ended:
+            self._activate(0, 0)
+        elif self._in_gap and self.skip_gaps:
+            # 跳过空白从下一段开始，后面没有分段时从头播放
+            following = bisect_right(self.track.starts, self._position)
+            self._activate(following if following < len(self.track) else 0, 0)
+        self._set_state(QMediaPlayer.PlayingState)
+        if not self._in_gap:
+            self._players[self._active].play()
+
+    def pause(self):
+        self._players[self._active].pause()
+        self._set_state(QMediaPlayer.PausedState)
+
+    def stop(self):
+        for player in self._players:
+            player.pause()
+        self._set_state(QMediaPlayer.StoppedState)
+        if self.track is not None and len(self.track):
+            self._activate(0, 0)
+
+    def state(self):
+        return self._state
+
+    def mediaStatus(self):
+        if self._ended:
+            return QMediaPlayer.EndOfMedia
+        return self._players[self._active].mediaStatus()
+
+    def media(self):
+        return self._players[self._active].media()
+
+    def errorString(self):
+        return self._players[self._active].errorString()
+
+    def duration(self):
+        return self.track.duration if self.track is not None else 0
+
+    def position(self):
+        segment = self.current_segment()
+        if segment is None or self._in_gap:
+            return self._position
+        return segment.start + self._players[self._active].position()
+
+    def setPosition(self, position):
+        """定位到轨道内的位置，直接找到所在分段和段内偏移"""
+        if self.track is None or not len(self.track):
+            return
+        index = self.track.locate(position)
+        if index is None:
+            # 落在空白处，停在该位置
+            self._players[self._active].pause()
+            self._in_gap = True
+            self._position = position
+            self.positionChanged.emit(position)
+            return
+        segment = self.track.segments[index]
+        self._activate(index, position - segment.start)
+        if segment.end - position <= PRELOAD_AHEAD:
+            self._preload(self.track.next_index(index))
+
+    def setPlaybackRate(self, rate):
+        for player in self._players:
+            player.setPlaybackRate(rate)
+
+    def playbackRate(self):
+        return self._players[self._active].playbackRate()
+
+    def setVolume(self, volume):
+        for player in self._players:
+            player.setVolume(volume)
+
+    def volume(self):
+        return self._players[self._active].volume()
+
+    # 关键帧
+
+    def segment_keyframes(self, segment):
+        """分段的关键帧索引，首次使用时读取"""
+        index = self._keyframes.get(segment.video_id)
+        if index is None:
+            index = self.keyframe_loader(segment.video_id) if self.keyframe_loader else KeyframeIndex()
+            self._keyframes[segment.video_id] = index
+        return index
+
+    def nearest_keyframe(self, position):
+        """轨道内离该位置最近的关键帧位置"""
+        index = self.track.locate(position) if self.track is not None else None
+        if index is None:
+            return position
+        segment = self.track.segments[index]
+        if self.use_proxy and self.proxy_path(segment):
+            return position  # 代理视频每帧都是关键帧
+        return segment.start + self.segment_keyframes(segment).nearest(position - segment.start)
+
+    def prefetch(self, position):
+        """预读该位置附近的文件内容"""
+        index = self.track.locate(position) if self.track is not None else None
+        if index is not None:
+            segment = self.track.segments[index]
+            if self.use_proxy and self.proxy_path(segment):
+                return  # 关键帧索引对应原始录像，代理视频很小无需预读
+            prefetch_around(segment.file_path, self.segment_keyframes(segment), position - segment.start)
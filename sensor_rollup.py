@@ -0,0 +1,186 @@
+"""
+传感器数据概览 - 按多个时间粒度预先汇总的最小值/最大值/平均值/点数
+导入完成后按1秒汇总原始数据，再由细粒度逐级汇总出10秒、1分钟、10分钟的数据。
+绘图时按可见时间范围和像素宽度选择合适的粒度，不必读取全部原始数据；
+比最细的粒度还细时读取原始数据，也按像素宽度抽稀。
+"""
+
+import numpy as np
+
+# 汇总粒度（秒），从细到粗
+ROLLUP_LEVELS = (1, 10, 60, 600)
+
+# 没有合适的汇总粒度时直接读取原始数据
+RAW_LEVEL = 0
+
+
+def rollup_table(schema):
+    """传感器数据表对应的汇总表名"""
+    return f"{schema['sensor_table']}_rollup"
+
+
+def create_rollup_table(conn, schema):
+    """创建汇总表，主键顺序保证按粒度和传感器读取一段时间范围时是连续扫描"""
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS {rollup_table(schema)} (
+        experiment_id,
+        level INTEGER,
+        sensor_type TEXT,
+        bucket_ts INTEGER,
+        min_value REAL,
+        max_value REAL,
+        sum_value REAL,
+        count INTEGER,
+        PRIMARY KEY (experiment_id, level, sensor_type, bucket_ts)
+    ) WITHOUT ROWID
+    ''')
+    conn.commit()
+
+
+def build_rollups(conn, schema, experiment_id):
+    """重新生成一个实验的全部汇总数据"""
+    table = rollup_table(schema)
+    create_rollup_table(conn, schema)
+    with conn:
+        conn.execute(f"DELETE FROM {table} WHERE experiment_id = ?", (experiment_id,))
+
+        # 最细的粒度直接从原始数据汇总
+        width = ROLLUP_LEVELS[0] * 1000000
+        conn.execute(f'''
+        INSERT INTO {table}
+        SELECT experiment_id, ?, {schema['sensor_type']}, (ts / ?) * ?,
+               MIN(value), MAX(value), SUM(value), COUNT(value)
+        FROM {schema['sensor_table']}
+        WHERE experiment_id = ? AND ts IS NOT NULL AND value IS NOT NULL
+        GROUP BY {schema['sensor_type']}, ts / ?
+        ''', (ROLLUP_LEVELS[0], width, width, experiment_id, width))
+
+        # 更粗的粒度由上一级汇总得到，数据量逐级减少
+        for previous, level in zip(ROLLUP_LEVELS, ROLLUP_LEVELS[1:]):
+            width = level * 1000000
+            conn.execute(f'''
+            INSERT INTO {table}
+            SELECT experiment_id, ?, sensor_type, (bucket_ts / ?) * ?,
+                   MIN(min_value), MAX(max_value), SUM(sum_value), SUM(count)
+            FROM {table}
+            WHERE experiment_id = ? AND level = ?
+            GROUP BY sensor_type, bucket_ts / ?
+            ''', (level, width, width, experiment_id, previous, width))
+
+
+def drop_rollups(conn, schema, experiment_id):
+    """删除一个实验的汇总数据（导入回滚后），下次回放时由ensure_rollups重新生成"""
+    table = rollup_table(schema)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (table,)).fetchone() is None:
+        return
+    with conn:
+        conn.execute(f"DELETE FROM {table} WHERE experiment_id = ?", (experiment_id,))
+
+
+def has_rollups(conn, schema, experiment_id):
+    """检查实验是否已生成汇总数据"""
+    table = rollup_table(schema)
+    try:
+        return conn.execute(f"SELECT 1 FROM {table} WHERE experiment_id = ? LIMIT 1",
+                            (experiment_id,)).fetchone() is not None
+    except Exception:
+        return False
+
+
+def ensure_rollups(conn, schema, experiment_id):
+    """汇总数据不存在时生成（旧数据库或回放模块自己写入的数据）"""
+    if not has_rollups(conn, schema, experiment_id):
+        build_rollups(conn, schema, experiment_id)
+
+
+def sensor_time_range(conn, schema, experiment_id):
+    """获取实验中各传感器的类型和整体时间范围(微秒)，没有数据时返回([], None, None)
+
+    传感器类型从最粗的汇总中读取，起止时间用(experiment_id, 类型, ts)索引逐个查找。
+    """
+    types = [row[0] for row in conn.execute(
+        f"SELECT DISTINCT sensor_type FROM {rollup_table(schema)} WHERE experiment_id = ? AND level = ?",
+        (experiment_id, ROLLUP_LEVELS[-1]))]
+    start_ts, end_ts = None, None
+    for sensor_type in types:
+        # MIN和MAX分开查询，SQLite才能直接用索引的两端
+        where = f"FROM {schema['sensor_table']} WHERE experiment_id = ? AND {schema['sensor_type']} = ?"
+        first = conn.execute(f"SELECT MIN(ts) {where}", (experiment_id, sensor_type)).fetchone()[0]
+        last = conn.execute(f"SELECT MAX(ts) {where}", (experiment_id, sensor_type)).fetchone()[0]
+        if first is not None:
+            start_ts = first if start_ts is None else min(start_ts, first)
+            end_ts = last if end_ts is None else max(end_ts, last)
+    return types, start_ts, end_ts
+
+
+def choose_level(start_ts, end_ts, pixels):
+    """选择每个像素至少对应一个时间段的最粗粒度，范围太小时返回RAW_LEVEL"""
+    seconds_per_pixel = (end_ts - start_ts) / 1000000 / max(pixels, 1)
+    level = RAW_LEVEL
+    for candidate in ROLLUP_LEVELS:
+        if candidate <= seconds_per_pixel:
+            level = candidate
+    return level
+
+
+def _fetch_columns(cursor):
+    """整批读取查询结果并转换为float64数组，各列连续存放"""
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    # 微秒时间戳小于2^53，用float64表示不损失精度；NULL转换为nan
+    data = np.array(rows, dtype=np.float64)
+    data = data[~np.isnan(data).any(axis=1)]
+    return tuple(np.ascontiguousarray(data[:, i]) for i in range(data.shape[1]))
+
+
+def raw_bucket_us(start_ts, end_ts, pixels):
+    """原始数据按像素抽稀时每个时间段的宽度（微秒），时间段数不超过像素数"""
+    return max(-(-(end_ts - start_ts + 1) // max(pixels, 1)), 1)
+
+
+def query_series(conn, schema, experiment_id, types, start_ts, end_ts, level, pixels=None):
+    """读取时间范围内的数据，按传感器类型分组
+
+    返回 {类型: (时间数组, 最小值数组, 最大值数组, 平均值数组)}，均为float64。
+    汇总粒度的时间是时间段的起点。原始数据给出pixels时按像素宽度分段，
+    在SQL中计算每段的最小值、最大值和平均值，时间取段内第一个点，
+    每个传感器最多pixels个点，数据比像素稀疏时就是原始的点；
+    不给pixels时返回全部原始点，最小值、最大值和平均值是同一个数组。
+    每个传感器单独查询，使索引可以直接定位到该传感器的时间范围。
+    """
+    series = {}
+    for sensor_type in types:
+        if level == RAW_LEVEL and pixels:
+            bucket = raw_bucket_us(start_ts, end_ts, pixels)
+            cursor = conn.execute(
+                f"SELECT MIN(ts), MIN(value), MAX(value), AVG(value) FROM {schema['sensor_table']} "
+                f"WHERE experiment_id = ? AND {schema['sensor_type']} = ? AND ts BETWEEN ? AND ? "
+                f"AND value IS NOT NULL "
+                f"GROUP BY (ts - ?) / ? ORDER BY 1",
+                (experiment_id, sensor_type, start_ts, end_ts, start_ts, bucket))
+            columns = _fetch_columns(cursor)
+            if columns is not None:
+                series[sensor_type] = columns
+        elif level == RAW_LEVEL:
+            cursor = conn.execute(
+                f"SELECT ts, value FROM {schema['sensor_table']} "
+                f"WHERE experiment_id = ? AND {schema['sensor_type']} = ? AND ts BETWEEN ? AND ? "
+                f"ORDER BY ts",
+                (experiment_id, sensor_type, start_ts, end_ts))
+            columns = _fetch_columns(cursor)
+            if columns is not None:
+                timestamps, values = columns
+                series[sensor_type] = (timestamps, values, values, values)
+        else:
+            cursor = conn.execute(
+                f"SELECT bucket_ts, min_value, max_value, sum_value / count "
+                f"FROM {rollup_table(schema)} "
+                f"WHERE experiment_id = ? AND level = ? AND sensor_type = ? AND bucket_ts BETWEEN ? AND ? "
+                f"ORDER BY bucket_ts",
+                (experiment_id, level, sensor_type, start_ts - level * 1000000, end_ts))
+            columns = _fetch_columns(cursor)
+            if columns is not None:
+                series[sensor_type] = columns
+    return series
@@ -0,0 +1,76 @@
+"""
+进度条悬停预览 - 鼠标悬停在进度条上时，在上方显示该位置的画面和时间
+画面由调用方从预先生成的胶片条中取得，不需要主播放器定位。
+"""
+
+from PyQt5.QtCore import QEvent, QObject, QPoint, Qt
+from PyQt5.QtGui import QColor, QPainter
+from PyQt5.QtWidgets import QLabel, QStyle, QStyleOptionSlider
+
+
+class SliderPreview(QObject):
+    """进度条悬停预览
+
+    frame_at(position) 返回该位置的QPixmap，没有画面时返回None；
+    format_time(position) 返回显示的时间文本。
+    """
+
+    def __init__(self, slider, frame_at, format_time):
+        super().__init__(slider)
+        self.slider = slider
+        self.frame_at = frame_at
+        self.format_time = format_time
+        self.hover_x = None  # 鼠标在进度条上的横坐标，不在进度条上时为None
+
+        self.popup = QLabel(None, Qt.ToolTip)
+        self.popup.setAlignment(Qt.AlignCenter)
+        self.popup.setStyleSheet("background-color: black; color: white; border: 1px solid gray; padding: 2px;")
+
+        slider.setMouseTracking(True)
+        slider.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self.slider:
+            if event.type() == QEvent.MouseMove:
+                self.hover_x = event.pos().x()
+                self.refresh()
+            elif event.type() in (QEvent.Leave, QEvent.Hide):
+                self.hover_x = None
+                self.popup.hide()
+        return False
+
+    def position_at(self, x):
+        """进度条上横坐标对应的值"""
+        option = QStyleOptionSlider()
+        self.slider.initStyleOption(option)
+        style = self.slider.style()
+        groove = style.subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderGroove, self.slider)
+        handle = style.subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderHandle, self.slider)
+        span = groove.width() - handle.width()
+        offset = x - groove.x() - handle.width() // 2
+        return QStyle.sliderValueFromPosition(self.slider.minimum(), self.slider.maximum(),
+                                              min(max(offset, 0), span), span, option.upsideDown)
+
+    def refresh(self):
+        """按当前鼠标位置更新预览（胶片条生成完成后也可调用）"""
+        if self.hover_x is None or self.slider.maximum() <= self.slider.minimum():
+            return
+        position = self.position_at(self.hover_x)
+        text = self.format_time(position)
+        pixmap = self.frame_at(position)
+        if pixmap is None or pixmap.isNull():
+            self.popup.setText(text)
+        else:
+            # 时间叠加在画面底部
+            painter = QPainter(pixmap)
+            strip = painter.fontMetrics().height() + 2
+            painter.fillRect(0, pixmap.height() - strip, pixmap.width(), strip, QColor(0, 0, 0, 150))
+            painter.setPen(Qt.white)
+            painter.drawText(0, pixmap.height() - strip, pixmap.width(), strip, Qt.AlignCenter, text)
+            painter.end()
+            self.popup.setPixmap(pixmap)
+        self.popup.adjustSize()
+
+        anchor = self.slider.mapToGlobal(QPoint(self.hover_x, 0))
+        self.popup.move(anchor.x() - self.popup.width() // 2, anchor.y() - self.popup.height() - 4)
+        self.popup.show()
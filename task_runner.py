@@ -0,0 +1,98 @@
+"""
+后台任务 - 在线程池中执行数据库查询，结果通过信号回到界面线程
+每个任务使用自己的数据库连接（SQLite连接不能跨线程使用），
+取消任务时中断正在执行的SQL，已取消任务的结果不会发送。
+"""
+
+import sqlite3
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class CancelToken:
+    """取消标记 - 界面线程调用cancel()，任务线程检查is_cancelled()，也可通过report_progress()报告进度"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.on_progress = None
+
+    def attach(self, conn):
+        """登记任务正在使用的连接，取消时中断其上的查询"""
+        with self._lock:
+            self._conn = conn
+        if self.is_cancelled():
+            conn.interrupt()
+
+    def detach(self):
+        with self._lock:
+            self._conn = None
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def report_progress(self, done, total):
+        if self.on_progress is not None:
+            self.on_progress(done, total)
+
+
+class WorkerSignals(QObject):
+    """后台任务的信号（QRunnable不是QObject，不能直接定义信号）"""
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+
+
+class BackgroundTask(QRunnable):
+    """数据库查询任务 - 打开db_path的新连接并调用func(conn, token)"""
+
+    def __init__(self, db_path, func):
+        super().__init__()
+        self.db_path = db_path
+        self.func = func
+        self.token = CancelToken()
+        self.signals = WorkerSignals()
+        self.token.on_progress = self.signals.progress.emit
+
+    def cancel(self):
+        self.token.cancel()
+
+    def run(self):
+        if self.token.is_cancelled():
+            return  # 排队期间已被取消
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            self.token.attach(conn)
+            result = self.func(conn, self.token)
+            if not self.token.is_cancelled():
+                self.signals.finished.emit(result)
+        except Exception as e:
+            # 取消时被中断的查询会抛出异常，这里直接丢弃
+            if not self.token.is_cancelled():
+                self.signals.failed.emit(str(e))
+        finally:
+            self.token.detach()
+            if conn:
+                conn.close()
+
+
+def start_task(db_path, func, on_finished, on_failed=None, on_progress=None):
+    """在全局线程池中启动任务，返回任务对象用于取消"""
+    task = BackgroundTask(db_path, func)
+    task.signals.finished.connect(on_finished)
+    if on_failed is not None:
+        task.signals.failed.connect(on_failed)
+    if on_progress is not None:
+        task.signals.progress.connect(on_progress)
+    QThreadPool.globalInstance().start(task)
+    return task
@@ -0,0 +1,95 @@
+"""数据库结构工具: 时间戳解析、视频表的时长列和旧数据库迁移"""
+
+import sqlite3
+
+import pytest
+
+import db_schema
+from db_schema import (format_timestamp_us, migrate_database, needs_migration, parse_timestamp_us,
+                       parse_timestamps_us, video_duration_sql)
+
+TS = 1713276964000000  # 2024-04-16 14:16:04
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1713276964", TS),
+    ("1713276964.25", TS + 250000),
+    ("1713276964123", TS + 123000),
+    ("1713276964123456", TS + 123456),
+    ("2024-04-16 14:16:04", TS),
+    ("2024/04/16 14:16:04", TS),
+    ("2024-04-16T14:16:04.5", TS + 500000),
+    ("", None),
+    ("abc", None),
+    ("9999-01-01 00:00:00", None),
+])
+def test_parse_timestamp(text, expected):
+    assert parse_timestamp_us(text) == expected
+    assert parse_timestamps_us([text]) == [expected]
+
+
+def test_parse_timestamps_mixed_formats():
+    texts = ["2024-04-16 14:16:04", "1713276964", "2024/04/16 14:16:04", "bad", "1713276964123"]
+    assert parse_timestamps_us(texts) == [TS, TS, TS, None, TS + 123000]
+
+
+def test_parse_timestamps_matches_scalar():
+    texts = [format_timestamp_us(TS + i * 1234567) for i in range(100)]
+    assert parse_timestamps_us(texts) == [parse_timestamp_us(text) for text in texts]
+
+
+def test_parse_timestamps_empty():
+    assert parse_timestamps_us([]) == []
+
+
+@pytest.mark.parametrize("columns, expected", [
+    ("file_path TEXT, start_time TEXT, end_time TEXT", None),  # 回放模块的视频表
+    ("file_path TEXT, duration INTEGER", 12000),  # 导入模块的视频表
+])
+def test_video_duration_sql(columns, expected):
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE video_data (id INTEGER PRIMARY KEY, experiment_id INTEGER, {columns})")
+    migrate_database(conn)
+    if expected is not None:
+        conn.execute("INSERT INTO video_data (experiment_id, file_path, duration) VALUES (1, 'a.mp4', 12)")
+    else:
+        conn.execute("INSERT INTO video_data (experiment_id, file_path) VALUES (1, 'a.mp4')")
+    row = conn.execute(f"SELECT {video_duration_sql(conn)} FROM video_data WHERE experiment_id = 1").fetchone()
+    assert row == (expected,)
+
+
+def make_legacy_logs(rows):
+    """没有ts列和索引的旧日志表"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY, experiment_id INTEGER, timestamp TEXT, "
+                 "log_level TEXT, message TEXT)")
+    conn.executemany("INSERT INTO logs (experiment_id, timestamp, message) VALUES (1, ?, 'm')",
+                     [(text,) for text in rows])
+    return conn
+
+
+def test_migration_backfills_in_batches_and_resumes(monkeypatch):
+    monkeypatch.setattr(db_schema, "BACKFILL_BATCH_ROWS", 7)
+    texts = [format_timestamp_us(TS + i * 1000000) for i in range(40)] + [None, "abc", "1713276964"]
+    conn = make_legacy_logs(texts)
+    assert needs_migration(conn)
+
+    # 第3批之后取消，已提交的批次保留
+    reports = []
+    assert not migrate_database(conn, progress=lambda done, total: reports.append((done, total)),
+                                should_cancel=lambda: len(reports) >= 3)
+    assert reports == [(7, 43), (14, 43), (21, 43)]
+    assert needs_migration(conn)
+    assert conn.execute("SELECT COUNT(ts) FROM logs").fetchone()[0] == 21
+
+    assert migrate_database(conn)
+    assert not needs_migration(conn)
+    expected = [TS + i * 1000000 for i in range(40)] + [None, None, TS]
+    assert [row[0] for row in conn.execute("SELECT ts FROM logs ORDER BY id")] == expected
+
+
+def test_migrated_database_needs_no_migration():
+    conn = make_legacy_logs([])
+    assert needs_migration(conn)
+    assert migrate_database(conn)
+    assert not needs_migration(conn)
@@ -0,0 +1,41 @@
+"""试验数据缓存 - LRU淘汰、内存预算配置和命中统计"""
+
+import numpy as np
+import pytest
+
+from experiment_cache import CACHE_BUDGET_ENV, DEFAULT_CACHE_BYTES, ExperimentCache, configured_budget, format_stats
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, DEFAULT_CACHE_BYTES),
+    ("", DEFAULT_CACHE_BYTES),
+    ("64", 64 << 20),
+    ("0.5", 512 << 10),
+    ("0", 0),
+    ("-1", DEFAULT_CACHE_BYTES),
+    ("abc", DEFAULT_CACHE_BYTES),
+])
+def test_configured_budget(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv(CACHE_BUDGET_ENV, raising=False)
+    else:
+        monkeypatch.setenv(CACHE_BUDGET_ENV, value)
+    assert configured_budget() == expected
+
+
+def test_lru_eviction_and_stats():
+    cache = ExperimentCache(max_bytes=3000)
+    for key in "abc":
+        cache.put(key, np.zeros(1000, np.uint8))
+    assert cache.get("a") is not None  # a变为最近使用
+    cache.put("d", np.zeros(1000, np.uint8))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("d") is not None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (3, 1, 1, 3)
+    assert stats["bytes"] == 3000
+    assert format_stats(stats) == "命中 3/4 (75%)，3 项，0.0/0 MB，淘汰 1 次"
+
+    cache.set_budget(1500)
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,125 @@
+"""逐帧解码 - 环形缓冲、关键帧定位和画面缩小"""
+
+import types
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt5.QtMultimedia", exc_type=ImportError)  # playback_controls通过video_timeline引用QMediaPlayer
+
+import playback_controls  # noqa: E402
+from playback_controls import FrameStepper, FrameTiming  # noqa: E402
+
+FPS = 100
+GOP = 50  # 关键帧间隔
+FRAME_COUNT = 1000
+
+
+class FakeFrame:
+    def __init__(self, index, width=64, height=32):
+        self.index = index
+        self.time = index / FPS
+        self.width = width
+        self.height = height
+
+    def reformat(self, width, height):
+        return FakeFrame(self.index, width, height)
+
+    def to_ndarray(self, format):
+        # 第一个像素的红色分量记录帧序号，用于核对取出的画面
+        array = np.zeros((self.height, self.width, 3), np.uint8)
+        array[0, 0, 0] = self.index % 256
+        return array
+
+
+class FakeContainer:
+    def __init__(self, stats, width):
+        stream = types.SimpleNamespace(time_base=Fraction(1, 90000), start_time=0, thread_type=None)
+        self.streams = types.SimpleNamespace(video=[stream])
+        self.stats = stats
+        self.width = width
+        self.position = 0
+
+    def seek(self, offset, stream, backward, any_frame):
+        self.stats["seeks"] += 1
+        index = int(round(float(offset * stream.time_base) * FPS))
+        self.position = index // GOP * GOP
+
+    def decode(self, stream):
+        for index in range(self.position, FRAME_COUNT):
+            self.stats["decoded"] += 1
+            yield FakeFrame(index, self.width)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = {"seeks": 0, "decoded": 0, "width": 64}
+    fake_av = types.SimpleNamespace(open=lambda path: FakeContainer(stats, stats["width"]))
+    monkeypatch.setattr(playback_controls, "av", fake_av)
+    return stats
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "highspeed.mp4"
+    path.write_bytes(b"")
+    return str(path)
+
+
+def frame_number(image):
+    """画面记录的帧序号（只保留了低8位）"""
+    return image.pixelColor(0, 0).red()
+
+
+def test_step_forward_decodes_sequentially(stats, video):
+    stepper = FrameStepper(video, FrameTiming(FPS), buffer_size=8)
+    for index in range(120, 140):
+        assert frame_number(stepper.frame(index)) == index % 256
+    assert stats["seeks"] == 1
+    assert stats["decoded"] == 140 - 100  # 从第100帧的关键帧开始
+    assert len(stepper.buffer) == 8
+    assert list(stepper.buffer) == list(range(132, 140))
+
+
+def test_step_backward_uses_buffer(stats, video):
+    stepper = FrameStepper(video, FrameTiming(FPS), buffer_size=8)
+    stepper.frame(300)
+    seeks, decoded = stats["seeks"], stats["decoded"]
+    for index in range(299, 292, -1):
+        assert frame_number(stepper.frame(index)) == index % 256
+    assert (stats["seeks"], stats["decoded"]) == (seeks, decoded)
+
+    # 超出缓冲后重新定位，一次填满缓冲，之后的后退又直接从缓冲取
+    assert frame_number(stepper.frame(292)) == 292 % 256
+    assert stats["seeks"] == seeks + 1
+    decoded = stats["decoded"]
+    for index in range(291, 285, -1):
+        assert frame_number(stepper.frame(index)) == index % 256
+    assert stats["decoded"] == decoded
+
+
+def test_far_jump_seeks(stats, video):
+    stepper = FrameStepper(video, FrameTiming(FPS), buffer_size=8)
+    stepper.frame(10)
+    stepper.frame(900)
+    assert stats["seeks"] == 2
+    assert stats["decoded"] < 2 * GOP + 20
+
+
+def test_end_of_video_and_missing_file(stats, video, tmp_path):
+    stepper = FrameStepper(video, FrameTiming(FPS), buffer_size=8)
+    assert stepper.frame(FRAME_COUNT + 5) is None
+    assert frame_number(stepper.frame(FRAME_COUNT - 1)) == (FRAME_COUNT - 1) % 256
+    assert FrameStepper(str(tmp_path / "missing.mp4"), FrameTiming(FPS)).frame(0) is None
+
+
+def test_wide_frames_are_scaled(stats, video):
+    stats["width"] = 1920
+    stepper = FrameStepper(video, FrameTiming(FPS), buffer_size=4, max_width=640)
+    image = stepper.frame(5)
+    assert image.width() == 640
+    assert image.height() % 2 == 0
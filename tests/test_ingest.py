@@ -0,0 +1,168 @@
+"""导入清单: 未变化的文件跳过，变化的文件替换旧数据，中断后从下一个文件继续；视频探测出错或取消"""
+
+import os
+import sqlite3
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+import ingest
+import keyframe_index
+from ingest import ImportManifest
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "import.db"))
+    ingest.create_tables(conn)
+    ingest.save_experiment(conn, "E1", "test", None, None, None)
+    yield conn
+    conn.close()
+
+
+def write_csv(path, rows, mtime=None):
+    with open(path, "w") as f:
+        f.write("timestamp,sensor_type,value\n")
+        for i in range(rows):
+            f.write(f"2024-04-16 14:16:{i % 60:02d},temp,{i}\n")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+    return str(path)
+
+
+def import_csv(conn, files):
+    manifest = ImportManifest(conn, "E1")
+    pending = manifest.pending_files(conn, files)
+    ingest.import_csv_files(conn, "E1", pending, workers=1, manifest=manifest)
+    return pending, manifest
+
+
+def row_count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_unchanged_files_are_skipped(conn, tmp_path):
+    files = [write_csv(tmp_path / "a.csv", 10), write_csv(tmp_path / "b.csv", 20)]
+    pending, _ = import_csv(conn, files)
+    assert pending == files
+    assert row_count(conn, "sensor_data") == 30
+
+    pending, manifest = import_csv(conn, files)
+    assert pending == []
+    assert manifest.skipped_files == 2
+    assert row_count(conn, "sensor_data") == 30
+
+
+def test_changed_file_replaces_its_rows(conn, tmp_path):
+    files = [write_csv(tmp_path / "a.csv", 10), write_csv(tmp_path / "b.csv", 20)]
+    import_csv(conn, files)
+
+    write_csv(tmp_path / "b.csv", 5, mtime=os.stat(files[1]).st_mtime_ns + 10 ** 9)
+    pending, manifest = import_csv(conn, files)
+    assert pending == [files[1]]
+    assert manifest.skipped_files == 1
+    assert conn.execute("SELECT COUNT(*) FROM sensor_data WHERE file_source = ?",
+                        (files[1],)).fetchone()[0] == 5
+    assert row_count(conn, "sensor_data") == 15
+
+
+def test_touched_file_with_same_hash_is_skipped(conn, tmp_path):
+    path = write_csv(tmp_path / "a.csv", 10)
+    manifest = ImportManifest(conn, "E1", use_hash=True)
+    ingest.import_csv_files(conn, "E1", manifest.pending_files(conn, [path]), workers=1, manifest=manifest)
+
+    os.utime(path, ns=(os.stat(path).st_mtime_ns + 10 ** 9,) * 2)
+    manifest = ImportManifest(conn, "E1", use_hash=True)
+    assert manifest.pending_files(conn, [path]) == []
+    assert manifest.skipped_files == 1
+
+
+def test_interrupted_video_import_resumes(conn, tmp_path, monkeypatch):
+    videos = []
+    for name in ("seg1.mp4", "seg2.mp4", "seg3.mp4"):
+        path = tmp_path / name
+        path.write_bytes(b"\0" * 1000)
+        videos.append(str(path))
+    monkeypatch.setattr(ingest, "probe_video_file", lambda file_path, should_cancel=None: (None, None))
+
+    # 第二个文件写入时中断
+    calls = []
+    store_keyframes = ingest.store_keyframes
+
+    def failing_store(conn, video_id, keyframes):
+        calls.append(video_id)
+        if len(calls) == 2:
+            raise RuntimeError("interrupted")
+        store_keyframes(conn, video_id, keyframes)
+
+    monkeypatch.setattr(ingest, "store_keyframes", failing_store)
+    manifest = ImportManifest(conn, "E1")
+    with pytest.raises(RuntimeError):
+        ingest.import_video_files(conn, "E1", manifest.pending_files(conn, videos), "NVR", 100,
+                                  manifest=manifest)
+    assert row_count(conn, "video_data") == 1
+    assert row_count(conn, "import_manifest") == 1
+
+    # 重新导入时只处理未提交的文件
+    monkeypatch.setattr(ingest, "store_keyframes", store_keyframes)
+    manifest = ImportManifest(conn, "E1")
+    pending = manifest.pending_files(conn, videos)
+    assert pending == videos[1:]
+    assert ingest.import_video_files(conn, "E1", pending, "NVR", 100, manifest=manifest).files == 2
+    assert [row[0] for row in conn.execute("SELECT file_path FROM video_data ORDER BY id")] == videos
+
+
+def test_vanished_video_is_skipped(conn, tmp_path, monkeypatch):
+    videos = [str(tmp_path / name) for name in ("seg1.mp4", "seg2.mp4", "seg3.mp4")]
+    for path in videos:
+        with open(path, "wb") as f:
+            f.write(b"\0" * 1000)
+    monkeypatch.setattr(ingest, "probe_video_file", lambda file_path, should_cancel=None: (None, None))
+
+    manifest = ImportManifest(conn, "E1")
+    pending = manifest.pending_files(conn, videos)
+    os.remove(videos[1])  # 扫描之后被NVR循环覆盖删除
+    stats = ingest.import_video_files(conn, "E1", pending, "NVR", 100, manifest=manifest)
+    assert (stats.files, stats.failed_files) == (2, 1)
+    assert row_count(conn, "import_manifest") == 2
+
+
+def test_failed_probe_is_skipped(conn, tmp_path, monkeypatch):
+    videos = [str(tmp_path / name) for name in ("seg1.mp4", "seg2.mp4", "seg3.mp4")]
+    for path in videos:
+        with open(path, "wb") as f:
+            f.write(b"\0" * 1000)
+
+    def probe(file_path, should_cancel=None):
+        if file_path == videos[1]:
+            raise RuntimeError("探测出错")
+        return None, None
+
+    monkeypatch.setattr(ingest, "probe_video_file", probe)
+    manifest = ImportManifest(conn, "E1")
+    pending = manifest.pending_files(conn, videos)
+    stats = ingest.import_video_files(conn, "E1", pending, "NVR", 100, manifest=manifest)
+    assert (stats.files, stats.failed_files) == (2, 1)
+    assert [row[0] for row in conn.execute("SELECT file_path FROM video_data ORDER BY id")] == \
+        [videos[0], videos[2]]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="用脚本代替ffprobe")
+def test_cancel_stops_keyframe_probe(tmp_path, monkeypatch):
+    # 输出一行后长时间不退出的ffprobe
+    script = tmp_path / "ffprobe"
+    script.write_text(f"#!{sys.executable}\n"
+                      "import sys, time\n"
+                      "print('pts_time=0.0|pos=48|flags=K__', flush=True)\n"
+                      "time.sleep(60)\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(keyframe_index, "find_tool", lambda name: str(script))
+
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    started = time.monotonic()
+    assert keyframe_index.extract_keyframes(str(tmp_path / "long.mp4"), cancel.is_set) is None
+    assert time.monotonic() - started < 10
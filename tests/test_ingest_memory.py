@@ -0,0 +1,75 @@
+"""流式导入的内存上限: 峰值RSS有固定上限，不随文件大小增长
+
+默认分别导入约24MB和96MB的文件，并把SQLite页缓存和块大小调小以缩短用时；
+设置环境变量INGEST_MEMORY_TEST_BYTES可按需导入更大的文件（如5GB）。
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+resource = pytest.importorskip("resource")
+
+FILE_BYTES = int(os.environ.get("INGEST_MEMORY_TEST_BYTES", 96 << 20))
+
+# 导入过程中RSS相对导入前的增量上限（页缓存16MB，加上解析中的块和Python对象）
+RSS_BUDGET_BYTES = 128 << 20
+
+# 文件大小增加到4倍时允许的峰值RSS增长
+RSS_GROWTH_SLACK = 16 << 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中导入，测得的峰值RSS不受测试进程本身影响
+IMPORT_SCRIPT = '''
+import resource, sqlite3, sys
+sys.path.insert(0, sys.argv[1])
+import ingest
+
+ingest.CHUNK_BYTES = 1 << 20
+ingest.IMPORT_PRAGMAS = dict(ingest.IMPORT_PRAGMAS, cache_size=-16384)
+
+conn = sqlite3.connect(sys.argv[3])
+ingest.create_tables(conn)
+ingest.save_experiment(conn, "E1", "memory", None, None, None)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+stats = ingest.import_csv_files(conn, "E1", [sys.argv[2]], workers=1)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(stats.rows, before, after)
+'''
+
+
+def write_sensor_file(path, size):
+    line = b"2024-04-16 14:16:04.123456,temperature,12.5\n"
+    block = line * 4096
+    blocks = max(size // len(block), 1)
+    with open(path, "wb") as f:
+        f.write(b"timestamp,sensor_type,value\n")
+        for _ in range(blocks):
+            f.write(block)
+    return blocks * 4096
+
+
+def import_peak_rss(tmp_path, size):
+    """导入指定大小的文件，返回 (导入的行数, 期望的行数, 峰值RSS增量字节数)"""
+    csv_path = tmp_path / f"sensor-{size}.csv"
+    expected_rows = write_sensor_file(csv_path, size)
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT, ROOT, str(csv_path), str(tmp_path / f"import-{size}.db")],
+        capture_output=True, text=True, check=True)
+    csv_path.unlink()
+    rows, before, after = map(int, result.stdout.split()[-3:])
+    # ru_maxrss在Linux上单位为KiB，在macOS上为字节
+    unit = 1 if sys.platform == "darwin" else 1024
+    return rows, expected_rows, (after - before) * unit
+
+
+def test_csv_import_peak_rss_is_bounded(tmp_path):
+    small_rows, small_expected, small_rss = import_peak_rss(tmp_path, FILE_BYTES // 4)
+    rows, expected, rss = import_peak_rss(tmp_path, FILE_BYTES)
+
+    assert (small_rows, rows) == (small_expected, expected)
+    assert rss < RSS_BUDGET_BYTES
+    assert rss < small_rss + RSS_GROWTH_SLACK
@@ -0,0 +1,92 @@
+"""日志表格模型 - 键集分页与按时刻定位"""
+
+import sqlite3
+
+import pytest
+
+from db_schema import IMPORT_SCHEMA
+from log_model import LogTableModel, fetch_log_page, fetch_log_page_before
+
+
+@pytest.fixture
+def conn():
+    """3条ts为NULL的日志，之后每个时刻两条（同一时刻按id排序），另一个试验的日志穿插其中"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE log_data (id INTEGER PRIMARY KEY, experiment_id TEXT, timestamp TEXT, "
+                 "ts INTEGER, level TEXT, message TEXT, file_source TEXT)")
+    rows = [("e1", None) for _ in range(3)]
+    for ts in range(50):
+        rows += [("e1", ts * 1000), ("e2", ts * 1000), ("e1", ts * 1000)]
+    conn.executemany("INSERT INTO log_data (experiment_id, ts, message) VALUES (?, ?, 'm')", rows)
+    return conn
+
+
+def all_ids(conn):
+    return [row[0] for row in conn.execute(
+        "SELECT id FROM log_data WHERE experiment_id = 'e1' ORDER BY ts IS NOT NULL, ts, id")]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 7, 500])
+def test_pages_cover_all_rows_in_order(conn, limit):
+    ids, after = [], None
+    while True:
+        rows = fetch_log_page(conn, IMPORT_SCHEMA, "e1", after, limit)
+        ids += [row[0] for row in rows]
+        if len(rows) < limit:
+            break
+        after = (rows[-1][1], rows[-1][0])
+    assert ids == all_ids(conn)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 7, 500])
+def test_pages_before_cover_all_rows_in_order(conn, limit):
+    last = conn.execute("SELECT ts, id FROM log_data WHERE experiment_id = 'e1' "
+                        "ORDER BY ts DESC, id DESC LIMIT 1").fetchone()
+    ids, before = [last[1]], last
+    while True:
+        rows = fetch_log_page_before(conn, IMPORT_SCHEMA, "e1", before, limit)
+        ids[0:0] = [row[0] for row in rows]
+        if len(rows) < limit:
+            break
+        before = (rows[0][1], rows[0][0])
+    assert ids == all_ids(conn)
+
+
+def test_model_fetches_pages_on_demand(conn):
+    model = LogTableModel()
+    model.page_size = 10
+    model.reset(conn, IMPORT_SCHEMA, "e1")
+    assert model.rowCount() == 10
+    while model.canFetchMore():
+        model.fetchMore()
+    assert [model.row_key(row)[1] for row in range(model.rowCount())] == all_ids(conn)
+
+
+def test_row_for_ts_anchors_far_targets(conn):
+    model = LogTableModel()
+    model.page_size = 10
+    model.reset(conn, IMPORT_SCHEMA, "e1")
+    row = model.row_for_ts(40000)
+    assert model.row_key(row)[0] == 40000
+    # 目标远在已加载范围之外，从目标附近重新分页，前面的日志可以继续向前读取
+    assert model.rowCount() < 30
+    assert model.can_fetch_before()
+
+    model.set_current_row(row)
+    key = model.row_key(row)
+    inserted = model.fetch_before()
+    assert inserted > 0
+    assert model.current_row == row + inserted
+    assert model.row_key(model.current_row) == key
+
+
+def test_row_for_ts_nearest(conn):
+    model = LogTableModel()
+    model.reset(conn, IMPORT_SCHEMA, "e1")
+    assert model.row_key(model.row_for_ts(-5))[0] == 0  # ts为NULL的行不参与就近匹配
+    assert model.row_key(model.row_for_ts(10400))[0] == 10000
+    assert model.row_key(model.row_for_ts(10600))[0] == 11000
+    assert model.row_key(model.row_for_ts(10 ** 9))[0] == 49000
+
+    model.clear()
+    assert model.row_for_ts(0) == -1
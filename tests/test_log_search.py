@@ -0,0 +1,53 @@
+"""日志检索 - 全文索引和短检索词的逐行匹配检索相同的列"""
+
+import sqlite3
+
+import pytest
+
+from db_schema import IMPORT_SCHEMA, PLAYBACK_SCHEMA
+from log_search import search_logs, update_log_index
+
+
+def make_logs(schema):
+    conn = sqlite3.connect(":memory:")
+    source = f", {schema['log_source']} TEXT" if schema["log_source"] else ""
+    conn.execute(f"CREATE TABLE {schema['log_table']} (id INTEGER PRIMARY KEY, experiment_id TEXT, "
+                 f"timestamp TEXT, ts INTEGER, {schema['log_level']} TEXT, message TEXT{source})")
+    rows = [
+        (1, "e1", "10:00:01", 1, "INFO", "相机开始录像", "cam.log"),
+        (2, "e1", "10:00:02", 2, "WARN", "视频流中断，正在重连", "cam.log"),
+        (3, "e1", "10:00:03", 3, "错误", "压力超限", "plc.log"),
+        (4, "e2", "10:00:04", 4, "WARN", "视频流中断", "cam.log"),
+    ]
+    columns = ["id", "experiment_id", "timestamp", "ts", schema["log_level"], "message"]
+    if schema["log_source"]:
+        columns.append(schema["log_source"])
+    else:
+        rows = [row[:-1] for row in rows]
+    conn.executemany(f"INSERT INTO {schema['log_table']} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join('?' for _ in columns)})", rows)
+    update_log_index(conn, schema)
+    return conn
+
+
+def ids(hits):
+    return sorted(hit[0] for hit in hits)
+
+
+@pytest.mark.parametrize("schema", [IMPORT_SCHEMA, PLAYBACK_SCHEMA])
+@pytest.mark.parametrize("text, expected", [
+    ("中断", [2]),            # 短词在消息中
+    ("错误", [3]),            # 短词只在级别中
+    ("视频流中断", [2]),      # 全文索引
+    ("WARN 中断", [2]),       # 长词和短词混合，每个词都要匹配
+    ("中断 压力", []),
+])
+def test_search_columns(schema, text, expected):
+    conn = make_logs(schema)
+    assert ids(search_logs(conn, schema, "e1", text)) == expected
+
+
+@pytest.mark.parametrize("text", ["plc", "pl"])
+def test_search_source_column(text):
+    conn = make_logs(IMPORT_SCHEMA)
+    assert ids(search_logs(conn, IMPORT_SCHEMA, "e1", text)) == [3]
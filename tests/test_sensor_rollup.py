@@ -0,0 +1,89 @@
+"""传感器数据概览 - 粒度选择和逐级汇总"""
+
+import sqlite3
+
+import pytest
+
+from db_schema import IMPORT_SCHEMA
+from sensor_rollup import RAW_LEVEL, build_rollups, choose_level, drop_rollups, has_rollups, query_series
+
+SECOND = 1000000
+
+
+@pytest.mark.parametrize("seconds, pixels, expected", [
+    (100, 1000, RAW_LEVEL),     # 每像素0.1秒，读取原始数据
+    (999, 1000, RAW_LEVEL),
+    (1000, 1000, 1),            # 每像素正好1秒
+    (5000, 1000, 1),
+    (10000, 1000, 10),
+    (59999, 1000, 10),
+    (60000, 1000, 60),
+    (600000, 1000, 600),
+    (86400 * 30, 1000, 600),    # 比最粗的粒度还粗时取最粗的
+    (0, 1000, RAW_LEVEL),
+    (1000, 0, 600),             # 宽度为0按1像素计算
+])
+def test_choose_level(seconds, pixels, expected):
+    assert choose_level(5 * SECOND, 5 * SECOND + seconds * SECOND, pixels) == expected
+
+
+def make_sensor_data(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE sensor_data (id INTEGER PRIMARY KEY, experiment_id TEXT, "
+                 "sensor_type TEXT, ts INTEGER, value REAL)")
+    conn.executemany("INSERT INTO sensor_data (experiment_id, sensor_type, ts, value) VALUES (?, ?, ?, ?)",
+                     rows)
+    return conn
+
+
+def test_rollup_levels_agree_with_raw_data():
+    # 两分钟内每0.5秒一个点，另一个实验的数据不参与汇总
+    rows = [("e1", "p", i * SECOND // 2, float(i % 7)) for i in range(240)]
+    rows += [("e1", "p", None, 100.0), ("e1", "p", 3 * SECOND, None), ("e2", "p", 0, 1000.0)]
+    conn = make_sensor_data(rows)
+    build_rollups(conn, IMPORT_SCHEMA, "e1")
+
+    raw = [float(i % 7) for i in range(240)]
+    for level in (1, 10, 60):
+        timestamps, minimum, maximum, mean = query_series(
+            conn, IMPORT_SCHEMA, "e1", ["p"], 0, 120 * SECOND - 1, level)["p"]
+        points = level * 2
+        assert len(timestamps) == 120 // level
+        assert timestamps[1] - timestamps[0] == level * SECOND
+        for bucket in range(len(timestamps)):
+            values = raw[bucket * points:(bucket + 1) * points]
+            assert minimum[bucket] == min(values)
+            assert maximum[bucket] == max(values)
+            assert mean[bucket] == pytest.approx(sum(values) / len(values))
+
+
+def test_drop_rollups():
+    conn = make_sensor_data([("e1", "p", 0, 1.0), ("e2", "p", 0, 2.0)])
+    drop_rollups(conn, IMPORT_SCHEMA, "e1")  # 汇总表还不存在
+    build_rollups(conn, IMPORT_SCHEMA, "e1")
+    build_rollups(conn, IMPORT_SCHEMA, "e2")
+    drop_rollups(conn, IMPORT_SCHEMA, "e1")
+    assert not has_rollups(conn, IMPORT_SCHEMA, "e1")
+    assert has_rollups(conn, IMPORT_SCHEMA, "e2")
+
+
+@pytest.mark.parametrize("pixels", [1, 7, 100, 999])
+def test_raw_reads_are_bounded_by_pixels(pixels):
+    # 10秒内1kHz的数据，比像素密得多
+    rows = [("e1", "p", i * 1000, float(i % 13)) for i in range(10000)]
+    conn = make_sensor_data(rows)
+    timestamps, minimum, maximum, mean = query_series(
+        conn, IMPORT_SCHEMA, "e1", ["p"], 0, 10 * SECOND - 1, RAW_LEVEL, pixels)["p"]
+    assert 0 < len(timestamps) <= pixels
+    assert list(timestamps) == sorted(timestamps)
+    assert minimum.min() == 0 and maximum.max() == 12
+    assert (minimum <= mean).all() and (mean <= maximum).all()
+
+
+def test_sparse_raw_reads_keep_every_point():
+    rows = [("e1", "p", i * SECOND, float(i)) for i in range(10)] + [("e1", "p", 11 * SECOND, None)]
+    conn = make_sensor_data(rows)
+    timestamps, minimum, maximum, mean = query_series(
+        conn, IMPORT_SCHEMA, "e1", ["p"], 0, 20 * SECOND, RAW_LEVEL, 1000)["p"]
+    assert list(timestamps) == [i * SECOND for i in range(10)]
+    assert list(mean) == list(minimum) == list(maximum) == [float(i) for i in range(10)]
@@ -0,0 +1,48 @@
+"""代理视频生成 - 取消时结束正在运行的转码"""
+
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+import media_cache
+import video_proxy
+
+
+@pytest.fixture
+def slow_ffmpeg(tmp_path, monkeypatch):
+    """写出输出文件后长时间不退出的ffmpeg"""
+    script = tmp_path / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\n"
+                      "import sys, time\n"
+                      "open(sys.argv[-1], 'w').close()\n"
+                      "time.sleep(60)\n")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("MEDIA_CACHE_DIR", str(tmp_path / "cache"))
+    return str(script)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="用脚本代替ffmpeg")
+def test_cancel_kills_running_transcode(tmp_path, slow_ffmpeg, monkeypatch):
+    monkeypatch.setattr(video_proxy, "find_tool", lambda name: slow_ffmpeg)
+    sources = []
+    for i in range(2):
+        source = tmp_path / f"cam{i}.mp4"
+        source.write_bytes(b"video")
+        sources.append(str(source))
+
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    started = time.monotonic()
+    created = video_proxy.build_proxies(sources, should_cancel=cancel.is_set, workers=2)
+
+    assert created == 0
+    assert time.monotonic() - started < 10
+    # 未完成的代理视频已删除
+    for source in sources:
+        path = media_cache.cache_path(source, video_proxy.PROXY_KIND, video_proxy.PROXY_PARAMS, ".mp4")
+        assert not os.path.exists(path)
+        assert not os.path.exists(path + media_cache.PARTIAL_SUFFIX)
@@ -0,0 +1,222 @@
+"""
+视频信息提取 - 读取视频容器的真实元数据
+优先调用ffprobe，未安装时尝试PyAV，两者都不可用时返回None，由调用方估算。
+录像的起止时刻优先取自文件名（NVR和高速摄像机导出的文件名中带有录像时间），
+其次取自容器的creation_time。
+"""
+
+import datetime
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db_schema import datetime_to_us
+
+try:
+    import av  # PyAV，可选依赖
+except ImportError:
+    av = None
+
+# 单个文件探测的超时时间（秒）
+PROBE_TIMEOUT = 60
+
+# 可取消的外部工具检查是否取消的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+# Windows下启动外部程序时不弹出控制台窗口
+_CREATION_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+# 文件名中的时间，如 ch01_20250416141604_20250416151604.mp4、
+# cam1_2025-04-16_14-16-04.mp4、IMG_20250416_141604_123.avi
+FILENAME_TIME_PATTERN = re.compile(
+    r'(?<!\d)(\d{4})[-_]?(\d{2})[-_]?(\d{2})[-_T ]?(\d{2})[-_:.]?(\d{2})[-_:.]?(\d{2})'
+    r'(?:[._](\d{3}))?(?!\d)')
+
+
+def find_tool(name):
+    """查找ffmpeg系列工具，可通过FFMPEG_DIR环境变量指定目录"""
+    ffmpeg_dir = os.environ.get("FFMPEG_DIR")
+    if ffmpeg_dir:
+        path = shutil.which(name, path=ffmpeg_dir)
+        if path:
+            return path
+    return shutil.which(name)
+
+
+def run_tool(args, timeout=PROBE_TIMEOUT, should_cancel=None):
+    """运行外部工具并返回标准输出，失败时返回None
+
+    should_cancel() 返回True时结束子进程并返回None，每隔CANCEL_POLL_INTERVAL秒检查一次。
+    """
+    if should_cancel is None:
+        try:
+            result = subprocess.run(args, capture_output=True, timeout=timeout,
+                                    creationflags=_CREATION_FLAGS)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"运行 {os.path.basename(args[0])} 时出错: {str(e)}")
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    try:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   creationflags=_CREATION_FLAGS)
+    except OSError as e:
+        print(f"运行 {os.path.basename(args[0])} 时出错: {str(e)}")
+        return None
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with process:
+        while True:
+            try:
+                stdout, _ = process.communicate(timeout=CANCEL_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if should_cancel():
+                    process.kill()
+                    process.communicate()
+                    return None
+                if deadline is not None and time.monotonic() > deadline:
+                    print(f"运行 {os.path.basename(args[0])} 超时")
+                    process.kill()
+                    process.communicate()
+                    return None
+    if process.returncode != 0:
+        return None
+    return stdout
+
+
+def parse_rate(text):
+    """解析ffprobe的帧率字符串，如 "30000/1001" """
+    try:
+        if '/' in text:
+            num, den = text.split('/', 1)
+            return float(num) / float(den) if float(den) else 0.0
+        return float(text)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_filename_times(file_path):
+    """从文件名中解析录像的起止时刻（微秒），没有结束时刻时为None，都没有时返回(None, None)"""
+    times = []
+    for match in FILENAME_TIME_PATTERN.finditer(os.path.basename(file_path)):
+        year, month, day, hour, minute, second, millisecond = match.groups()
+        try:
+            dt = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                                   int(millisecond or 0) * 1000)
+        except ValueError:
+            continue  # 只是一串数字，不是时间
+        times.append(datetime_to_us(dt))
+    if not times:
+        return None, None
+    end_ts = times[1] if len(times) > 1 and times[1] > times[0] else None
+    return times[0], end_ts
+
+
+def parse_creation_time(text):
+    """解析容器的creation_time为微秒
+
+    creation_time通常是UTC时间（以Z结尾），而传感器和日志记录的是本地墙钟时间，
+    因此换算为本地时间后再去掉时区。
+    """
+    if not text:
+        return None
+    try:
+        dt = datetime.datetime.fromisoformat(str(text).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return datetime_to_us(dt)
+
+
+def recording_times(file_path, info):
+    """确定录像的起止时刻（微秒）: 文件名优先，其次容器元数据，结束时刻缺省时由时长推算"""
+    start_ts, end_ts = parse_filename_times(file_path)
+    if start_ts is None and info is not None:
+        start_ts = info.get("start_ts")
+    duration_ms = info.get("duration_ms") if info is not None else None
+    if end_ts is None and start_ts is not None and duration_ms:
+        end_ts = start_ts + duration_ms * 1000
+    return start_ts, end_ts
+
+
+def _probe_with_ffprobe(ffprobe, file_path, should_cancel=None):
+    output = run_tool([ffprobe, "-v", "error", "-print_format", "json",
+                       "-show_format", "-show_streams", "-select_streams", "v:0", file_path],
+                      should_cancel=should_cancel)
+    if not output:
+        return None
+
+    data = json.loads(output)
+    streams = data.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+    fmt = data.get("format", {})
+
+    duration = float(fmt.get("duration") or stream.get("duration") or 0)
+    fps = parse_rate(stream.get("avg_frame_rate")) or parse_rate(stream.get("r_frame_rate"))
+    frame_count = int(stream.get("nb_frames") or 0) or int(round(duration * fps))
+    creation_time = (fmt.get("tags", {}).get("creation_time")
+                     or stream.get("tags", {}).get("creation_time"))
+
+    return {
+        "duration_ms": int(round(duration * 1000)),
+        "fps": fps,
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "codec": stream.get("codec_name"),
+        "frame_count": frame_count,
+        "start_ts": parse_creation_time(creation_time),
+    }
+
+
+def _probe_with_pyav(file_path):
+    try:
+        with av.open(file_path) as container:
+            if not container.streams.video:
+                return None
+            stream = container.streams.video[0]
+            duration = container.duration / av.time_base if container.duration else 0.0
+            fps = float(stream.average_rate or 0)
+            return {
+                "duration_ms": int(round(duration * 1000)),
+                "fps": fps,
+                "width": stream.codec_context.width,
+                "height": stream.codec_context.height,
+                "codec": stream.codec_context.name,
+                "frame_count": stream.frames or int(round(duration * fps)),
+                "start_ts": parse_creation_time(container.metadata.get("creation_time")),
+            }
+    except Exception as e:
+        print(f"读取视频 {file_path} 信息时出错: {str(e)}")
+        return None
+
+
+def probe_video(file_path, should_cancel=None):
+    """读取视频的时长、帧率、分辨率、编码、帧数和开始时间，失败或取消时返回None"""
+    try:
+        ffprobe = find_tool("ffprobe")
+        if ffprobe:
+            return _probe_with_ffprobe(ffprobe, file_path, should_cancel)
+        if av is not None:
+            return _probe_with_pyav(file_path)
+    except (ValueError, KeyError) as e:
+        print(f"读取视频 {file_path} 信息时出错: {str(e)}")
+    return None
+
+
+def probe_workers():
+    """探测任务的线程数，实际工作在ffprobe子进程中完成，线程只负责等待"""
+    return min(32, (os.cpu_count() or 1) * 2)
+
+
+def create_probe_executor(workers=None):
+    """创建视频探测线程池"""
+    return ThreadPoolExecutor(max_workers=workers or probe_workers())
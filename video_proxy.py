@@ -0,0 +1,117 @@
+"""
+代理视频 - 为原始录像生成低码率、全帧内编码的代理文件
+代理视频每一帧都是关键帧，任意位置都能立即解码，拖动进度条和多路同时播放时
+使用代理视频，暂停或单路放大查看时再切回原始录像。
+代理视频由ffmpeg生成并保存在media_cache中，未安装ffmpeg时不生成，播放时使用原始录像。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import media_cache
+from video_probe import find_tool, run_tool
+
+# 缓存类别
+PROXY_KIND = "proxy"
+
+# 代理视频的高度（像素），原始视频更小时保持原尺寸
+PROXY_HEIGHT = 360
+
+# x264的质量参数，越大码率越低
+PROXY_CRF = 30
+
+# 生成参数写入缓存键，修改后旧的代理视频自动失效
+PROXY_PARAMS = f"h{PROXY_HEIGHT}-crf{PROXY_CRF}-intra"
+
+# 代理视频缓存的磁盘容量（字节）
+PROXY_CACHE_BYTES = media_cache.DEFAULT_CACHE_BYTES
+
+
+def proxy_command(ffmpeg, source, output):
+    """生成代理视频的ffmpeg命令：只保留视频流，缩小尺寸，每帧都是关键帧"""
+    return [
+        ffmpeg, "-nostdin", "-y", "-v", "error",
+        "-i", source,
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", f"scale=-2:'min({PROXY_HEIGHT},ih)'",
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "fastdecode",
+        "-g", "1", "-crf", str(PROXY_CRF), "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart", "-f", "mp4",
+        output,
+    ]
+
+
+def proxy_for(source):
+    """已生成的代理视频路径，没有时返回None"""
+    return media_cache.lookup(source, PROXY_KIND, PROXY_PARAMS, ".mp4")
+
+
+def make_proxy(source, ffmpeg=None, should_cancel=None):
+    """生成单个代理视频，已存在时直接返回，失败或取消时返回None
+
+    should_cancel() 返回True时结束正在运行的ffmpeg，删除未完成的文件。
+    """
+    existing = proxy_for(source)
+    if existing:
+        return existing
+    ffmpeg = ffmpeg or find_tool("ffmpeg")
+    path = media_cache.cache_path(source, PROXY_KIND, PROXY_PARAMS, ".mp4")
+    if ffmpeg is None or path is None:
+        return None
+
+    # 长录像的转码时间与时长成正比，不设超时，取消时结束子进程
+    if run_tool(proxy_command(ffmpeg, source, media_cache.partial_path(path)), timeout=None,
+                should_cancel=should_cancel) is None:
+        if not (should_cancel and should_cancel()):
+            print(f"生成代理视频失败: {source}")
+        media_cache.discard(path)
+        return None
+    try:
+        media_cache.commit(path)
+    except OSError as e:
+        print(f"保存代理视频失败: {str(e)}")
+        media_cache.discard(path)
+        return None
+    return path
+
+
+def proxy_workers():
+    """同时运行的ffmpeg进程数，ffmpeg自身会使用多个线程，因此取CPU数的一半"""
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+def build_proxies(files, progress=None, should_cancel=None, workers=None):
+    """为一批视频生成代理视频，返回成功数量
+
+    线程只负责等待ffmpeg子进程，转码在子进程中并行进行。
+    progress(done, total) 报告进度；should_cancel() 返回True时不再启动新的转码，
+    正在运行的ffmpeg也会被结束，因此取消后很快返回。
+    """
+    files = list(dict.fromkeys(files))
+    if not files:
+        return 0
+    ffmpeg = find_tool("ffmpeg")
+    if ffmpeg is None:
+        print("未找到ffmpeg，跳过代理视频生成")
+        return 0
+
+    created = 0
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers or proxy_workers()) as executor:
+        futures = [executor.submit(_make_unless_cancelled, source, ffmpeg, should_cancel)
+                   for source in files]
+        for future in as_completed(futures):
+            done += 1
+            if future.result():
+                created += 1
+            if progress:
+                progress(done, len(files))
+
+    media_cache.prune(PROXY_KIND, PROXY_CACHE_BYTES)
+    return created
+
+
+def _make_unless_cancelled(source, ffmpeg, should_cancel):
+    if should_cancel and should_cancel():
+        return None
+    return make_proxy(source, ffmpeg, should_cancel)
@@ -0,0 +1,321 @@
+"""
+视频缩略图 - 用ffmpeg截取视频画面作为缩略图，保存在media_cache中
+截图在后台线程池中进行（线程只负责等待ffmpeg子进程），完成后通过信号通知界面，
+已缓存的缩略图直接读取，不再启动ffmpeg。未安装ffmpeg时不生成缩略图。
+胶片条是每隔固定时间截取一帧、按网格拼成的一张图，进度条悬停预览时直接从中裁出对应画面。
+"""
+
+import math
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRect, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+import media_cache
+from video_probe import find_tool, run_tool
+
+# 缓存类别
+THUMBNAIL_KIND = "thumbnail"
+
+# 缩略图宽度（像素），按高分屏显示取界面尺寸的两倍
+THUMBNAIL_WIDTH = 240
+
+# 截取视频开头之后的画面，避开片头的黑屏: 时长的10%，但不超过10秒
+POSTER_RATIO = 0.1
+POSTER_MAX_OFFSET = 10000
+
+# 生成参数写入缓存键，修改后旧的缩略图自动失效
+THUMBNAIL_PARAMS = f"w{THUMBNAIL_WIDTH}-poster"
+
+# 缩略图缓存的磁盘容量（字节）
+THUMBNAIL_CACHE_BYTES = 1 << 30
+
+# 胶片条: 每帧宽度、每行帧数、最多帧数和最小截取间隔（毫秒）
+FILMSTRIP_KIND = "filmstrip"
+FILMSTRIP_TILE_WIDTH = 160
+FILMSTRIP_COLUMNS = 10
+FILMSTRIP_MAX_FRAMES = 300
+FILMSTRIP_MIN_INTERVAL = 1000
+
+# 胶片条缓存的磁盘容量（字节）和内存中保留的胶片条数量
+FILMSTRIP_CACHE_BYTES = 2 << 30
+FILMSTRIP_MEMORY_ITEMS = 16
+
+# 排队等待生成的胶片条上限，悬停到新的分段时丢弃最早排队的请求
+FILMSTRIP_MAX_QUEUED = 4
+
+
+def poster_offset(duration_ms):
+    """截取缩略图的位置（毫秒）"""
+    return int(min(max(duration_ms or 0, 0) * POSTER_RATIO, POSTER_MAX_OFFSET))
+
+
+def frame_command(ffmpeg, source, output, position_ms, width=THUMBNAIL_WIDTH):
+    """截取单帧的ffmpeg命令，-ss放在-i之前按关键帧快速定位"""
+    return [
+        ffmpeg, "-nostdin", "-y", "-v", "error",
+        "-ss", f"{position_ms / 1000:.3f}", "-i", source,
+        "-frames:v", "1", "-an",
+        "-vf", f"scale={width}:-2",
+        "-q:v", "4", "-f", "image2",
+        output,
+    ]
+
+
+def cached_thumbnail(source):
+    """已生成的缩略图路径，没有时返回None"""
+    return media_cache.lookup(source, THUMBNAIL_KIND, THUMBNAIL_PARAMS, ".jpg")
+
+
+def make_thumbnail(source, duration_ms=0, ffmpeg=None):
+    """生成缩略图，已存在时直接返回，失败时返回None"""
+    existing = cached_thumbnail(source)
+    if existing:
+        return existing
+    ffmpeg = ffmpeg or find_tool("ffmpeg")
+    path = media_cache.cache_path(source, THUMBNAIL_KIND, THUMBNAIL_PARAMS, ".jpg")
+    if ffmpeg is None or path is None:
+        return None
+
+    partial = media_cache.partial_path(path)
+    # 截取位置超出时长（时长估算不准）时再从开头截取
+    for position in dict.fromkeys((poster_offset(duration_ms), 0)):
+        if run_tool(frame_command(ffmpeg, source, partial, position)) is not None \
+                and os.path.exists(partial) and os.path.getsize(partial) > 0:
+            break
+    else:
+        media_cache.discard(path)
+        return None
+    try:
+        media_cache.commit(path)
+    except OSError as e:
+        print(f"保存缩略图失败: {str(e)}")
+        media_cache.discard(path)
+        return None
+    return path
+
+
+def filmstrip_layout(duration_ms):
+    """胶片条的截取间隔（毫秒，取整秒）、帧数、列数和行数"""
+    duration_ms = max(int(duration_ms or 0), 1)
+    interval = math.ceil(duration_ms / FILMSTRIP_MAX_FRAMES / 1000) * 1000
+    interval = max(interval, FILMSTRIP_MIN_INTERVAL)
+    count = math.ceil(duration_ms / interval)
+    columns = min(FILMSTRIP_COLUMNS, count)
+    return interval, count, columns, math.ceil(count / columns)
+
+
+def filmstrip_params(duration_ms):
+    interval, count, columns, _ = filmstrip_layout(duration_ms)
+    return f"w{FILMSTRIP_TILE_WIDTH}-c{columns}-i{interval}-n{count}"
+
+
+def filmstrip_command(ffmpeg, source, output, duration_ms):
+    """生成胶片条的ffmpeg命令: 只解码关键帧，按间隔取帧后拼成一张图"""
+    interval, _, columns, rows = filmstrip_layout(duration_ms)
+    return [
+        ffmpeg, "-nostdin", "-y", "-v", "error",
+        "-skip_frame", "nokey", "-i", source,
+        "-an", "-vf", f"fps=1000/{interval},scale={FILMSTRIP_TILE_WIDTH}:-2,tile={columns}x{rows}",
+        "-frames:v", "1", "-q:v", "5", "-f", "image2",
+        output,
+    ]
+
+
+def cached_filmstrip(source, duration_ms):
+    """已生成的胶片条路径，没有时返回None"""
+    return media_cache.lookup(source, FILMSTRIP_KIND, filmstrip_params(duration_ms), ".jpg")
+
+
+def make_filmstrip(source, duration_ms, ffmpeg=None):
+    """生成胶片条，已存在时直接返回，失败时返回None"""
+    existing = cached_filmstrip(source, duration_ms)
+    if existing:
+        return existing
+    ffmpeg = ffmpeg or find_tool("ffmpeg")
+    path = media_cache.cache_path(source, FILMSTRIP_KIND, filmstrip_params(duration_ms), ".jpg")
+    if ffmpeg is None or path is None:
+        return None
+
+    partial = media_cache.partial_path(path)
+    # 整个文件都要读一遍，耗时与时长成正比，不设超时
+    if run_tool(filmstrip_command(ffmpeg, source, partial, duration_ms), timeout=None) is None \
+            or not os.path.exists(partial):
+        media_cache.discard(path)
+        return None
+    try:
+        media_cache.commit(path)
+    except OSError as e:
+        print(f"保存胶片条失败: {str(e)}")
+        media_cache.discard(path)
+        return None
+    return path
+
+
+class Filmstrip:
+    """已加载的胶片条，按位置裁出对应的画面"""
+
+    def __init__(self, image, duration_ms):
+        self.image = image
+        self.interval, self.count, self.columns, rows = filmstrip_layout(duration_ms)
+        self.tile_width = image.width() // self.columns
+        self.tile_height = image.height() // rows
+
+    @classmethod
+    def load(cls, path, duration_ms):
+        image = QImage(path)
+        if image.isNull():
+            return None
+        return cls(image, duration_ms)
+
+    def frame_at(self, position_ms):
+        """位置（毫秒）处的画面"""
+        index = min(max(int(position_ms // self.interval), 0), self.count - 1)
+        row, column = divmod(index, self.columns)
+        rect = QRect(column * self.tile_width, row * self.tile_height, self.tile_width, self.tile_height)
+        return QPixmap.fromImage(self.image.copy(rect))
+
+
+def thumbnail_workers():
+    """同时运行的ffmpeg进程数"""
+    return max(2, os.cpu_count() or 1)
+
+
+class ThumbnailSignals(QObject):
+    """缩略图任务的信号（QRunnable不是QObject，不能直接定义信号）"""
+
+    ready = pyqtSignal(object, str)  # 请求标识, 缩略图路径（生成失败时为空字符串）
+
+
+class ThumbnailTask(QRunnable):
+    """生成单个缩略图的任务，make(source, duration_ms)返回生成的文件路径"""
+
+    def __init__(self, key, make, source, duration_ms, signals):
+        super().__init__()
+        self.setAutoDelete(False)  # 由加载器持有，排队中的任务可以撤回
+        self.key = key
+        self.make = make
+        self.source = source
+        self.duration_ms = duration_ms
+        self.signals = signals
+
+    def run(self):
+        try:
+            path = self.make(self.source, self.duration_ms)
+        except Exception as e:
+            print(f"生成缩略图时出错: {str(e)}")
+            path = None
+        self.signals.ready.emit(self.key, path or "")
+
+
+class ThumbnailLoader(QObject):
+    """缩略图加载器 - 已缓存的立即返回，其余在后台生成，完成后发送ready信号
+
+    ready信号在界面线程中收到；clear()丢弃尚未开始的任务，并忽略之前请求的结果。
+    排队的任务超过max_queued时撤回最早排队、尚未开始的任务。生成失败的不再重试。
+    """
+
+    ready = pyqtSignal(object, str)
+
+    cache_kind = THUMBNAIL_KIND
+    cache_bytes = THUMBNAIL_CACHE_BYTES
+    max_queued = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(thumbnail_workers())
+        self.signals = ThumbnailSignals()
+        self.signals.ready.connect(self._on_ready)
+        self._generation = 0
+        self._pending = OrderedDict()  # 请求标识 -> 尚未完成的后台任务，按提交顺序
+        self._failed = set()  # 生成失败的请求标识
+        self._ffmpeg_checked = False
+        self._has_ffmpeg = False
+
+    def lookup(self, source, duration_ms):
+        return cached_thumbnail(source)
+
+    def make(self, source, duration_ms):
+        return make_thumbnail(source, duration_ms)
+
+    def request(self, key, source, duration_ms=0, priority=0):
+        """请求缩略图，已缓存时直接返回路径，否则返回None并在后台生成"""
+        path = self.lookup(source, duration_ms)
+        if path:
+            return path
+        if not self._ffmpeg_checked:
+            self._has_ffmpeg = find_tool("ffmpeg") is not None
+            self._ffmpeg_checked = True
+        if self._has_ffmpeg and key not in self._pending and key not in self._failed:
+            task = ThumbnailTask((self._generation, key), self.make, source, duration_ms, self.signals)
+            self._pending[key] = task
+            self.pool.start(task, priority)
+            self._limit_queue()
+        return None
+
+    def clear(self):
+        """丢弃排队中的任务，之前请求的结果不再发送"""
+        self.pool.clear()
+        self._generation += 1
+        self._pending = OrderedDict()
+        self._failed = set()
+        media_cache.prune(self.cache_kind, self.cache_bytes)
+
+    def _limit_queue(self):
+        if self.max_queued is None:
+            return
+        for key in list(self._pending):
+            if len(self._pending) <= self.max_queued:
+                break
+            if self.pool.tryTake(self._pending[key]):
+                del self._pending[key]
+
+    def _on_ready(self, tagged_key, path):
+        generation, key = tagged_key
+        if generation == self._generation:
+            self._pending.pop(key, None)
+            if path:
+                self.ready.emit(key, path)
+            else:
+                self._failed.add(key)
+
+
+class FilmstripLoader(ThumbnailLoader):
+    """胶片条加载器 - 在后台生成胶片条，内存中保留最近使用的若干条
+
+    胶片条要读完整个文件，只为悬停到的分段和当前分段附近生成，排队的数量有上限。
+    """
+
+    cache_kind = FILMSTRIP_KIND
+    cache_bytes = FILMSTRIP_CACHE_BYTES
+    max_queued = FILMSTRIP_MAX_QUEUED
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._loaded = OrderedDict()  # 请求标识 -> Filmstrip
+
+    def lookup(self, source, duration_ms):
+        return cached_filmstrip(source, duration_ms)
+
+    def make(self, source, duration_ms):
+        return make_filmstrip(source, duration_ms)
+
+    def filmstrip(self, key, source, duration_ms):
+        """已生成的胶片条，尚未生成时优先在后台生成并返回None"""
+        strip = self._loaded.get(key)
+        if strip is not None:
+            self._loaded.move_to_end(key)
+            return strip
+        path = self.request(key, source, duration_ms, priority=1)
+        strip = Filmstrip.load(path, duration_ms) if path else None
+        if strip is not None:
+            self._loaded[key] = strip
+            if len(self._loaded) > FILMSTRIP_MEMORY_ITEMS:
+                self._loaded.popitem(last=False)
+        return strip
+
+    def clear(self):
+        super().clear()
+        self._loaded.clear()
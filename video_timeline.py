@@ -0,0 +1,313 @@
+"""
+多路视频同步 - 以主时钟为基准校正各路播放器
+各路视频按录像的墙钟时间排在同一条时间轴上，主时钟给出时间轴上的位置，
+每个播放器对应的位置是主时钟减去该文件在时间轴上的偏移，不在文件时间范围内时暂停。
+主时钟按系统单调时钟计时，不跟随任何一路视频。定时比较每个播放器的位置与主时钟，
+偏差较小时微调该路的播放速度逐渐追上，偏差过大时直接跳转到主时钟的位置。
+整体速度低于NATIVE_MIN_RATE（慢动作）时播放器暂停，每次检查时定位到主时钟的位置。
+"""
+
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtMultimedia import QMediaPlayer
+
+# 检查同步的间隔（毫秒）
+SYNC_INTERVAL = 100
+
+# 偏差超过该值（毫秒）时调整播放速度
+RATE_THRESHOLD = 20
+
+# 偏差超过该值（毫秒）时直接跳转
+SEEK_THRESHOLD = 400
+
+# 低于该速度时播放器不能可靠地按该速度播放，改为随主时钟逐帧定位
+NATIVE_MIN_RATE = 0.25
+
+# 播放速度最多调整的比例
+MAX_RATE_ADJUST = 0.05
+
+# 调整速度后希望在多长时间（毫秒）内消除偏差
+CORRECTION_HORIZON = 2000
+
+# 估计该路视频固有快慢时新测量值的权重
+TRIM_SMOOTHING = 0.5
+
+
+# 偏差的平滑系数，播放器报告的位置有几十毫秒的抖动
+DRIFT_SMOOTHING = 0.3
+
+# 开始播放或跳转后等待解码恢复的时间（秒），期间不校正
+SETTLE_TIME = 1.0
+
+
+def build_timeline(spans):
+    """根据各文件的(开始时刻, 结束时刻, 时长毫秒)建立共同时间轴
+
+    返回 (时间轴起点的时刻, 各文件在时间轴上的偏移毫秒列表, 时间轴总长毫秒)。
+    没有记录开始时刻的文件放在时间轴起点；都没有时退化为所有文件从0开始。
+    """
+    starts = [start_ts for start_ts, _, _ in spans if start_ts is not None]
+    origin_ts = min(starts) if starts else None
+    offsets = []
+    length = 0
+    for start_ts, end_ts, duration in spans:
+        offset = (start_ts - origin_ts) // 1000 if start_ts is not None else 0
+        if not duration and start_ts is not None and end_ts is not None:
+            duration = (end_ts - start_ts) // 1000
+        offsets.append(offset)
+        length = max(length, offset + (duration or 0))
+    return origin_ts, offsets, length
+
+
+def clamp_rate(adjust):
+    """把速度调整限制在±MAX_RATE_ADJUST之内"""
+    return max(-MAX_RATE_ADJUST, min(MAX_RATE_ADJUST, adjust))
+
+
+class MasterClock:
+    """主时钟 - 按单调时钟计算的播放位置（毫秒）"""
+
+    def __init__(self):
+        self.rate = 1.0
+        self._base = 0.0  # 上次开始/跳转时的位置
+        self._started = None  # 开始计时的单调时间，暂停时为None
+
+    def position(self):
+        if self._started is None:
+            return self._base
+        return self._base + (time.monotonic() - self._started) * 1000 * self.rate
+
+    def is_running(self):
+        return self._started is not None
+
+    def start(self):
+        if self._started is None:
+            self._started = time.monotonic()
+
+    def pause(self):
+        self._base = self.position()
+        self._started = None
+
+    def seek(self, position):
+        self._base = float(position)
+        if self._started is not None:
+            self._started = time.monotonic()
+
+    def set_rate(self, rate):
+        """改变播放速度，从当前位置开始按新速度计时"""
+        self._base = self.position()
+        if self._started is not None:
+            self._started = time.monotonic()
+        self.rate = rate
+
+
+class _PlayerState:
+    """单个播放器的同步状态"""
+
+    def __init__(self):
+        self.drift = None  # 平滑后的偏差（毫秒），正数表示超前
+        self.rate = 1.0  # 当前设置的播放速度（相对主时钟速度）
+        self.trim = 0.0  # 抵消该路视频固有快慢的速度修正
+        self.correcting = 0  # 正在追赶时为开始追赶时偏差的符号
+        self.steady_since = None  # 按修正速度播放以来的(单调时间, 偏差)
+        self.settle_until = 0.0
+        self.max_error = 0.0  # 本次播放以来的最大偏差
+        self.seeks = 0  # 因偏差过大跳转的次数
+
+
+class PlayerSync(QObject):
+    """多路播放器同步 - 播放、暂停、跳转都通过主时钟进行
+
+    播放器的offset属性为该文件在时间轴上的偏移（毫秒），duration属性为时长（毫秒）；
+    分段录像轨道(TrackPlayer)另有covers()判断轨道内某一位置是否有录像。
+    errors_changed信号发送每个播放器的同步误差列表（毫秒），不在录像范围内的为None。
+    """
+
+    errors_changed = pyqtSignal(list)
+
+    def __init__(self, clock=None, parent=None):
+        super().__init__(parent)
+        self.clock = clock or MasterClock()
+        self.players = []
+        self._states = []
+        self.timer = QTimer(self)
+        self.timer.setInterval(SYNC_INTERVAL)
+        self.timer.timeout.connect(self.check)
+
+    def set_players(self, players):
+        self.players = list(players)
+        self._states = [_PlayerState() for _ in self.players]
+
+    def add_player(self, player):
+        """加入一个播放器，主时钟运行时下次检查会把它定位到主时钟的位置并开始播放"""
+        if player in self.players:
+            return
+        self.players.append(player)
+        self._states.append(_PlayerState())
+        if not self.clock.is_running():
+            local = self.local_position(player)
+            if local is not None:
+                player.setPosition(int(local))
+
+    def remove_player(self, player):
+        """移出一个播放器并暂停（如视频墙中不可见的画面）"""
+        if player not in self.players:
+            return
+        index = self.players.index(player)
+        del self.players[index]
+        del self._states[index]
+        player.pause()
+
+    def local_position(self, player, position=None):
+        """时间轴上的位置对应该文件内的位置（毫秒），不在录像范围内时返回None"""
+        if position is None:
+            position = self.clock.position()
+        local = position - getattr(player, "offset", 0)
+        duration = getattr(player, "duration", 0)
+        if callable(duration):
+            duration = duration()
+        if local < 0 or (duration and local >= duration):
+            return None
+        # 分段录像轨道中分段之间的空白
+        covers = getattr(player, "covers", None)
+        if covers is not None and not covers(local):
+            return None
+        return local
+
+    def is_slow_motion(self):
+        return self.clock.rate < NATIVE_MIN_RATE
+
+    def play(self):
+        master = self.clock.position()
+        for player in self.players:
+            if self.local_position(player, master) is not None and not self.is_slow_motion():
+                player.play()
+        self.clock.start()
+        for state in self._states:
+            self._hold(state)
+        self.timer.start()
+
+    def pause(self):
+        for player in self.players:
+            player.pause()
+        self.clock.pause()
+        self.timer.stop()
+
+    def stop(self):
+        for player in self.players:
+            player.stop()
+        self.clock.pause()
+        self.clock.seek(0)
+        self.timer.stop()
+        for player, state in zip(self.players, self._states):
+            state.max_error = 0.0
+            state.seeks = 0
+            state.trim = 0.0
+            state.correcting = 0
+            self._set_rate(player, state, 1.0)
+
+    def seek(self, position):
+        """主时钟跳转到指定位置，各播放器由调用方定位后等待解码恢复"""
+        self.clock.seek(position)
+        for state in self._states:
+            self._hold(state)
+
+    def set_rate(self, rate):
+        """改变整体播放速度，慢动作时播放器暂停，由check()逐帧定位"""
+        self.clock.set_rate(rate)
+        for player, state in zip(self.players, self._states):
+            if self.is_slow_motion():
+                player.pause()
+            else:
+                player.setPlaybackRate(rate * state.rate)
+                self._hold(state)
+
+    def _hold(self, state, now=None):
+        """定位后等待解码恢复，期间不校正"""
+        state.settle_until = (time.monotonic() if now is None else now) + SETTLE_TIME
+        state.drift = None
+        state.correcting = 0
+        state.steady_since = None
+
+    def _set_rate(self, player, state, rate):
+        if rate != state.rate:
+            state.rate = rate
+            player.setPlaybackRate(self.clock.rate * rate)
+
+    def check(self):
+        """测量各播放器的偏差并校正"""
+        master = self.clock.position()
+        now = time.monotonic()
+        errors = []
+        if self.is_slow_motion():
+            self.step_players(master)
+            return
+        for player, state in zip(self.players, self._states):
+            local = self.local_position(player, master)
+            if local is None or player.mediaStatus() == QMediaPlayer.EndOfMedia:
+                # 不在该文件的录像范围内
+                if player.state() == QMediaPlayer.PlayingState:
+                    player.pause()
+                errors.append(None)
+                continue
+            if player.state() != QMediaPlayer.PlayingState:
+                # 主时钟进入该文件的录像范围，从对应位置开始播放
+                player.setPosition(int(local))
+                player.play()
+                self._hold(state, now)
+                errors.append(None)
+                continue
+            error = player.position() - local
+            errors.append(error)
+            if now < state.settle_until:
+                continue
+            state.drift = error if state.drift is None else (
+                state.drift + DRIFT_SMOOTHING * (error - state.drift))
+            state.max_error = max(state.max_error, abs(state.drift))
+
+            if abs(state.drift) > SEEK_THRESHOLD:
+                # 偏差太大（卡顿或跳转失败），调速追不上，直接跳转
+                player.setPosition(int(local))
+                state.seeks += 1
+                self._hold(state, now)
+                continue
+
+            # 偏差超过阈值时按比例加快或放慢，偏差过零后恢复为修正速度。
+            # 只在这两个时刻设置播放速度，避免后端频繁重建播放管线造成卡顿。
+            if state.steady_since is None:
+                state.steady_since = (now, state.drift)
+            if not state.correcting and abs(state.drift) > RATE_THRESHOLD:
+                # 按修正速度播放期间偏差增长的斜率就是剩余的快慢，更新修正速度
+                since, start_drift = state.steady_since
+                elapsed = (now - since) * 1000
+                if elapsed > 0:
+                    slope = (state.drift - start_drift) / elapsed
+                    state.trim = clamp_rate(state.trim - TRIM_SMOOTHING * slope)
+                state.correcting = 1 if state.drift > 0 else -1
+                self._set_rate(player, state,
+                               1.0 + clamp_rate(state.trim - state.drift / CORRECTION_HORIZON))
+            elif state.correcting and state.drift * state.correcting <= 0:
+                state.correcting = 0
+                state.steady_since = (now, state.drift)
+                self._set_rate(player, state, 1.0 + state.trim)
+        self.errors_changed.emit(errors)
+
+    def step_players(self, master):
+        """慢动作: 各播放器暂停在主时钟对应的位置，位置变化（至少1毫秒）时才重新定位"""
+        errors = []
+        for player in self.players:
+            local = self.local_position(player, master)
+            if player.state() == QMediaPlayer.PlayingState:
+                player.pause()
+            if local is None:
+                errors.append(None)
+                continue
+            if int(local) != player.position():
+                player.setPosition(int(local))
+            errors.append(0.0)
+        self.errors_changed.emit(errors)
+
+    def max_errors(self):
+        """每个播放器本次播放以来的最大同步误差（毫秒）"""
+        return [state.max_error for state in self._states]
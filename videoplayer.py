@@ -1,12 +1,147 @@
 import os
 import sqlite3
 import sys
+import time
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                              QGroupBox, QLabel, QPushButton, QFileDialog,
-                             QProgressBar, QSizePolicy,QSlider, QMessageBox, QGridLayout)
-from PyQt5.QtCore import Qt, QTimer, QUrl
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-from PyQt5.QtMultimediaWidgets import QVideoWidget
+                             QProgressBar, QSizePolicy,QSlider, QMessageBox, QGridLayout,
+                             QStackedWidget, QScrollArea)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QPixmap
+
+from db_migration import migrate_with_progress
+from db_schema import detect_schema, format_timestamp_us, video_duration_sql
+from keyframe_index import KeyframeIndex
+from playback_controls import (DEFAULT_FPS, WALL_FRAME_BUFFER_SIZE, WALL_FRAME_MAX_WIDTH, FrameStepper,
+                               FrameTiming, PlaybackControls)
+from segment_track import TrackPlayer, build_tracks
+from video_timeline import PlayerSync, build_timeline
+
+# 画面不可见多久（秒）后释放其播放器
+RELEASE_DELAY = 10
+
+# 视频墙中画面的最小高度
+TILE_MIN_HEIGHT = 180
+
+# 滚动或改变窗口大小后重新检查可见画面的延迟（毫秒）
+VISIBILITY_DELAY = 100
+
+# 播放中同时解码的画面超过该数量时使用代理视频
+PROXY_TILE_LIMIT = 4
+
+
+def decoder_limit():
+    """同时解码的视频数上限，超出时可见的画面也不分配播放器"""
+    return min(16, max(4, os.cpu_count() or 4))
+
+
+class VideoTile(QWidget):
+    """视频墙中的一个画面 - 播放器只在画面可见时才分配"""
+
+    double_clicked = pyqtSignal(object)
+
+    def __init__(self, track, offset, parent=None):
+        super().__init__(parent)
+        self.track = track
+        self.offset = offset  # 在时间轴上的偏移（毫秒）
+        self.player = None
+        self.hidden_since = None  # 开始不可见的单调时间
+
+        exp_id, device_id = track.key
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # 视频标签，多段录像显示分段数
+        if len(track) == 1:
+            title = f"{device_id} - {os.path.basename(track.segments[0].file_path)}"
+        else:
+            title = f"{device_id} - {len(track)}段录像"
+        layout.addWidget(QLabel(title))
+
+        # 视频画面，没有播放器或不在录像时间范围内时显示占位文字
+        self.placeholder = QLabel("未加载")
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        self.stack = QStackedWidget()
+        self.stack.addWidget(self.placeholder)
+        self.stack.setMinimumHeight(TILE_MIN_HEIGHT)
+        layout.addWidget(self.stack)
+
+        # 逐帧查看时显示解码出的画面，播放器只能定位到整毫秒，高速摄像机录像一帧不到1毫秒
+        self.frame_view = QLabel()
+        self.frame_view.setAlignment(Qt.AlignCenter)
+        self.frame_view.setStyleSheet("background-color: black;")
+        self.stack.addWidget(self.frame_view)
+        self.showing_frame = False
+        self.stepper = None  # 当前分段的逐帧解码
+
+        # 播放状态和同步误差
+        self.finished_label = QLabel("未加载")
+        layout.addWidget(self.finished_label)
+        self.sync_label = QLabel("同步误差: --")
+        layout.addWidget(self.sync_label)
+
+    def is_on_screen(self):
+        """画面是否有一部分显示在屏幕上（未被滚动出视频墙、窗口未隐藏）"""
+        return self.isVisible() and not self.visibleRegion().isEmpty()
+
+    def has_footage(self, position):
+        """时间轴上该位置是否有录像"""
+        local = position - self.offset
+        return 0 <= local < self.track.duration and self.track.locate(local) is not None
+
+    def attach(self, player):
+        self.player = player
+        player.tile = self
+        player.offset = self.offset
+        self.stack.addWidget(player.view)
+
+    def detach(self):
+        player = self.player
+        self.stack.removeWidget(player.view)
+        player.view.setParent(None)  # 画面被删除时不连带删除播放器的视频输出
+        player.tile = None
+        self.player = None
+        self.hidden_since = None
+        self.showing_frame = False
+        return player
+
+    def mouseDoubleClickEvent(self, event):
+        self.double_clicked.emit(self)
+        super().mouseDoubleClickEvent(event)
+
+    def frame_stepper(self, segment, fps):
+        """分段的逐帧解码，换到其他分段时关闭之前的"""
+        if self.stepper is None or self.stepper.file_path != segment.file_path:
+            self.close_stepper()
+            self.stepper = FrameStepper(segment.file_path, FrameTiming(fps),
+                                        WALL_FRAME_BUFFER_SIZE, WALL_FRAME_MAX_WIDTH)
+        return self.stepper
+
+    def close_stepper(self):
+        if self.stepper is not None:
+            self.stepper.close()
+            self.stepper = None
+
+    def show_frame(self, image):
+        """显示逐帧解码的画面"""
+        self.showing_frame = True
+        self.frame_view.setPixmap(QPixmap.fromImage(image).scaled(
+            self.stack.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        self.stack.setCurrentWidget(self.frame_view)
+
+    def leave_frame(self):
+        """恢复播放器的画面"""
+        if self.showing_frame:
+            self.showing_frame = False
+            if self.player is not None:
+                self.stack.setCurrentWidget(self.player.view)
+
+    def show_video(self, available, text=""):
+        if available and self.player is not None:
+            self.stack.setCurrentWidget(self.frame_view if self.showing_frame else self.player.view)
+        else:
+            self.placeholder.setText(text)
+            self.stack.setCurrentWidget(self.placeholder)
 
 
 class VideoPlayerWidget(QWidget):
@@ -18,14 +153,28 @@ class VideoPlayerWidget(QWidget):
         self.conn = None  # 数据库连接
         self.cursor = None  # 数据库游标
         self.videos = []  # 视频信息列表
-        self.players = []  # 视频播放器列表
-        self.video_widgets = []  # 视频显示组件列表
+        self.tracks = []  # 按设备拼接的录像轨道
+        self.tiles = []  # 视频墙中的画面，每条轨道一个
+        self.players = []  # 已创建的播放器，在可见画面之间复用，数量不超过decoder_limit()
         self.current_position = 0  # 当前播放位置（毫秒）
-        self.max_duration = 0  # 最长视频时长（毫秒）
+        self.max_duration = 0  # 时间轴总长（毫秒）
+        self.timeline_origin = None  # 时间轴起点的墙钟时刻（微秒），视频都没有记录时刻时为None
+        self.track_offsets = []  # 各轨道在时间轴上的偏移（毫秒）
+        self.missing_files = []  # 不存在的视频文件
+        self.maximized_tile = None  # 双击放大的画面，其余画面隐藏
+        self.max_fps = DEFAULT_FPS  # 各路视频中的最高帧率，逐帧前进后退按它的一帧计算
+        self.video_fps = {}  # 视频id -> 帧率
+        self.step_frame = None  # 逐帧查看时时间轴上的帧序号（按max_fps计），其余时候为None
         self.timer = QTimer()  # 定时器，用于更新进度
         self.timer.timeout.connect(self.update_progress)
         self.timer.setInterval(500)  # 每500毫秒更新一次进度
         self.playing = False  # 播放状态
+        self.sync = PlayerSync(parent=self)  # 以主时钟为基准同步可见画面的视频
+        self.sync.errors_changed.connect(self.show_sync_errors)
+        self.visibility_timer = QTimer(self)  # 滚动停止后再检查可见画面
+        self.visibility_timer.setSingleShot(True)
+        self.visibility_timer.setInterval(VISIBILITY_DELAY)
+        self.visibility_timer.timeout.connect(self.update_visibility)
 
     def initUI(self):
         main_layout = QVBoxLayout()
@@ -45,10 +194,17 @@ class VideoPlayerWidget(QWidget):
         main_layout.addWidget(db_group)
         # main_layout.addStretch()
 
-        # 视频区域容器
+        # 视频区域容器，画面较多时可滚动，只有可见的画面解码
         self.videos_container = QGroupBox("视频播放")
-        self.videos_layout = QGridLayout()
-        self.videos_container.setLayout(self.videos_layout)
+        container_layout = QVBoxLayout(self.videos_container)
+        self.videos_scroll = QScrollArea()
+        self.videos_scroll.setWidgetResizable(True)
+        self.videos_wall = QWidget()
+        self.videos_layout = QGridLayout(self.videos_wall)
+        self.videos_scroll.setWidget(self.videos_wall)
+        self.videos_scroll.verticalScrollBar().valueChanged.connect(self.schedule_visibility_update)
+        self.videos_scroll.horizontalScrollBar().valueChanged.connect(self.schedule_visibility_update)
+        container_layout.addWidget(self.videos_scroll)
         self.videos_container.setSizePolicy(QSizePolicy.Preferred,QSizePolicy.Expanding)
         main_layout.addWidget(self.videos_container)
 
@@ -64,6 +220,8 @@ class VideoPlayerWidget(QWidget):
         self.progress_slider = QSlider(Qt.Horizontal)
         self.progress_slider.setRange(0, 100)
         self.progress_slider.sliderMoved.connect(self.set_position)
+        self.progress_slider.sliderPressed.connect(self.update_proxy_mode)
+        self.progress_slider.sliderReleased.connect(self.seek_exact)
         progress_layout.addWidget(self.progress_slider)
 
         self.duration_label = QLabel("00:00")
@@ -87,6 +245,13 @@ class VideoPlayerWidget(QWidget):
         buttons_layout.addWidget(self.stop_btn)
 
         control_layout.addLayout(buttons_layout)
+
+        # 变速和逐帧控制（高速摄像机录像慢放）
+        self.playback_controls = PlaybackControls()
+        self.playback_controls.rate_changed.connect(self.set_rate)
+        self.playback_controls.step_requested.connect(self.step_frames)
+        control_layout.addWidget(self.playback_controls)
+
         control_group.setLayout(control_layout)
         # control_group.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Minimum)
         main_layout.addWidget(control_group)
@@ -110,16 +275,31 @@ class VideoPlayerWidget(QWidget):
         if self.conn:
             self.conn.close()
 
-        # 连接到数据库
+        # 连接到数据库，旧数据库在后台迁移，完成后再读取视频信息
         try:
             self.conn = sqlite3.connect(db_path)
             self.cursor = self.conn.cursor()
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "数据库错误", f"读取数据库失败: {str(e)}")
+            return
+        migrate_with_progress(self, db_path, self.database_migrated)
 
-            # 查询视频数据
-            self.cursor.execute('''
-            SELECT id, experiment_id, device_id, file_path, duration 
+    def database_migrated(self, completed):
+        """数据库迁移完成后读取视频信息，取消迁移时关闭数据库"""
+        if not completed:
+            self.clear_players()
+            self.conn.close()
+            self.conn = None
+            self.db_path_label.setText("未选择数据库")
+            return
+        try:
+            # 查询视频数据，时长优先使用导入时探测到的毫秒值
+            camera = detect_schema(self.conn)["camera"]  # 导入模块为device_id，回放模块为camera_id
+            self.cursor.execute(f'''
+            SELECT id, experiment_id, {camera}, file_path, {video_duration_sql(self.conn)},
+                   start_ts, end_ts
             FROM video_data 
-            ORDER BY device_id
+            ORDER BY {camera}
             ''')
             self.videos = self.cursor.fetchall()
 
@@ -130,9 +310,14 @@ class VideoPlayerWidget(QWidget):
             # 清除之前的视频播放器
             self.clear_players()
 
-            # 计算最大时长（秒）
-            self.max_duration = max(video[4] for video in self.videos) * 1000  # 转换为毫秒
+            # 同一设备的分段录像拼接为一条轨道，再按墙钟时刻把各轨道排到同一条时间轴上
+            self.tracks, self.missing_files = build_tracks(self.videos)
+            self.timeline_origin, self.track_offsets, self.max_duration = build_timeline(
+                [(track.start_ts, track.end_ts, track.duration) for track in self.tracks])
             self.progress_slider.setRange(0, self.max_duration)
+            self.cursor.execute("SELECT id, fps FROM video_data WHERE fps > 0")
+            self.video_fps = dict(self.cursor.fetchall())
+            self.max_fps = max(self.video_fps.values(), default=DEFAULT_FPS)
             self.duration_label.setText(self.format_time(self.max_duration))
 
             # 创建视频播放器
@@ -142,17 +327,20 @@ class VideoPlayerWidget(QWidget):
             QMessageBox.critical(self, "数据库错误", f"读取数据库失败: {str(e)}")
 
     def clear_players(self):
-        """清除当前所有播放器"""
+        """清除当前所有画面，播放器保留下来供新的画面使用"""
         # 停止计时器
         self.timer.stop()
         self.playing = False
 
-        # 清理播放器和视频窗口
-        for player in self.players:
-            player.stop()
-
-        self.players = []
-        self.video_widgets = []
+        # 停止播放并释放播放器
+        self.sync.stop()
+        self.sync.set_players([])
+        for tile in self.tiles:
+            tile.close_stepper()
+            if tile.player is not None:
+                tile.detach().setTrack(None)
+        self.tiles = []
+        self.step_frame = None
 
         # 清理视频布局中的所有组件
         while self.videos_layout.count():
@@ -160,130 +348,288 @@ class VideoPlayerWidget(QWidget):
             widget = item.widget()
             if widget:
                 widget.deleteLater()
+        self.maximized_tile = None
 
     def create_players(self):
-        """为每个视频创建播放器"""
-        # 获取有多少个不同设备的视频
-        devices = set(video[2] for video in self.videos)
-
-        # 创建视频播放器网格
+        """为每条轨道创建画面，播放器在画面可见时才分配"""
+        # 画面较多时每行多放几个
+        max_cols = 2 if len(self.tracks) <= 4 else 4
         row, col = 0, 0
-        max_cols = 2  # 每行最多2个视频
-
-        for device in devices:
-            # 找出该设备的所有视频
-            device_videos = [v for v in self.videos if v[2] == device]
-
-            for video in device_videos:
-                video_id, exp_id, device_id, file_path, duration = video
-
-                # 检查文件是否存在
-                if not os.path.exists(file_path):
-                    # 显示错误，但继续处理其他视频
-                    self.videos_layout.addWidget(QLabel(f"文件不存在: {file_path}"), row, col)
-                    continue
-
-                # 创建视频标签
-                label = QLabel(f"{device_id} - {os.path.basename(file_path)}")
-                self.videos_layout.addWidget(label, row, col, 1, 1)
-
-                # 创建视频组件
-                video_widget = QVideoWidget()
-                self.videos_layout.addWidget(video_widget, row + 1, col, 1, 1)
-                self.video_widgets.append(video_widget)
-
-                # 创建播放器
-                player = QMediaPlayer()
-                player.setVideoOutput(video_widget)
-                player.setMedia(QMediaContent(QUrl.fromLocalFile(file_path)))
-                self.players.append(player)
-
-                # 创建视频结束标识
-                finished_label = QLabel("播放中")
-                self.videos_layout.addWidget(finished_label, row + 2, col, 1, 1)
-
-                # 记录标签，用于后续更新状态
-                player.finished_label = finished_label
-                player.duration = duration * 1000  # 转换为毫秒
-
-                # 更新网格位置
-                col += 1
-                if col >= max_cols:
-                    col = 0
-                    row += 10  # 每个视频占3行
+
+        for track, offset in zip(self.tracks, self.track_offsets):
+            tile = VideoTile(track, offset)
+            tile.double_clicked.connect(self.toggle_maximized)
+            self.videos_layout.addWidget(tile, row, col)
+            self.tiles.append(tile)
+
+            # 更新网格位置
+            col += 1
+            if col >= max_cols:
+                col = 0
+                row += 1
+
+        if self.missing_files:
+            # 显示错误，但继续播放其他视频
+            missing_label = QLabel(f"文件不存在: {len(self.missing_files)}个视频")
+            missing_label.setToolTip("\n".join(self.missing_files))
+            self.videos_layout.addWidget(missing_label, row + (1 if col else 0), 0, 1, max_cols)
+
+        self.update_footage(0)
+        self.schedule_visibility_update()
+
+    def schedule_visibility_update(self):
+        """滚动或改变大小后稍后检查可见画面，避免滚动过程中反复分配播放器"""
+        if self.tiles:
+            self.visibility_timer.start()
+
+    def acquire_player(self):
+        """取得一个空闲播放器: 先用空闲的，再按上限新建，最后从最早不可见的画面收回"""
+        for player in self.players:
+            if getattr(player, "tile", None) is None:
+                return player
+        if len(self.players) < decoder_limit():
+            player = TrackPlayer(self, skip_gaps=False)  # 分段之间的空白由主时钟决定何时继续
+            player.tile = None
+            self.players.append(player)
+            return player
+        hidden = [tile for tile in self.tiles if tile.player is not None and tile.hidden_since is not None]
+        if not hidden:
+            return None
+        return self.release_player(min(hidden, key=lambda tile: tile.hidden_since))
+
+    def release_player(self, tile):
+        """收回画面的播放器并关闭其视频文件"""
+        player = tile.detach()
+        tile.close_stepper()
+        self.sync.remove_player(player)
+        player.setTrack(None)
+        tile.sync_label.setText("同步误差: --")
+        return player
+
+    def update_visibility(self):
+        """不可见的画面暂停解码，一段时间后释放播放器；可见的画面分配播放器并同步到主时钟"""
+        now = time.monotonic()
+        visible = []
+        for tile in self.tiles:
+            if tile.is_on_screen():
+                tile.hidden_since = None
+                visible.append(tile)
+            elif tile.player is not None:
+                if tile.hidden_since is None:
+                    tile.hidden_since = now
+                    self.sync.remove_player(tile.player)
+                    tile.sync_label.setText("同步误差: --")
+                elif now - tile.hidden_since >= RELEASE_DELAY:
+                    self.release_player(tile)
+
+        for tile in visible:
+            if tile.player is None:
+                player = self.acquire_player()
+                if player is None:
+                    continue  # 已达到同时解码数量上限
+                tile.attach(player)
+                player.setTrack(tile.track, lambda video_id: KeyframeIndex.load(self.conn, video_id))
+            # 重新可见的画面由主时钟定位，播放中时下次同步检查即从主时钟位置开始播放
+            self.sync.add_player(tile.player)
+        self.update_proxy_mode()
+        self.update_footage(self.current_position)
+
+    def toggle_maximized(self, tile):
+        """双击画面放大为单路查看，再次双击恢复视频墙；其余画面隐藏后其播放器随之释放"""
+        self.maximized_tile = None if self.maximized_tile is tile else tile
+        for other in self.tiles:
+            other.setVisible(self.maximized_tile is None or other is self.maximized_tile)
+        self.schedule_visibility_update()
+
+    def update_proxy_mode(self):
+        """拖动进度条时，或播放中同时解码的画面较多时使用代理视频；暂停和单路放大查看时使用原始录像"""
+        scrubbing = self.progress_slider.isSliderDown()
+        busy = self.playing and len(self.sync.players) > PROXY_TILE_LIMIT
+        for player in self.sync.players:
+            player.set_use_proxy(scrubbing or busy)
 
     def play_videos(self):
         """播放所有视频"""
-        if not self.players:
+        if not self.tiles:
             return
 
-        for player in self.players:
-            player.play()
-            player.finished_label.setText("播放中")
+        self.leave_step_mode()
+        self.sync.play()
 
         self.playing = True
+        self.update_proxy_mode()
         self.timer.start()
+        self.update_footage(self.current_position)
 
     def pause_videos(self):
         """暂停所有视频"""
-        if not self.players:
+        if not self.tiles:
             return
 
-        for player in self.players:
-            player.pause()
+        self.sync.pause()
 
         self.playing = False
+        self.update_proxy_mode()
         self.timer.stop()
+        self.update_footage(self.current_position)
 
     def stop_videos(self):
         """停止所有视频"""
-        if not self.players:
+        if not self.tiles:
             return
 
-        for player in self.players:
-            player.stop()
-            player.finished_label.setText("已停止")
+        self.leave_step_mode()
+        self.sync.stop()
 
         self.playing = False
+        self.update_proxy_mode()
         self.timer.stop()
         self.current_position = 0
         self.progress_slider.setValue(0)
-        self.position_label.setText("00:00")
+        self.position_label.setText(self.format_position(0))
+        self.update_footage(0)
+        for tile in self.tiles:
+            if tile.player is not None and tile.has_footage(0):
+                tile.finished_label.setText("已停止")
 
     def update_progress(self):
         """更新播放进度"""
-        if not self.playing or not self.players:
+        if not self.playing or not self.tiles:
             return
 
-        # 获取当前位置（使用第一个播放器作为参考）
-        self.current_position = self.players[0].position()
+        # 获取当前位置（以主时钟为准，不受某一路视频卡顿影响）
+        self.current_position = int(self.sync.clock.position())
 
         # 更新进度条和时间显示
-        self.progress_slider.setValue(self.current_position)
-        self.position_label.setText(self.format_time(self.current_position))
-
-        # 检查每个视频是否已经播放结束
-        for player in self.players:
-            if player.position() >= player.duration:
-                player.finished_label.setText("已播放完成")
+        if not self.progress_slider.isSliderDown():
+            self.progress_slider.setValue(self.current_position)
+        self.position_label.setText(self.format_position(self.current_position))
+        self.update_frame_info(self.current_position)
+        # 同时检查可见画面（窗口最小化、切换到其他页面等不产生滚动的变化）
+        self.update_visibility()
 
         # 检查是否所有视频都播放完成
-        if all(player.position() >= player.duration for player in self.players):
+        if self.current_position >= self.max_duration:
+            self.sync.pause()
             self.timer.stop()
             self.playing = False
 
-    def set_position(self, position):
-        """设置播放位置"""
-        if not self.players:
+    def set_position(self, position, exact=False):
+        """设置播放位置
+
+        拖动进度条时跳到最近的关键帧，不必从上一个关键帧解码到目标帧，
+        松开后再精确定位。
+        """
+        if not self.tiles:
             return
 
-        for player in self.players:
-            player.setPosition(position)
-            # 重置"已播放完成"标签
-            if position < player.duration:
-                player.finished_label.setText("播放中")
+        self.current_position = position
+        self.leave_step_mode()
+        self.sync.seek(position)
+        for player in self.sync.players:
+            # 时间轴上的位置换算为该文件内的位置
+            local = self.sync.local_position(player, position)
+            if local is None:
+                player.pause()
+                continue
+            local = int(local)
+            target = local if exact else player.nearest_keyframe(local)
+            player.prefetch(local)
+            player.setPosition(target)
+            if self.playing:
+                player.play()
+        self.position_label.setText(self.format_position(int(position)))
+        self.update_frame_info(position)
+        self.update_footage(position)
+
+    def set_rate(self, rate):
+        """改变播放速度，低于播放器支持的速度时各路视频随主时钟逐帧定位"""
+        self.sync.set_rate(rate)
+
+    def step_frames(self, frames):
+        """暂停后前进或后退若干帧（按帧率最高的视频计算一帧的时长）
+
+        位置按帧序号累计，不经过毫秒取整；能逐帧解码时各路画面显示解码出的帧，
+        否则由播放器定位到该位置（精度1毫秒，帧率高于1000时连续几帧画面相同）。
+        """
+        if not self.tiles:
+            return
+        if self.playing:
+            self.pause_videos()
+        frame = self.step_frame
+        if frame is None:
+            frame = int(round(self.current_position * self.max_fps / 1000))
+        last = int(self.max_duration * self.max_fps / 1000)
+        frame = min(max(frame + frames, 0), last)
+        position = frame * 1000 / self.max_fps
+        self.progress_slider.setValue(int(position))
+        self.set_position(position, exact=True)
+        self.step_frame = frame
+        self.show_step_frames(position)
+
+    def show_step_frames(self, position):
+        """各路画面显示时间轴位置所在的帧"""
+        for player in self.sync.players:
+            tile = player.tile
+            local = self.sync.local_position(player, position)
+            if local is None:
+                tile.leave_frame()
+                continue
+            segment = tile.track.segments[tile.track.locate(local)]
+            stepper = tile.frame_stepper(segment, self.video_fps.get(segment.video_id) or self.max_fps)
+            image = stepper.frame(stepper.timing.frame_at(local - segment.start))
+            if image is None:
+                tile.leave_frame()
             else:
-                player.finished_label.setText("已播放完成")
+                tile.show_frame(image)
+
+    def leave_step_mode(self):
+        """结束逐帧查看，各路画面恢复为播放器的画面"""
+        self.step_frame = None
+        for tile in self.tiles:
+            tile.leave_frame()
+
+    def update_frame_info(self, position):
+        """显示时间轴位置对应的墙钟时刻（微秒）"""
+        if self.timeline_origin is not None:
+            self.playback_controls.set_frame_info(None, self.timeline_origin + int(position * 1000))
+
+    def update_footage(self, position):
+        """按时间轴上的位置切换各路视频的"无录像"状态"""
+        for tile in self.tiles:
+            if not tile.has_footage(position):
+                text = "无录像"
+            elif tile.player is None or tile.player not in self.sync.players:
+                text = "超出同时解码数量" if tile.is_on_screen() else "不可见"
+            else:
+                text = "播放中" if self.playing else "已暂停"
+            tile.show_video(text in ("播放中", "已暂停"), text)
+            if tile.player is not None and tile.player.use_proxy and text in ("播放中", "已暂停"):
+                segment = tile.player.current_segment()
+                if segment is not None and tile.player.proxy_path(segment):
+                    text += " (代理视频)"
+            tile.finished_label.setText(text)
+
+    def seek_exact(self):
+        """松开进度条后切回原始录像（播放中画面较多时仍用代理视频），再精确定位到选定位置"""
+        self.update_proxy_mode()
+        self.set_position(self.progress_slider.value(), exact=True)
+
+    def show_sync_errors(self, errors):
+        """显示每路视频相对主时钟的同步误差"""
+        for player, error, worst in zip(self.sync.players, errors, self.sync.max_errors()):
+            if error is None:
+                player.tile.sync_label.setText("同步误差: --")
+            else:
+                player.tile.sync_label.setText(f"同步误差: {error:+.0f} ms (最大 {worst:.0f} ms)")
+
+    def format_position(self, position):
+        """时间轴位置的显示文本，已知录像时刻时附带墙钟时间"""
+        text = self.format_time(position)
+        if self.timeline_origin is not None:
+            wall_time = format_timestamp_us(self.timeline_origin + position * 1000)
+            text += f" ({wall_time[11:19]})"
+        return text
 
     def format_time(self, milliseconds):
         """格式化时间显示"""
@@ -292,6 +638,22 @@ class VideoPlayerWidget(QWidget):
         seconds %= 60
         return f"{minutes:02d}:{seconds:02d}"
 
+    def resizeEvent(self, event):
+        self.schedule_visibility_update()
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        self.schedule_visibility_update()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        # 切换到其他页面时不再解码
+        for tile in self.tiles:
+            if tile.player is not None and tile.hidden_since is None:
+                tile.hidden_since = time.monotonic()
+                self.sync.remove_player(tile.player)
+        super().hideEvent(event)
+
     def closeEvent(self, event):
         """关闭窗口时的处理"""
         # 停止视频播放